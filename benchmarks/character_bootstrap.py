@@ -0,0 +1,125 @@
+"""Time to create characters the old way, with generate_character,
+generate_inventory_for_character and generate_events_for_character
+each committing on their own, versus the single round trip
+generate_character.
+
+DESTRUCTIVE: this runs schema.sql (which drops every table) against the
+--dsn database, so point it at a scratch database.
+
+    createdb phoenix_bench
+    python -m benchmarks.character_bootstrap --dsn "dbname=phoenix_bench host=localhost"
+"""
+import argparse
+import statistics
+import time
+from pathlib import Path
+
+import psycopg2
+from psycopg2.extras import RealDictCursor
+
+from bot.database_utils import DataInserter, MigrationRunner, ReferenceData
+
+DATABASE = Path(__file__).resolve().parent.parent / "database"
+
+
+def selected_character_id(cursor, player_name: str) -> int:
+    """fetch_selected_character_id, which the old bootstrap ran twice"""
+    cursor.execute("""
+        SELECT c.character_id
+        FROM "character" c
+        JOIN "player" p ON c.player_id = p.player_id
+        WHERE p.player_name = %s
+        AND c.selected_character = TRUE;
+        """, (player_name,))
+    return cursor.fetchone()['character_id']
+
+
+def legacy_create_character(conn, server_id: int, player_id: int, player_name: str):
+    """The old bootstrap: 3 + 1 + 2 + event types round trips and 3 commits"""
+    with conn.cursor() as cursor:
+        cursor.execute("""UPDATE character SET selected_character = False
+                       WHERE player_id = %s AND server_id = %s""", (player_id, server_id))
+        cursor.execute("""INSERT INTO character (character_name, race_id, class_id, player_id,
+                                                 faction_id, server_id)
+                       VALUES (%s, %s, %s, %s, %s, %s)""",
+                       ('hero', 1, 1, player_id, None, server_id))
+        conn.commit()
+
+        character_id = selected_character_id(cursor, player_name)
+        cursor.execute("INSERT INTO inventory (inventory_name, character_id) VALUES (%s, %s)",
+                       ('initial_inventory', character_id))
+        conn.commit()
+
+        character_id = selected_character_id(cursor, player_name)
+        for event_type_id in ReferenceData.event_types.by_id:
+            cursor.execute("""INSERT INTO "character_event" (character_id, event_type_id, event_timestamp)
+                           VALUES (%s, %s, NOW());""", (character_id, event_type_id))
+        conn.commit()
+
+
+def setup(conn, players: int):
+    """Creates an empty server with a race, a class and the players"""
+    with conn.cursor() as cursor:
+        cursor.execute((DATABASE / "schema.sql").read_text())
+        cursor.execute((DATABASE / "seed.sql").read_text())
+    conn.commit()
+    MigrationRunner(conn).run()
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            INSERT INTO server (server_id, server_name) VALUES (1, 'benchmark');
+            INSERT INTO race (race_name, speed, is_playable, server_id) VALUES ('race', 30, TRUE, 1);
+            INSERT INTO class (class_name, is_playable, server_id) VALUES ('class', TRUE, 1);
+            INSERT INTO player (player_name, server_id)
+                SELECT 'player_' || g, 1 FROM generate_series(1, %s) g;
+            """, (players,))
+        cursor.execute("SELECT player_id, player_name FROM player ORDER BY player_id")
+        rows = cursor.fetchall()
+    conn.commit()
+    ReferenceData.load(conn)
+    return rows
+
+
+def count_rows(conn) -> str:
+    """Summarises what was created so both runs can be compared"""
+    with conn.cursor() as cursor:
+        cursor.execute("""SELECT (SELECT count(*) FROM "character") AS characters,
+                                 (SELECT count(*) FROM inventory) AS inventories,
+                                 (SELECT count(*) FROM character_event) AS events""")
+        row = cursor.fetchone()
+    conn.rollback()
+    return f"{row['characters']} characters, {row['inventories']} inventories, {row['events']} events"
+
+
+def main(args: argparse.Namespace):
+    """Creates --characters characters with each bootstrap"""
+    conn = psycopg2.connect(args.dsn, cursor_factory=RealDictCursor)
+    runs = (
+        ("legacy", lambda row: legacy_create_character(
+            conn, 1, row['player_id'], row['player_name'])),
+        ("generate_character", lambda row: DataInserter.generate_character(
+            conn, 1, row['player_id'], 'hero', 1, 1)),
+    )
+    print(f"Creating {args.characters} characters")
+    for name, create in runs:
+        players = setup(conn, args.characters)
+        latencies = []
+        start = time.perf_counter()
+        for row in players:
+            begin = time.perf_counter()
+            create(row)
+            latencies.append(time.perf_counter() - begin)
+        elapsed = time.perf_counter() - start
+
+        latencies.sort()
+        p50 = statistics.median(latencies) * 1000
+        p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000
+        print(f"{name:>18}: {elapsed:6.2f} s, {args.characters / elapsed:6.0f} characters/s, "
+              f"p50 {p50:5.2f} ms, p99 {p99:5.2f} ms ({count_rows(conn)})")
+    conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dsn", required=True)
+    parser.add_argument("--characters", type=int, default=10_000)
+    main(parser.parse_args())
@@ -0,0 +1,265 @@
+"""Combat engine throughput and memory, written to a JSON file so runs on
+different commits can be compared.
+
+Measures Combatant construction and status application per second,
+turns per second for 2, 8 and 50 player battles, the cost of
+ticking a pile of stacked Burning, Poisoned, Leech and Regenerating
+effects, Spell.get_targets with Taunt and Charmed filtering the targets,
+the memory each battle in Combat.active_battles takes, and how fast and
+small the replay of a recorded battle is. Nothing here
+touches Discord or the database, the combatants are built from rows
+shaped like CombatDatabase.get_combatants'.
+
+    python -m benchmarks.combat_engine
+    python -m benchmarks.combat_engine --output after.json --compare before.json
+"""
+import argparse
+import json
+import platform
+import subprocess
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+from bot.combat_test.engine import Action, Battle, Combatant, CombatError
+from bot.combat_test.replay import Replay, dumps, play, record
+from bot.combat_test.rng import RandomStream
+from bot.combat_test.snapshot import encode
+from bot.combat_test.status_effects import StatusEffect, get_effect
+
+STACKED = [get_effect(name) for name in ("Burning", "Poisoned", "Leech", "Regenerating")]
+
+
+def spell_row(name: str, spell_type: str = "Single Target", power: int = 5, mana_cost: int = 10,
+              status_name: str | None = None, chance: int | None = None, duration: int | None = None) -> dict:
+    """A row shaped like get_combatants' spells and items"""
+    return {'spell_name': name, 'spell_power': power, 'mana_cost': mana_cost, 'cooldown': 1,
+            'element_name': 'Fire', 'status_name': status_name, 'chance': chance,
+            'duration': duration, 'spell_type_name': spell_type, 'item_name': f'{name} Scroll',
+            'spell_charges': 3}
+
+
+SPELLS = [spell_row('Fireball'),
+          spell_row('Ignite', power=10, status_name='Burning', chance=50, duration=3),
+          spell_row('Venom', power=10, status_name='Poisoned', chance=50, duration=3),
+          spell_row('Inferno', spell_type='Area of Effect', power=3, mana_cost=30)]
+ITEMS = [spell_row('Mend', status_name='Regenerating', chance=101, duration=3)] * 3
+
+
+def make_combatant(combatant_id: int, health: int = 1000) -> Combatant:
+    """A character with the usual four spells and three items"""
+    character = {'character_id': combatant_id, 'character_name': f'hero {combatant_id}',
+                 'health': health, 'mana': 100, 'speed': combatant_id % 20, 'experience': 0,
+                 'race_name': 'Human', 'class_name': 'Mage', 'image_url': None}
+    return Combatant.from_rows(combatant_id, f'player {combatant_id}', character, SPELLS, ITEMS)
+
+
+def make_battle(battle_id: int, players: int, seed: int) -> Battle:
+    """A started battle with `players` combatants"""
+    battle = Battle(battle_id, seed)
+    for combatant_id in range(1, players + 1):
+        battle.join(make_combatant(combatant_id), 50)
+    battle.start()
+    return battle
+
+
+def choose(battle: Battle, rng: RandomStream) -> Action:
+    """What a player clicking through the buttons would do: cast a random
+    spell they can afford at a target they are allowed, otherwise meditate"""
+    player = battle.current_turn
+    spells = [index for index, spell in enumerate(player.spells)
+              if spell.spell_type != "Passive" and player.mana >= spell.cost]
+    if not spells:
+        return Action(Action.MEDITATE, player.id)
+    index = rng.choice(spells)
+    spell = player.spells[index]
+    if spell.spell_type == "Area of Effect":
+        return Action(Action.CAST, player.id, index)
+    targets = [target for target in spell.get_targets(player, battle.opponents()) if target is not player]
+    if not targets:
+        return Action(Action.MEDITATE, player.id)
+    return Action(Action.CAST, player.id, index, target=rng.choice(targets).id)
+
+
+def combatants_per_second(count: int) -> float:
+    """Combatant construction, which builds a Spell for every equipped spell and item"""
+    start = time.perf_counter()
+    for combatant_id in range(count):
+        make_combatant(combatant_id)
+    return count / (time.perf_counter() - start)
+
+
+def applications_per_second(count: int, seed: int) -> float:
+    """Spell.cast of a status spell that always lands, the target is cleansed every cast"""
+    rng = RandomStream(seed)
+    caster, target = make_combatant(1), make_combatant(2)
+    spell = caster.inventory[0].spell
+    start = time.perf_counter()
+    for _ in range(count):
+        caster.mana = 100
+        spell.cast(caster, target, rng)
+        target.status_effects.clear()
+    return count / (time.perf_counter() - start)
+
+
+def turns_per_second(players: int, turns: int, seed: int) -> float:
+    """Battle.act throughput, starting a new battle whenever one ends"""
+    rng = RandomStream(seed)
+    battle = make_battle(0, players, rng.randint(0, 2 ** 32))
+    elapsed = 0.0
+    for _ in range(turns):
+        if battle.over:
+            battle = make_battle(0, players, rng.randint(0, 2 ** 32))
+        action = choose(battle, rng)
+        start = time.perf_counter()
+        try:
+            battle.act(action)
+        except CombatError:
+            pass
+        elapsed += time.perf_counter() - start
+    return turns / elapsed
+
+
+def status_tick_cost(stacks: int, rounds: int) -> float:
+    """Microseconds to tick a target's `stacks` effects once, like Battle.next_turn does"""
+    caster, target = make_combatant(1), make_combatant(2, health=10 ** 9)
+    for index in range(stacks):
+        # Long enough that nothing wears off while measuring
+        target.status_effects.append(StatusEffect(STACKED[index % len(STACKED)], caster, 1, 10 ** 9))
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for status_effect in list(target.status_effects):
+            status_effect.reduce_status(target)
+    return (time.perf_counter() - start) / rounds * 1e6
+
+
+def get_targets_per_second(players: int, calls: int, filtered: bool) -> float:
+    """Spell.get_targets throughput for a caster who is Taunted and Charmed, or not"""
+    opponents = [make_combatant(combatant_id) for combatant_id in range(2, players + 1)]
+    caster = make_combatant(1)
+    if filtered:
+        caster.status_effects += [StatusEffect(get_effect("Taunt"), opponents[0], 0, 3),
+                                  StatusEffect(get_effect("Charmed"), opponents[-1], 0, 3)]
+    spell = caster.spells[0]
+    start = time.perf_counter()
+    for _ in range(calls):
+        spell.get_targets(caster, opponents)
+    return calls / (time.perf_counter() - start)
+
+
+def memory_per_battle(battles: int, players: int, seed: int) -> float:
+    """Bytes each started battle adds to Combat.active_battles"""
+    active_battles: dict[int, Battle] = {}
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for battle_id in range(battles):
+        active_battles[battle_id] = make_battle(battle_id, players, seed + battle_id)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (after - before) / battles
+
+
+def recorded_battle(players: int, turns: int, seed: int) -> Replay:
+    """A battle played by choose for up to `turns` turns, recorded from before its start"""
+    rng = RandomStream(seed)
+    battle = Battle(0, seed)
+    for combatant_id in range(1, players + 1):
+        battle.join(make_combatant(combatant_id), 50)
+    opening = encode(battle)
+    battle.start()
+    while not battle.over and battle.turn < turns:
+        try:
+            battle.act(choose(battle, rng)._replace(turn=battle.turn))
+        except CombatError:
+            pass
+    return record(opening, battle)
+
+
+def replay_turns_per_second(players: int, turns: int, seed: int) -> float:
+    """How fast a recorded battle plays again"""
+    replay = recorded_battle(players, turns, seed)
+    start = time.perf_counter()
+    battle, _ = play(replay)
+    return battle.turn / (time.perf_counter() - start)
+
+
+def replay_bytes_per_action(players: int, turns: int, seed: int) -> float:
+    """What each action adds to a packed replay"""
+    replay = recorded_battle(players, turns, seed)
+    opening_only = len(dumps(Replay(replay.opening, [])))
+    return (len(dumps(replay)) - opening_only) / len(replay.actions)
+
+
+def commit() -> str | None:
+    """The checked out commit, so results can be matched to the code"""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def flatten(results: dict, prefix: str = "") -> dict[str, float]:
+    """{'a': {'b': 1}} as {'a.b': 1}, for comparing runs"""
+    flat = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)):
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+def compare(before: dict, after: dict):
+    """Prints every metric of both runs and the change"""
+    print(f"\n{'':<40} {before.get('commit') or 'before':>12} {after.get('commit') or 'after':>12}")
+    old, new = flatten(before['results']), flatten(after['results'])
+    for key in sorted(old.keys() & new.keys()):
+        change = f"{(new[key] - old[key]) / old[key]:+8.1%}" if old[key] else ""
+        print(f"{key:<40} {old[key]:>12,.1f} {new[key]:>12,.1f} {change}")
+
+
+def main(args: argparse.Namespace):
+    """Runs every measurement, prints and writes the results"""
+    results = {
+        'combatants_per_second': combatants_per_second(args.turns),
+        'applications_per_second': applications_per_second(args.turns * 5, args.seed),
+        'turns_per_second': {str(players): turns_per_second(players, args.turns, args.seed)
+                             for players in (2, 8, 50)},
+        'status_tick_us': {str(stacks): status_tick_cost(stacks, max(args.turns // stacks, 10))
+                           for stacks in (4, 40, 400)},
+        'get_targets_per_second': {
+            f"{players}_{'taunt_charmed' if filtered else 'plain'}":
+                get_targets_per_second(players, args.turns * 10, filtered)
+            for players in (8, 50) for filtered in (False, True)},
+        'memory_per_battle_bytes': {str(players): memory_per_battle(args.battles, players, args.seed)
+                                    for players in (2, 8)},
+        'replay_turns_per_second': {str(players): replay_turns_per_second(players, args.turns, args.seed)
+                                    for players in (2, 8)},
+        'replay_bytes_per_action': {str(players): replay_bytes_per_action(players, args.turns, args.seed)
+                                    for players in (2, 8)},
+    }
+    run = {'commit': commit(), 'python': platform.python_version(),
+           'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+           'turns': args.turns, 'seed': args.seed, 'results': results}
+
+    for key, value in flatten(results).items():
+        print(f"{key:<40} {value:>12,.1f}")
+    with open(args.output, 'w', encoding='utf-8') as file:
+        json.dump(run, file, indent=2)
+    print(f"\nWrote {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as file:
+            compare(json.load(file), run)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=20_000)
+    parser.add_argument("--battles", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default="combat_engine.json")
+    parser.add_argument("--compare", default=None,
+                        help="an earlier --output file to compare against")
+    main(parser.parse_args())
@@ -0,0 +1,130 @@
+"""Throughput of 50 concurrent simulated commands on one shared
+connection versus the ConnectionPool.
+
+Each simulated command borrows a connection, runs one query off the
+event loop and gives the connection back. By default the query is a fake
+that sleeps for --latency seconds while holding the connection lock, like
+psycopg2 does; pass --dsn to run `SELECT pg_sleep(latency)` on a real
+postgres instead.
+
+    python -m benchmarks.connection_pool
+    python -m benchmarks.connection_pool --dsn "dbname=phoenix host=localhost"
+"""
+import argparse
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+import psycopg2
+
+from bot.database_utils import ConnectionPool
+
+
+class FakeCursor:
+    """A cursor whose queries take a fixed amount of time"""
+
+    def __init__(self, conn: "FakeConnection"):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def execute(self, query: str, params=None):
+        """Holds the connection for the configured latency like a real query"""
+        with self.conn.lock:
+            time.sleep(self.conn.latency)
+
+
+class FakeConnection:
+    """Stands in for a psycopg2 connection, one query at a time"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.closed = 0
+
+    def cursor(self):
+        """Returns a new fake cursor"""
+        return FakeCursor(self)
+
+    def get_transaction_status(self):
+        """Fake connections are always idle between commands"""
+        return psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+    def rollback(self):
+        """Nothing to roll back"""
+
+    def close(self):
+        """Marks the connection as closed"""
+        self.closed = 1
+
+
+class SharedConnection:
+    """The old DatabaseConnection behaviour, every command gets the same connection"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    @asynccontextmanager
+    async def acquire(self):
+        """Hands out the one shared connection"""
+        yield self.conn
+
+
+async def simulated_command(source, query: str, params: tuple):
+    """Borrows a connection and runs one query without blocking the event loop"""
+    async with source.acquire() as conn:
+        def run():
+            with conn.cursor() as cursor:
+                cursor.execute(query, params)
+        await asyncio.to_thread(run)
+
+
+async def measure(source, commands: int, query: str, params: tuple) -> float:
+    """Returns commands per second for `commands` concurrent commands"""
+    start = time.perf_counter()
+    await asyncio.gather(*(simulated_command(source, query, params)
+                           for _ in range(commands)))
+    return commands / (time.perf_counter() - start)
+
+
+async def main(args: argparse.Namespace):
+    """Runs the shared connection and the pool side by side"""
+    if args.dsn:
+        def connect():
+            return psycopg2.connect(args.dsn)
+    else:
+        def connect():
+            return FakeConnection(args.latency)
+    query, params = "SELECT pg_sleep(%s)", (args.latency,)
+
+    shared = SharedConnection(connect())
+    pool = ConnectionPool(connect, min_size=args.pool_size, max_size=args.pool_size,
+                          health_check=not args.no_health_check)
+    await pool.open()
+    # Enough worker threads that the executor is not the bottleneck
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(args.commands))
+
+    print(f"{args.commands} concurrent commands, {args.latency * 1000:.0f} ms per query, "
+          f"{'postgres' if args.dsn else 'fake'} connections")
+    for name, source in (("shared connection", shared), (f"pool (max {args.pool_size})", pool)):
+        rates = [await measure(source, args.commands, query, params) for _ in range(args.rounds)]
+        print(f"{name:>20}: {max(rates):8.1f} commands/s (best of {args.rounds})")
+    await pool.close()
+    shared.conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--commands", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.01)
+    parser.add_argument("--pool-size", type=int, default=10)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--no-health-check", action="store_true")
+    parser.add_argument("--dsn", default=None)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,79 @@
+"""Event loop lag while 50 concurrent simulated commands run queries
+directly on the loop versus through AsyncDatabase.
+
+The direct run is what the cogs used to do: a psycopg2 call inside an
+`async def`, which freezes the loop (and the gateway heartbeat) until
+postgres answers. By default each query is a fake that sleeps for
+--latency seconds; pass --dsn to run `SELECT pg_sleep(latency)` instead.
+
+    python -m benchmarks.event_loop_lag
+    python -m benchmarks.event_loop_lag --dsn "dbname=phoenix host=localhost"
+"""
+import argparse
+import asyncio
+import time
+
+import psycopg2
+
+from bot.database_utils import AsyncDatabase, ConnectionPool, EventLoopLagMonitor
+from benchmarks.connection_pool import FakeConnection
+
+
+def query(latency: float, conn):
+    """One command's worth of database work"""
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT pg_sleep(%s)", (latency,))
+
+
+async def blocking_command(pool: ConnectionPool, latency: float):
+    """Borrows a connection and runs the query on the event loop"""
+    async with pool.acquire() as conn:
+        query(latency, conn)
+
+
+async def measure(command, commands: int) -> tuple[dict, float]:
+    """Returns the lag summary and commands per second for `commands` concurrent commands"""
+    monitor = EventLoopLagMonitor(interval=0.005, window=100_000)
+    monitor.start()
+    start = time.perf_counter()
+    await asyncio.gather(*(command() for _ in range(commands)))
+    elapsed = time.perf_counter() - start
+    await monitor.stop()
+    return monitor.summary(), commands / elapsed
+
+
+async def main(args: argparse.Namespace):
+    """Runs the blocking and the executor backed commands side by side"""
+    if args.dsn:
+        def connect():
+            return psycopg2.connect(args.dsn)
+    else:
+        def connect():
+            return FakeConnection(args.latency)
+
+    pool = ConnectionPool(connect, min_size=args.pool_size, max_size=args.pool_size)
+    await pool.open()
+    db = AsyncDatabase(pool)
+
+    print(f"{args.commands} concurrent commands, {args.latency * 1000:.0f} ms per query, "
+          f"{'postgres' if args.dsn else 'fake'} connections, pool of {args.pool_size}")
+    runs = (
+        ("blocking", lambda: blocking_command(pool, args.latency)),
+        ("AsyncDatabase", lambda: db.run(query, args.latency)),
+    )
+    for name, command in runs:
+        lag, rate = await measure(command, args.commands)
+        print(f"{name:>14}: lag p50 {lag['p50_ms']:7.1f} ms, p99 {lag['p99_ms']:7.1f} ms, "
+              f"max {lag['max_ms']:7.1f} ms, {rate:7.1f} commands/s")
+
+    db.shutdown()
+    await pool.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--commands", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.01)
+    parser.add_argument("--pool-size", type=int, default=10)
+    parser.add_argument("--dsn", default=None)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,172 @@
+"""EXPLAIN ANALYZE of the hot queries before and after
+database/migrations/0001_hot_path_indexes.sql on ~1M character events.
+
+DESTRUCTIVE: this runs schema.sql (which drops every table) against the
+--dsn database, so point it at a scratch database.
+
+    createdb phoenix_bench
+    python -m benchmarks.hot_path_indexes --dsn "dbname=phoenix_bench host=localhost"
+"""
+import argparse
+import json
+import statistics
+from pathlib import Path
+
+import psycopg2
+from psycopg2.extras import RealDictCursor
+
+from bot.database_utils import MigrationRunner
+
+DATABASE = Path(__file__).resolve().parent.parent / "database"
+
+SEED = """
+SELECT setseed(0.42);
+INSERT INTO server (server_id, server_name)
+    SELECT g, 'server ' || g FROM generate_series(1, %(servers)s) g;
+INSERT INTO race (race_name, speed, is_playable, server_id)
+    SELECT 'race ' || g, 30, TRUE, 1 + g %% %(servers)s FROM generate_series(1, 1000) g;
+INSERT INTO class (class_name, is_playable, server_id)
+    SELECT 'class ' || g, TRUE, 1 + g %% %(servers)s FROM generate_series(1, 1000) g;
+INSERT INTO player (player_name, server_id)
+    SELECT 'player_' || g, 1 + g %% %(servers)s FROM generate_series(1, %(players)s) g;
+-- Two characters per player, the first one selected
+INSERT INTO "character" (character_name, race_id, class_id, player_id, server_id, selected_character)
+    SELECT 'hero ' || n, 1 + (random() * 999)::int, 1 + (random() * 999)::int,
+           p.player_id, p.server_id, n = 1
+    FROM player p, generate_series(1, 2) n;
+INSERT INTO inventory (inventory_name, character_id)
+    SELECT 'initial_inventory', character_id FROM "character";
+-- 1 in 100 items are listed on the marketplace
+INSERT INTO item (item_name, value, inventory_id, is_selling, listed_value)
+    SELECT 'item ' || g, 10, 1 + (random() * (%(players)s * 2 - 1))::int, s, CASE WHEN s THEN 20 END
+    FROM (SELECT g, random() < 0.01 AS s FROM generate_series(1, %(items)s) g) items;
+INSERT INTO spells (spell_name, spell_description, spell_power, mana_cost, element_id, race_id, class_id, server_id)
+    SELECT 'spell ' || g, 'benchmark', 10, 10, 1,
+           CASE WHEN g %% 2 = 0 THEN 1 + (random() * 999)::int END,
+           CASE WHEN g %% 2 = 1 THEN 1 + (random() * 999)::int END,
+           1 + g %% %(servers)s
+    FROM generate_series(1, %(spells)s) g;
+INSERT INTO character_event (character_id, event_type_id, event_timestamp)
+    SELECT 1 + (random() * (%(players)s * 2 - 1))::int, 1 + (random() * 5)::int,
+           NOW() - random() * INTERVAL '365 days'
+    FROM generate_series(1, %(events)s);
+INSERT INTO location (location_name, channel_id, server_id)
+    SELECT 'location ' || g, 1000000 + g, 1 + g %% %(servers)s FROM generate_series(1, 10000) g;
+INSERT INTO settlements (settlement_name, thread_id, location_id, server_id)
+    SELECT 'settlement ' || g, 2000000 + g, g, 1 + g %% %(servers)s FROM generate_series(1, 10000) g;
+"""
+
+# name: (query, params), the queries are the ones in database_utils
+QUERIES = {
+    "player by name": (
+        "SELECT player_id FROM player WHERE player_name = %s AND server_id = %s",
+        ("player_4242", 4242 % 100 + 1)),
+    "selected character": (
+        """SELECT p.player_id, c.character_id, i.inventory_id
+        FROM player p
+        JOIN "character" c ON c.player_id = p.player_id
+        LEFT JOIN inventory i ON i.character_id = c.character_id
+        WHERE p.player_name = %s AND p.server_id = %s AND c.selected_character = TRUE
+        LIMIT 1""",
+        ("player_4242", 4242 % 100 + 1)),
+    "last event": (
+        """SELECT ce.event_timestamp FROM character_event AS ce
+        WHERE ce.character_id = %s AND ce.event_type_id = %s
+        ORDER BY ce.event_timestamp DESC LIMIT 1""",
+        (4242, 1)),
+    "items in inventory": (
+        """SELECT i.item_id, i.item_name, s.spell_name FROM item i
+        LEFT JOIN spells s ON i.spell_id = s.spell_id
+        WHERE i.inventory_id = %s""",
+        (4242,)),
+    "marketplace": (
+        """SELECT i.item_id, i.item_name, i.listed_value, c.character_name, p.player_name
+        FROM item AS i
+        JOIN inventory AS inv ON i.inventory_id = inv.inventory_id
+        JOIN "character" AS c ON inv.character_id = c.character_id
+        JOIN player AS p ON c.player_id = p.player_id
+        WHERE i.is_selling = TRUE""",
+        ()),
+    "learnable spells": (
+        """SELECT s.spell_id FROM "character" c
+        JOIN spells s ON s.race_id = c.race_id OR s.class_id = c.class_id
+        WHERE c.character_id = %s""",
+        (4242,)),
+    "location mapping": (
+        "SELECT channel_id, location_id FROM location WHERE server_id = %s", (42,)),
+    "settlement mapping": (
+        "SELECT thread_id, settlement_id FROM settlements WHERE server_id = %s", (42,)),
+}
+
+
+def scans(plan: dict) -> list[str]:
+    """Returns the scan nodes of a plan, e.g. 'Index Scan on character_event'"""
+    found = []
+    if "Scan" in plan["Node Type"] and "Relation Name" in plan:
+        found.append(f"{plan['Node Type']} on {plan['Relation Name']}")
+    for child in plan.get("Plans", []):
+        found.extend(scans(child))
+    return found
+
+
+def explain(conn, runs: int) -> dict[str, tuple[float, list[str]]]:
+    """Returns the median execution time in ms and the scans of every query"""
+    results = {}
+    with conn.cursor() as cursor:
+        for name, (query, params) in QUERIES.items():
+            times = []
+            for _ in range(runs):
+                cursor.execute("EXPLAIN (ANALYZE, FORMAT JSON) " + query, params)
+                plan = cursor.fetchone()["QUERY PLAN"][0]
+                times.append(plan["Execution Time"])
+            results[name] = (statistics.median(times), scans(plan["Plan"]))
+    conn.rollback()
+    return results
+
+
+def main(args: argparse.Namespace):
+    """Builds the dataset, explains the queries, migrates and explains them again"""
+    conn = psycopg2.connect(args.dsn, cursor_factory=RealDictCursor)
+    conn.autocommit = True
+    with conn.cursor() as cursor:
+        print("Creating schema and seeding...")
+        cursor.execute((DATABASE / "schema.sql").read_text())
+        cursor.execute((DATABASE / "seed.sql").read_text())
+        cursor.execute(SEED, vars(args))
+        cursor.execute("ANALYZE")
+        cursor.execute("SELECT count(*) FROM character_event")
+        print(f"{cursor.fetchone()['count']:,} character events, {args.players * 2:,} characters, "
+              f"{args.items:,} items, {args.spells:,} spells")
+    conn.autocommit = False
+
+    before = explain(conn, args.runs)
+    MigrationRunner(conn).run(target=1)
+    conn.autocommit = True
+    with conn.cursor() as cursor:
+        cursor.execute("ANALYZE")
+    conn.autocommit = False
+    after = explain(conn, args.runs)
+
+    print(f"\n{'query':<20} {'before ms':>10} {'after ms':>10} {'speedup':>8}")
+    for name in QUERIES:
+        (before_ms, before_scans), (after_ms, after_scans) = before[name], after[name]
+        print(f"{name:<20} {before_ms:10.3f} {after_ms:10.3f} {before_ms / after_ms:7.1f}x")
+        if args.verbose:
+            print(f"    before: {', '.join(before_scans)}\n    after:  {', '.join(after_scans)}")
+    if args.json:
+        print(json.dumps({"before": before, "after": after}, indent=2))
+    conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dsn", required=True)
+    parser.add_argument("--servers", type=int, default=100)
+    parser.add_argument("--players", type=int, default=50_000)
+    parser.add_argument("--items", type=int, default=200_000)
+    parser.add_argument("--spells", type=int, default=5_000)
+    parser.add_argument("--events", type=int, default=1_000_000)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--verbose", action="store_true", help="print the scans of each plan")
+    parser.add_argument("--json", action="store_true")
+    main(parser.parse_args())
@@ -0,0 +1,185 @@
+"""Purchase latency and correctness with concurrent buyers, the old
+multi-query buy_item versus the purchase_item database function.
+
+Every buyer thread has its own connection and keeps clicking Buy on
+random items from a small set of listings, so buyers race for the same
+items. After each run the log is checked for items that were sold more
+than once and the shard total for shards created out of thin air.
+
+DESTRUCTIVE: this runs schema.sql (which drops every table) against the
+--dsn database, so point it at a scratch database.
+
+    createdb phoenix_bench
+    python -m benchmarks.marketplace_purchase --dsn "dbname=phoenix_bench host=localhost"
+"""
+import argparse
+import random
+import statistics
+import threading
+import time
+from pathlib import Path
+
+import psycopg2
+from psycopg2.extras import RealDictCursor
+
+from bot.database_utils import InventoryDatabase, MigrationRunner, ReferenceData
+
+DATABASE = Path(__file__).resolve().parent.parent / "database"
+PRICE = 10
+
+
+def legacy_buy_item(conn, item_id: int, seller_name: str, buyer_name: str, value: int) -> bool:
+    """buy_item before purchase_item: ten round trips and no row locks"""
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                SELECT c.character_id
+                FROM character AS c
+                JOIN player AS p ON p.player_id = c.player_id
+                WHERE p.player_name = %s AND c.selected_character = TRUE
+            """, (buyer_name,))
+            buyer_character_id = cursor.fetchone()['character_id']
+            cursor.execute("""
+                SELECT c.character_id
+                FROM character AS c
+                JOIN player AS p ON p.player_id = c.player_id
+                WHERE p.player_name = %s AND c.selected_character = TRUE
+            """, (seller_name,))
+            seller_character_id = cursor.fetchone()['character_id']
+            cursor.execute(
+                "SELECT shards FROM character WHERE character_id = %s", (buyer_character_id,))
+            if cursor.fetchone()['shards'] < value:
+                return False
+            cursor.execute("""
+                UPDATE "item"
+                SET inventory_id = (
+                    SELECT i.inventory_id FROM inventory AS i WHERE i.character_id = %s LIMIT 1
+                ), is_selling = FALSE, listed_value = NULL
+                WHERE item_id = %s
+            """, (buyer_character_id, item_id))
+            cursor.execute("UPDATE character SET shards = shards - %s WHERE character_id = %s",
+                           (value, buyer_character_id))
+            cursor.execute("UPDATE character SET shards = shards + %s WHERE character_id = %s",
+                           (value, seller_character_id))
+            cursor.execute("SELECT event_type_id FROM event_type WHERE event_name = 'Buy'")
+            buy_event_id = cursor.fetchone()['event_type_id']
+            cursor.execute("SELECT event_type_id FROM event_type WHERE event_name = 'Sell'")
+            sell_event_id = cursor.fetchone()['event_type_id']
+            cursor.execute("INSERT INTO character_event (character_id, item_id, event_type_id) "
+                           "VALUES (%s, %s, %s)", (buyer_character_id, item_id, buy_event_id))
+            cursor.execute("INSERT INTO character_event (character_id, item_id, event_type_id) "
+                           "VALUES (%s, %s, %s)", (seller_character_id, item_id, sell_event_id))
+            conn.commit()
+            return True
+    except psycopg2.Error:
+        conn.rollback()
+        return False
+
+
+def setup(conn, args: argparse.Namespace) -> list[dict]:
+    """Creates the sellers, buyers and listings, returns the listings"""
+    with conn.cursor() as cursor:
+        cursor.execute((DATABASE / "schema.sql").read_text())
+        cursor.execute((DATABASE / "seed.sql").read_text())
+    conn.commit()
+    MigrationRunner(conn).run()
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            INSERT INTO server (server_id, server_name) VALUES (1, 'benchmark');
+            INSERT INTO race (race_name, speed, is_playable, server_id) VALUES ('race', 30, TRUE, 1);
+            INSERT INTO class (class_name, is_playable, server_id) VALUES ('class', TRUE, 1);
+            INSERT INTO player (player_name, server_id)
+                SELECT 'player_' || g, 1 FROM generate_series(1, %(characters)s) g;
+            INSERT INTO "character" (character_name, race_id, class_id, player_id, server_id,
+                                     selected_character, shards)
+                SELECT 'hero', 1, 1, player_id, 1, TRUE, %(shards)s FROM player;
+            INSERT INTO inventory (inventory_name, character_id)
+                SELECT 'initial_inventory', character_id FROM "character";
+            -- The listings belong to the first --sellers characters
+            INSERT INTO item (item_name, value, inventory_id, is_selling, listed_value)
+                SELECT 'item ' || g, %(price)s, 1 + g %% %(sellers)s, TRUE, %(price)s
+                FROM generate_series(1, %(items)s) g;
+            """, {**vars(args), 'characters': args.sellers + args.buyers, 'price': PRICE})
+        cursor.execute("""
+            SELECT i.item_id, c.character_id AS seller_id, p.player_name AS seller_name
+            FROM item AS i
+            JOIN inventory AS inv ON inv.inventory_id = i.inventory_id
+            JOIN "character" AS c ON c.character_id = inv.character_id
+            JOIN player AS p ON p.player_id = c.player_id""")
+        listings = cursor.fetchall()
+    conn.commit()
+    return listings
+
+
+def buyer(dsn: str, number: int, listings: list[dict], args, legacy: bool, latencies: list[float]):
+    """One buyer clicking Buy on random listings"""
+    conn = psycopg2.connect(dsn, cursor_factory=RealDictCursor)
+    rng = random.Random(number)
+    character_id = args.sellers + number + 1
+    buyer_name = f"player_{character_id}"
+    for _ in range(args.attempts):
+        listing = rng.choice(listings)
+        start = time.perf_counter()
+        if legacy:
+            legacy_buy_item(conn, listing['item_id'], listing['seller_name'], buyer_name, PRICE)
+        else:
+            InventoryDatabase.buy_item(conn, listing['item_id'], character_id, PRICE)
+        latencies.append(time.perf_counter() - start)
+    conn.close()
+
+
+def audit(conn, args: argparse.Namespace) -> dict:
+    """Counts double sales and checks that no shards were created"""
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            SELECT count(*) AS sales, count(DISTINCT ce.item_id) AS items
+            FROM character_event AS ce
+            JOIN event_type AS et ON et.event_type_id = ce.event_type_id
+            WHERE et.event_name = 'Buy'""")
+        sales = cursor.fetchone()
+        cursor.execute('SELECT sum(shards) AS shards, min(shards) AS lowest FROM "character"')
+        shards = cursor.fetchone()
+    conn.rollback()
+    expected = (args.sellers + args.buyers) * args.shards
+    return {'sales': sales['sales'], 'double_sales': sales['sales'] - sales['items'],
+            'shards_created': shards['shards'] - expected, 'lowest_balance': shards['lowest']}
+
+
+def main(args: argparse.Namespace):
+    """Runs the old and new purchase paths against a fresh marketplace each"""
+    conn = psycopg2.connect(args.dsn, cursor_factory=RealDictCursor)
+    print(f"{args.buyers} concurrent buyers x {args.attempts} attempts on {args.items} listings")
+    for name, legacy in (("legacy buy_item", True), ("purchase_item", False)):
+        listings = setup(conn, args)
+        ReferenceData.load(conn)
+        latencies = []
+        threads = [threading.Thread(target=buyer,
+                                    args=(args.dsn, number, listings, args, legacy, latencies))
+                   for number in range(args.buyers)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        latencies.sort()
+        p50 = statistics.median(latencies) * 1000
+        p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000
+        result = audit(conn, args)
+        print(f"{name:>16}: p50 {p50:6.2f} ms, p99 {p99:6.2f} ms, "
+              f"{len(latencies) / elapsed:7.0f} attempts/s, {result['sales']} sales, "
+              f"{result['double_sales']} double sales, {result['shards_created']} shards created, "
+              f"lowest balance {result['lowest_balance']}")
+    conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dsn", required=True)
+    parser.add_argument("--buyers", type=int, default=16)
+    parser.add_argument("--attempts", type=int, default=200)
+    parser.add_argument("--sellers", type=int, default=20)
+    parser.add_argument("--items", type=int, default=200)
+    parser.add_argument("--shards", type=int, default=1000)
+    main(parser.parse_args())
@@ -1,21 +1,37 @@
 from .combat import Combat
-from .status_effects import (Paralyze,
-                    Frozen,
-                    Burning,
-                    Poisoned,
-                    Charmed,
-                    Regenerating,
-                    Blessed,
-                    Confusion,
-                    ManaBoost,
-                    HealthBoost,
-                    ExtremeSpeed,
-                    Armor,
-                    Taunt,
-                    Leech,
-                    FireWeakness,
-                    WaterWeakness,
-                    EarthWeakness,
-                    AirWeakness)
+from .enemy import DIFFICULTIES, EnemyAI, make_goblin
+from .engine import Battle, Combatant, Spell, Item, Action, Event, CombatError
+from .raid import Raid, make_boss
+from .reaper import BattleReaper
+from .replay import Replay, ReplayError
+from .rng import RandomStream
+from .scheduler import TurnScheduler
+from .snapshot import SnapshotError, SnapshotWriter
+from .status_effects import EffectDefinition, StatusEffect, STATUS_EFFECTS, get_effect
 
-__all__ = ["Combat"]
+__all__ = [
+    "Combat",
+    "Battle",
+    "Combatant",
+    "Spell",
+    "Item",
+    "Action",
+    "Event",
+    "CombatError",
+    "EnemyAI",
+    "DIFFICULTIES",
+    "make_goblin",
+    "Raid",
+    "make_boss",
+    "BattleReaper",
+    "Replay",
+    "ReplayError",
+    "TurnScheduler",
+    "RandomStream",
+    "SnapshotError",
+    "SnapshotWriter",
+    "EffectDefinition",
+    "StatusEffect",
+    "STATUS_EFFECTS",
+    "get_effect",
+]
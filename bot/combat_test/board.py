@@ -0,0 +1,79 @@
+"""The one message a battle is played on"""
+import asyncio
+from collections import deque
+
+import discord
+
+# Discord refuses message content over this many characters
+MAX_CONTENT = 2000
+
+
+class BattleBoard:
+    """Keeps a battle on a single message that is edited instead of sending
+    new messages every turn.
+
+    `update` only records the new event lines, the turn embed and the
+    buttons. The message is edited afterwards, at most once every
+    `min_interval` seconds, with whatever is newest by then, so a burst
+    of turns, ticks and passives costs one edit instead of one message
+    each and a busy channel stays clear of Discord's rate limits. The
+    last `log_size` event lines are shown above the embed."""
+
+    def __init__(self, channel: discord.abc.Messageable, message: discord.Message | None = None,
+                 min_interval: float = 1.0, log_size: int = 15):
+        self.channel = channel
+        self.message = message
+        self.min_interval = min_interval
+        self.log: deque[str] = deque(maxlen=log_size)
+        self.embed: discord.Embed | None = None
+        self.view: discord.ui.View | None = None
+        self._dirty = False
+        self._last_edit = float('-inf')
+        self._task = None
+
+    def update(self, lines: list[str], embed: discord.Embed | None = None, view: discord.ui.View | None = None):
+        """Queues the lines, embed and buttons to be shown on the next edit"""
+        self.log.extend(lines)
+        self.embed = embed
+        self.view = view
+        self._dirty = True
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._edit_when_allowed())
+
+    async def close(self, lines: list[str], embed: discord.Embed | None = None):
+        """Shows the last lines without buttons, once every queued edit is done"""
+        self.update(lines, embed)
+        await self._task
+
+    async def _edit_when_allowed(self):
+        loop = asyncio.get_running_loop()
+        # Updates that come in while an edit is in flight are picked up by the next one
+        while self._dirty:
+            delay = self._last_edit + self.min_interval - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._dirty = False
+            await self._edit()
+            self._last_edit = loop.time()
+
+    def content(self) -> str:
+        """The newest event lines that fit in a message"""
+        lines = list(self.log)
+        while lines and sum(len(line) + 1 for line in lines) > MAX_CONTENT:
+            lines.pop(0)
+        # Discord needs some content, a zero width space shows nothing
+        return "\n".join(lines) or "\u200b"
+
+    async def _edit(self):
+        content = self.content()
+        try:
+            if self.message is not None:
+                try:
+                    await self.message.edit(content=content, embed=self.embed, view=self.view)
+                    return
+                except discord.NotFound:
+                    # Someone deleted the board, the battle carries on in a new one
+                    self.message = None
+            self.message = await self.channel.send(content, embed=self.embed, view=self.view)
+        except discord.HTTPException as e:
+            print(f"Could not update the battle board: {e}")
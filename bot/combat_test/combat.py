@@ -1,325 +1,42 @@
-"""Defines the rules of combat"""
+"""Runs battles on Discord, the rules of combat are in engine.py"""
 
 # pylint: disable= line-too-long
 import asyncio
-from random import randint, choice
+import io
+import time
+from os import environ as ENV
 import discord
 from discord.ext import commands
-import discord.ext
-from psycopg2.extensions import connection
-from bot.database_utils import DatabaseConnection
-from bot.combat_test.status_effects import (Paralyze,
-                    Frozen,
-                    Burning,
-                    Poisoned,
-                    Charmed,
-                    Regenerating,
-                    Blessed,
-                    Confusion,
-                    ManaBoost,
-                    HealthBoost,
-                    ExtremeSpeed,
-                    Armor,
-                    Taunt,
-                    Leech,
-                    FireWeakness,
-                    WaterWeakness,
-                    EarthWeakness,
-                    AirWeakness
-)
-class Player:
-    """A Player object for each character in the game"""
-    def __init__(self, user: discord.User, conn: connection, cog: commands.Cog):
-        self.cog = cog
-        self.user = user
-        self.id = user.id
-        self.name = user.name
-        self.mention = user.mention
-        self.mana_hidden = False
-        self.data = self.get_character_data(conn)
-        self.char_name = self.data.get('character_name')
-        self.max_health = self.data.get('health')
-        self.health = self.data.get('health')
-        self.max_mana = self.data.get('mana')
-        self.mana = self.data.get('mana')
-        self.speed = self.data.get('speed')
-        self.image = self.data.get('image_url', None)
-        self.race_name = self.data.get('race_name')
-        self.class_name = self.data.get('class_name')
-        self.status_effects = []
-
-        # self.attack_power = random.randint(5, 10)
-        self.spells = [
-            Spell(
-                self,
-                spell.get('spell_name'),
-                spell.get('spell_power'),
-                spell.get('mana_cost'),
-                spell.get('cooldown'),
-                spell.get('element_name'),
-                spell.get('status_name'),
-                spell.get('chance'),
-                spell.get('duration'),
-                spell.get('spell_type_name')
-            )
-            for spell in self.get_equipped_spells(conn)
-        ]
-
-        self.inventory = [
-            Item(item.get('item_name'),
-                Spell(self,
-                    item.get('spell_name'),
-                    item.get('spell_power'),
-                    0, # Mana cost
-                    item.get('cooldown'),
-                    item.get('element_name'),
-                    item.get('status_name'),
-                    item.get('chance'),
-                    item.get('duration'),
-                    item.get('spell_type_name')),
-                item.get('spell_charges')
-            )
-            for item in self.get_enchanted_inventory(conn)
-        ]
-
-
-    def get_character_data(self, conn: connection) -> dict:
-        """Gets data for the selected player character"""
-        with conn.cursor() as cursor:
-            cursor.execute("""
-                    SELECT c.player_id,
-                            c.character_id,
-                            c.character_name,
-                            c.health,
-                            c.mana,
-                            c.craft_skill,
-                            c.shards,
-                            c.experience,
-                            c.image_url,
-                            r.race_name,
-                            cl.class_name,
-                            r.speed
-                    FROM character AS c
-                    JOIN race AS r ON c.race_id = r.race_id
-                    JOIN class AS cl ON c.class_id = cl.class_id
-                    WHERE c.player_id = (
-                        SELECT player_id FROM player WHERE player_name = %s
-                    AND selected_character = TRUE
-                    );
-                """, (self.name,))
-            return cursor.fetchone()
-
-    def take_damage(self, damage: int):
-        """Player takes damage equal to damage variable"""
-        self.health -= damage
-        return self.health <= 0
-
-    def get_equipped_spells(self, conn: connection) -> list[dict]:
-        """Checks the last equipped spells"""
-        query = """
-                SELECT 
-                    s.spell_id,
-                    s.spell_name,
-                    s.spell_description,
-                    s.spell_power,
-                    s.mana_cost,
-                    s.cooldown,
-                    e.element_name,
-                    ss.status_name,
-                    sa.chance,
-                    sa.duration,
-                    st.spell_type_name
-                FROM character c
-                JOIN player p ON c.player_id = p.player_id
-                JOIN character_spell_assignment csa ON c.character_id = csa.character_id
-                JOIN spells s ON csa.spell_id = s.spell_id
-                JOIN element e ON s.element_id = e.element_id
-                LEFT JOIN spell_status_spell_assignment sa ON s.spell_id = sa.spell_id
-                LEFT JOIN spell_status ss ON sa.spell_status_id = ss.spell_status_id
-                JOIN spell_type st ON s.spell_type_id = st.spell_type_id
-                WHERE p.player_name = %s
-                AND c.selected_character = TRUE
-                ORDER BY sa.spell_status_spell_assignment_id DESC
-                LIMIT 4;
-                """
-        with conn.cursor() as cursor:
-            cursor.execute(query, (self.name,))
-            return cursor.fetchall()
-    
-    def get_enchanted_inventory(self, conn: connection) -> list[dict]:
-        """Gets the inventory of the selected character that contains enchanted items using the player_name"""
-
-        query = """
-            SELECT 
-                i.item_name,
-                i.spell_charges,
-                s.spell_name,
-                s.spell_power,
-                s.cooldown,
-                e.element_name,
-                ss.status_name,
-                sa.chance,
-                sa.duration,
-                st.spell_type_name
-            FROM character c
-            JOIN player p ON c.player_id = p.player_id
-            JOIN inventory inv ON c.character_id = inv.character_id
-            JOIN item i ON inv.inventory_id = i.inventory_id
-            JOIN spells s ON i.spell_id = s.spell_id
-            JOIN element e ON s.element_id = e.element_id
-            LEFT JOIN spell_status_spell_assignment sa ON s.spell_id = sa.spell_id
-            LEFT JOIN spell_status ss ON sa.spell_status_id = ss.spell_status_id
-            JOIN spell_type st ON s.spell_type_id = st.spell_type_id
-            WHERE p.player_name = %s
-            AND c.selected_character = TRUE
-            AND i.spell_id IS NOT NULL
-            ORDER BY i.item_name;
-        """
-
-        with conn.cursor() as cursor:
-            cursor.execute(query, (self.name,))
-            return cursor.fetchall()
-
-
-    def get_exp(self, conn: connection, experience: int):
-        """Adds experience to the player"""
-        with conn.cursor() as cursor:
-            cursor.execute("""
-                        WITH selected_character AS (
-                            SELECT c.character_id
-                            FROM "character" c
-                            JOIN player p ON c.player_id = p.player_id
-                            WHERE p.player_name = %s
-                            AND c.selected_character = TRUE
-                        )
-                        UPDATE "character"
-                        SET experience = experience + %s
-                        WHERE character_id IN (SELECT character_id FROM selected_character)
-                        RETURNING experience;
-                           """, (self.name, experience))
-            new_experience = cursor.fetchone().get('experience')
-            conn.commit()
-            return f"""{self.mention} has received **{experience:.1f}** experience points!
-            They now have **{new_experience:.1f}** experience!"""
-
-    def show_exp(self, conn: connection) -> int:
-        """Returns their current amount of xp"""
-        with conn.cursor() as cursor:
-            cursor.execute("""
-                            SELECT c.experience
-                            FROM "character" c
-                            JOIN player p ON c.player_id = p.player_id
-                            WHERE p.player_name = %s
-                            AND c.selected_character = TRUE
-                        """, (self.name,))
-            return int(cursor.fetchone().get('experience'))
-
-
-class Spell:
-    """A Spell object that can be cast to damage a player or to inflict a status effect on them"""
-    def __init__(self,
-                 caster: str,
-                 name: str,
-                 power: int,
-                 cost: int,
-                 cooldown: int,
-                 element: str,
-                 status: str,
-                 chance: int,
-                 duration: int,
-                 spell_type: str):
-        self.caster = caster
-        self.name = name
-        self.power = power
-        self.cost = cost
-        self.cooldown = cooldown
-        self.element = element
-        self.status = self.get_status(status, chance, duration)
-        self.spell_type = spell_type
-
-    def get_status(self, status, chance, duration):
-        """Returns the correct object for the status type"""
-        status_map = {
-            "None": None,
-            "Paralyze": Paralyze,
-            "Frozen": Frozen,
-            "Burning": Burning,
-            "Poisoned": Poisoned,
-            "Charmed": Charmed,
-            "Regenerating": Regenerating,
-            "Blessed": Blessed,
-            "Confusion": Confusion,
-            "Mana Boost": ManaBoost,
-            "Health Boost": HealthBoost,
-            "Extreme Speed": ExtremeSpeed,
-            "Armor": Armor,
-            "Taunt": Taunt,
-            "Fire Weakness": FireWeakness,
-            "Water Weakness": WaterWeakness,
-            "Earth Weakness": EarthWeakness,
-            "Air Weakness": AirWeakness,
-            "Leech": Leech,
-        }
-        status_class = status_map.get(status)
-
-        return status_class(self.caster, self.power, chance, duration) if status_class else None
-
-
-    def cast(self, caster: Player, targets: list[Player] | Player):
-        """Casts the spell on the target(s)"""
-
-        # If a single target is provided, convert it to a list for uniform handling
-        if isinstance(targets, Player):
-            targets = [targets]
-
-        caster.mana -= self.cost
-        results = []
-
-        for target in targets:
-            if self.status:
-                results.append(self.status.apply_status(target))
-            else:
-                results.append(target.take_damage(self.power))
+from bot.database_utils import DatabaseConnection, AsyncDatabase
+from bot.combat_test.board import BattleBoard
+from bot.combat_test.enemy import DIFFICULTIES, EnemyAI, make_goblin
+from bot.combat_test.engine import Battle, Combatant, Action, Event, CombatError, Spell
+from bot.combat_test.raid import Raid, make_boss
+from bot.combat_test.reaper import BattleReaper
+from bot.combat_test.replay import ReplayError, play, record, dumps as dump_replay, loads as load_replay
+from bot.combat_test.scheduler import TurnScheduler
+from bot.combat_test.snapshot import SnapshotError, SnapshotWriter, encode, loads
 
-        return results
+# An Area of Effect cast on more targets than this is summed up in one line
+AOE_DETAIL = 3
 
 
-    def get_targets(self, caster: Player, players: list[Player]) -> list[Player]:
-        """Determines valid targets for a spell"""
-        # Initialize the list of targets based on the spell type
-        if self.spell_type == "Single Target":
-            targets = [caster] + players
-        elif self.spell_type == "Area of Effect":
+def mention(combatant_id: int) -> str:
+    """Mentions the Discord user playing a combatant"""
+    return f"<@{combatant_id}>"
 
-            targets = players
-        elif self.spell_type == "Passive":
-            targets = [caster]
-        else:
-            targets = players
 
-        for status in caster.status_effects:
-            if hasattr(status, 'change_targets'):
-                targets = status.change_targets(
-                    caster, targets)
+def who(battle: Battle, combatant_id: int) -> str:
+    """Mentions the user playing a combatant, or names a combatant the bot plays"""
+    if combatant_id in battle.npcs:
+        return f"**{battle.get(combatant_id).name}**"
+    return mention(combatant_id)
 
-        return targets
 
-
-class Item:
-    """An item object that has a spell enchantment that a player can use"""
-
-    def __init__(self, name: str, spell: Spell, charges: int):
-        self.name = name
-        self.spell = spell
-        self.charges = charges
-
-    def use(self, target: Player):
-        """Lets the player use the items effect on the target."""
-        return self.effect(target)
-
-    def effect(self):
-        """Users the spell effect"""
-        pass
+def generate_bar(value: float, max_value: float, length: int = 10) -> str:
+    """Generates bars for health and mana"""
+    filled = int((value / max_value) * length)
+    return f"[{'█' * filled}{' ' * (length - filled)}] {value:.2f}/{max_value:.2f}"
 
 
 class Combat(commands.Cog):
@@ -343,102 +60,307 @@ class Combat(commands.Cog):
     - Target Phase; if the player chose item or spell.
     then choose a target to cast the spell or item on.
 
-    For each choice the player should be presented with buttons."""
-    def __init__(self, bot: commands.Bot, conn: connection):
+    For each choice the player should be presented with buttons.
+
+    The rules live in engine.Battle, this cog loads the combatants,
+    feeds the Battle the players' actions and shows the events it returns."""
+    def __init__(self, bot: commands.Bot, db: AsyncDatabase):
         self.bot = bot
-        self.conn = conn
-        self.active_battles = {}
+        self.db = db
+        self.active_battles: dict[int, Battle] = {}
+        # One action at a time per battle, battles don't wait on each other
+        self.battle_locks: dict[int, asyncio.Lock] = {}
+        # The message each battle is played on
+        self.boards: dict[int, BattleBoard] = {}
+        # Every battle in progress is saved after each turn, so a restart can resume it
+        self.snapshots = SnapshotWriter(db.combat.save_snapshot, db.combat.delete_snapshot)
+        # Battles nobody has moved in for this many seconds are closed
+        self.reaper = BattleReaper(self.expire_battle, idle_timeout=float(ENV.get('BATTLE_IDLE_TIMEOUT', 900)))
+        # A player who hasn't acted this many seconds into their turn meditates,
+        # raiders who haven't acted this many seconds into their group's turn miss it
+        self.turn_timeout = float(ENV.get('TURN_TIMEOUT', 180))
+        self.raid_turn_timeout = float(ENV.get('RAID_TURN_TIMEOUT', 60))
+        self.turns = TurnScheduler(self.skip_turn, self.turn_timeout)
+        # The state each battle's replay starts from, by battle id
+        self.openings: dict[int, dict] = {}
+        self.resumed = False
         print('Combat cog loaded')
 
-    @commands.command()
-    async def combat(self, ctx: commands.Context):
-        """Commands the flow of combat by initializing the encounter"""
-        battle_id = ctx.channel.id
-        self.active_battles[battle_id] = {
-            "players": [],
-            "turn_order": [],
-            "current_turn": None,
-            "status_effects": {},
-            "enemy": None,
-            "experience": 0,
-        }
-
-        battle_message = await ctx.send("A battle is starting! Click 'Join' to enter.")
-        view = JoinBattleView(self, ctx, battle_id, battle_message)
-
-        await battle_message.edit(view=view)
-
-
-    async def start_battle(self, ctx: commands.Context, battle_id: int):
-        """Starts the battle by setting players and turn order"""
-        battle = self.active_battles[battle_id]
-        players = battle["players"]
-
-        # if len(players) < 2:
-        #     enemy = EnemyAI()
-        #     battle["enemy"] = enemy
-        #     players.append(enemy)
-        #     await ctx.send(f"An enemy AI has joined the battle: {enemy.name}!")
+    async def cog_load(self):
+        """Starts saving battle snapshots, passing turns nobody took and closing idle battles"""
+        self.snapshots.start()
+        self.reaper.start()
+        self.turns.start()
+
+    async def cog_unload(self):
+        """Writes the last snapshots and stops"""
+        await self.turns.stop()
+        await self.reaper.stop()
+        await self.snapshots.stop()
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        """Resumes the battles that were in progress when the bot stopped"""
+        if self.resumed:
+            return
+        self.resumed = True
+        for row in await self.db.combat.get_snapshots():
+            battle_id = row['battle_id']
+            channel = self.bot.get_channel(battle_id)
+            try:
+                battle = loads(row['state'])
+            except SnapshotError as e:
+                print(f'Battle {battle_id} could not be resumed: {e}')
+                channel = None
+            if channel is None:
+                self.snapshots.discard(battle_id)
+                continue
+
+            self.active_battles[battle_id] = battle
+            self.openings[battle_id] = encode(battle)
+            self.reaper.touch(battle_id)
+            print(f'Battle {battle_id} resumed at turn {battle.turn} with seed {battle.seed}')
+            # The old board's buttons died with the bot, so the battle goes on in a new one
+            self.boards[battle_id] = BattleBoard(channel)
+            self.show_turn(channel, battle, ["The battle resumes where it left off!"])
 
-        turn_order = sorted(players, key=lambda p: randint(
-            1, 20) + p.speed, reverse=True)
+    @commands.command()
+    async def combat(self, ctx: commands.Context, difficulty: str = 'normal'):
+        """Commands the flow of combat by initializing the encounter. A player who
+        starts it alone fights a goblin of the difficulty: easy, normal or hard"""
+        if difficulty not in DIFFICULTIES:
+            await ctx.send(f"The difficulty must be one of {', '.join(DIFFICULTIES)}.")
+            return
+        await self.open_battle(ctx, Battle(ctx.channel.id), "A battle is starting! Click 'Join' to enter.", difficulty)
 
-        battle["turn_order"] = turn_order
-        battle["current_turn"] = turn_order[0]
+    @commands.command()
+    async def raid(self, ctx: commands.Context, difficulty: str = 'normal'):
+        """Gathers any number of players to fight a boss of the difficulty together"""
+        if difficulty not in DIFFICULTIES:
+            await ctx.send(f"The difficulty must be one of {', '.join(DIFFICULTIES)}.")
+            return
+        raid = Raid(ctx.channel.id)
+        raid.join_boss(make_boss(), EnemyAI(difficulty), experience=200)
+        await self.open_battle(ctx, raid, f"A raid on {raid.boss.name} is forming! Click 'Join' to enter.", difficulty)
+
+    async def open_battle(self, ctx: commands.Context, battle: Battle, announcement: str, difficulty: str):
+        """Posts the message players join the battle on"""
+        battle_id = battle.battle_id
+        # A channel holds one battle at a time, its deadlines and snapshot are kept by its id
+        if battle_id in self.active_battles:
+            await ctx.send("A battle is already in progress in this channel!")
+            return
+        self.active_battles[battle_id] = battle
+        self.reaper.touch(battle_id)
+        # Logged so the battle can be replayed with the same rolls
+        print(f'Battle {battle_id} started with seed {battle.seed}')
 
-        await ctx.send(f"""Battle has begun! {turn_order[0].mention
-                                            if hasattr(turn_order[0], 'mention')
-                                            else turn_order[0].name} goes first.""")
+        battle_message = await ctx.send(announcement)
+        # The join message becomes the board the battle is played on
+        self.boards[battle_id] = BattleBoard(ctx.channel, battle_message)
+        view = JoinBattleView(self, ctx, battle_id, battle_message, difficulty)
 
-        await self.next_turn(ctx, battle_id)
+        await battle_message.edit(view=view)
 
-    async def next_turn(self, ctx: commands.Context, battle_id: int):
-        """The flow of combat"""
+    async def load_combatants(self, users: list[discord.abc.User],
+                              server_id: int) -> dict[int, tuple[Combatant, float]]:
+        """Loads the selected character, spells and inventory of every user at once and
+        the experience each character is worth, by user id. Users without a selected
+        character are left out"""
+        rows = await self.db.combat.get_combatants([user.name for user in users], server_id)
+        combatants = {}
+        for user in users:
+            if user.name in rows:
+                loadout = rows[user.name]
+                combatant = Combatant.from_rows(user.id, user.display_name, loadout['character'],
+                                                loadout['spells'], loadout['items'])
+                combatants[user.id] = combatant, max(loadout['character'].get('experience') / 10, 50)
+        return combatants
+
+    def battle_lock(self, battle_id: int) -> asyncio.Lock:
+        """The lock that lets one action of the battle through at a time"""
+        lock = self.battle_locks.get(battle_id)
+        if lock is None:
+            lock = self.battle_locks[battle_id] = asyncio.Lock()
+        return lock
+
+    async def start_battle(self, ctx: commands.Context, battle_id: int, users: list[discord.abc.User],
+                           difficulty: str = 'normal'):
+        """Loads the users that joined and starts the battle by setting players and turn order,
+        a player on their own fights a goblin of the difficulty"""
+        async with self.battle_lock(battle_id):
+            battle = self.active_battles.get(battle_id)
+            if battle is None:
+                return
+            # e.g. a second click on Start that waited for the first one
+            if battle.turn:
+                raise CombatError("The battle has already started!")
+            self.reaper.touch(battle_id)
+            users = [user for user in users if battle.get(user.id) is None]
+            combatants = await self.load_combatants(users, ctx.guild.id)
+            lines = []
+            for user in users:
+                if user.id in combatants:
+                    battle.join(*combatants[user.id])
+                else:
+                    lines.append(f"{mention(user.id)} needs to select a character first and sits this battle out.")
+
+            if not isinstance(battle, Raid) and len(battle.players) == 1:
+                goblin = make_goblin()
+                battle.join(goblin, 50, EnemyAI(difficulty))
+                lines.append(f"A {difficulty} **{goblin.name}** has joined the battle!")
+
+            self.openings[battle_id] = encode(battle)
+            await self.show_events(ctx, battle_id, battle.start(), lines)
+
+    async def resolve(self, ctx: commands.Context, battle_id: int, action: Action):
+        """Feeds the turn player's action to the battle and shows what happened.
+        Actions of the same battle wait for each other, so the one after a double
+        click finds its turn over instead of playing the next turn too"""
+        battle = self.active_battles.get(battle_id)
+        if battle is None:
+            return
+        if action.turn is not None and action.turn != battle.turn:
+            raise CombatError("That turn is already over!")
+        async with self.battle_lock(battle_id):
+            if self.active_battles.get(battle_id) is not battle:
+                return
+            await self.show_events(ctx, battle_id, battle.act(action))
+
+    async def show_events(self, ctx: commands.Context, battle_id: int, events: list[Event], lines: list[str] = None,
+                          touch: bool = True):
+        """Puts what happened and then the next turn or the result of the battle on the board,
+        `touch` is False when no one moved, so the battle still counts as idle"""
         battle = self.active_battles[battle_id]
-        turn_order = battle["turn_order"]
-        battle["turn_order"] = [
-            player for player in turn_order if player.health > 0]
-
-        turn_order = battle["turn_order"]
-
-
-        if len(turn_order) <= 1:
-            for player in battle.get('players'):
-                await ctx.send(player.get_exp(self.conn, battle["experience"]))
-            winner = turn_order[0] if turn_order else None
-            await ctx.send(f'Because they won, {winner.get_exp(self.conn, battle["experience"])}')
-            message = (
-                f"The battle is over! {winner.mention if hasattr(winner, 'mention') else winner.name} is the winner!"
-                if winner
-                else "The battle has ended with no winner."
-            )
-            await ctx.send(message)
-            del self.active_battles[battle_id]
+        lines = (lines or []) + self.describe_all(battle, events)
+        new_turn = any(event.kind in (Event.TURN, Event.ENDED) for event in events)
+        # The turns of the combatants the bot plays are taken straight away
+        while not battle.over and battle.current_turn is not None and battle.current_turn.id in battle.npcs:
+            player = battle.current_turn
+            # The search takes up to its time budget, the other battles carry on meanwhile
+            action = await asyncio.to_thread(battle.npcs[player.id].choose, battle, player)
+            lines += self.describe_all(battle, battle.act(action))
+            new_turn = True
+
+        if battle.over:
+            await self.end_battle(ctx, battle, lines)
+            return
+        self.snapshots.save(battle)
+        if touch:
+            self.reaper.touch(battle_id)
+        self.show_turn(ctx, battle, lines, new_turn)
+
+    def show_turn(self, ctx: commands.Context, battle: Battle, lines: list[str], new_turn: bool = True):
+        """Puts the lines and the turn the battle waits for on the board, with new
+        buttons and deadline if the turn is new. A raid group's turn keeps its buttons until it passes"""
+        board = self.boards[battle.battle_id]
+        raid = isinstance(battle, Raid)
+        if not new_turn:
+            board.update(lines, embed=self.raid_embed(battle) if raid else board.embed, view=board.view)
             return
 
-        current_player = turn_order.pop(0)
-        battle["current_turn"] = current_player
-        turn_order.append(current_player)
-
-        for status_effect in current_player.status_effects:
-            await ctx.send(f'{status_effect.reduce_status(current_player)}')
-
-        for spell in current_player.spells:
-            # If Passive, cast immediately
-            if spell.spell_type == "Passive":
-                if current_player.mana > spell.cost:
-                    result = spell.cast(current_player, current_player)
-                    asyncio.create_task(ctx.send(
-                        f"{current_player.mention} Passive effect activates **{spell.name}**!\n{result[0] if result else ''}"))
-                else:
-                    asyncio.create_task(ctx.send(
-                        f"{current_player.mention} Passive effect **{spell.name}** fails to activate!"))
+        # The turn has passed, so have the buttons and menus of the last one
+        self.reaper.retire(battle.battle_id)
+        if raid:
+            board.update(lines, embed=self.raid_embed(battle), view=RaidView(self, ctx, battle.battle_id, battle.turn))
+            self.turns.schedule(battle.battle_id, battle.turn, self.raid_turn_timeout)
+        else:
+            board.update(lines, embed=self.turn_embed(battle.current_turn),
+                         view=ActionView(self, ctx, battle.battle_id, battle.current_turn, battle.turn,
+                                         timeout=self.turn_timeout))
+            self.turns.schedule(battle.battle_id, battle.turn)
+
+    async def skip_turn(self, battle_id: int, turn: int):
+        """Passes a turn nobody took in time: the turn player meditates, a raid
+        group's turn passes without the raiders who haven't acted"""
+        async with self.battle_lock(battle_id):
+            battle = self.active_battles.get(battle_id)
+            board = self.boards.get(battle_id)
+            if battle is None or board is None or battle.over or battle.turn != turn:
+                return
+            if isinstance(battle, Raid) and battle.group is not None:
+                line = f"{len(battle.waiting_for())} raiders ran out of time and miss their turn."
+                events = battle.close_turn()
+            else:
+                player = battle.current_turn
+                line = f"{mention(player.id)} ran out of time."
+                events = battle.act(Action(Action.MEDITATE, player.id, turn=turn))
+            # A battle whose players all walked away is still closed by the reaper
+            await self.show_events(board.channel, battle_id, events, [line], touch=False)
+
+    def describe_all(self, battle: Battle, events: list[Event]) -> list[str]:
+        """The message lines for the events, an Area of Effect cast that hits more
+        than AOE_DETAIL targets is summed up in one line"""
+        lines = []
+        index = 0
+        while index < len(events):
+            event = events[index]
+            if event.kind == Event.CAST and event.target is None:
+                end = index + 1
+                while end < len(events) and events[end].kind in (Event.DAMAGE, Event.STATUS_APPLIED, Event.FAINTED):
+                    end += 1
+                if end - index - 1 > AOE_DETAIL:
+                    lines.append(self.summarize_aoe(battle, event, events[index + 1:end]))
+                    index = end
+                    continue
+            line = self.describe(battle, event)
+            if line:
+                lines.append(line)
+            index += 1
+        return lines
+
+    def summarize_aoe(self, battle: Battle, cast: Event, results: list[Event]) -> str:
+        """One line for everything an Area of Effect cast did"""
+        hits = [event for event in results if event.kind == Event.DAMAGE]
+        statuses = [event for event in results if event.kind == Event.STATUS_APPLIED]
+        fainted = sum(1 for event in results if event.kind == Event.FAINTED)
+        outcomes = []
+        if hits:
+            outcomes.append(f"{len(hits)} take {hits[0].amount} damage")
+        if statuses:
+            landed = sum(event.amount for event in statuses)
+            outcomes.append(f"{landed} are affected and {len(statuses) - landed} resisted")
+        if fainted:
+            outcomes.append(f"{fainted} fainted")
+        return f"{who(battle, cast.actor)} casts **{cast.spell}** on everyone! {', '.join(outcomes)}."
+
+    def describe(self, battle: Battle, event: Event) -> str | None:
+        """The message line for an event, the turn itself is shown as an embed"""
+        actor = who(battle, event.actor) if event.actor else None
+        target = battle.get(event.target) if event.target else None
+        match event.kind:
+            case Event.STARTED:
+                return f"Battle has begun! {actor} goes first."
+            case Event.STATUS_TICK:
+                return event.text
+            case Event.PASSIVE:
+                return f"{actor} Passive effect activates **{event.spell}**!\n{event.text or ''}"
+            case Event.PASSIVE_FAILED:
+                return f"{actor} Passive effect **{event.spell}** fails to activate!"
+            case Event.ATTACK:
+                return f"{actor} attacks!"
+            case Event.NOT_ENOUGH_MANA:
+                return f"{actor} doesn't have enough mana to cast **{event.spell}**!"
+            case Event.CAST if target:
+                return f"{actor} casts **{event.spell}** on {who(battle, target.id)}!"
+            case Event.CAST:
+                return f"{actor} casts **{event.spell}** on everyone!"
+            case Event.STATUS_APPLIED:
+                return event.text
+            case Event.DAMAGE:
+                return f"{target.name} takes {event.amount} damage!"
+            case Event.FAINTED:
+                return f"{who(battle, target.id)} has fainted!"
+            case Event.MEDITATE:
+                player = battle.get(event.actor)
+                return f"{actor} meditates and restores {event.amount} mana!\nCurrent Mana {player.mana}/{player.max_mana}"
+            case Event.FLED:
+                return f"{actor} flees the battle!"
+        return None
+
+    def turn_embed(self, current_player: Combatant) -> discord.Embed:
+        """The turn player's health, mana and status effects"""
         # Generate Health & Mana Bars
-        def generate_bar(value, max_value, length=10):
-            """Generates bars for health and mana"""
-            filled = int((value / max_value) * length)
-            return f"[{'█' * filled}{' ' * (length - filled)}] {value:.2f}/{max_value:.2f}"
-
         health_bar = generate_bar(
             current_player.health, current_player.max_health)
         mana_bar = generate_bar(current_player.mana, current_player.max_mana)
@@ -450,74 +372,190 @@ class Combat(commands.Cog):
         embed.add_field(name="Health", value=health_bar, inline=False)
         embed.add_field(name="Mana", value=mana_bar, inline=False)
         for i, status in enumerate(current_player.status_effects):
-            embed.add_field(name=f"Status {i+1}", value=status.status, inline=False)
-
-        if isinstance(current_player, EnemyAI):
-            await current_player.take_action(ctx, self, battle_id)
+            embed.add_field(name=f"Status {i+1}", value=status.name, inline=False)
+        return embed
+
+    def raid_embed(self, battle: Raid) -> discord.Embed:
+        """The boss's health and who in the group whose turn it is still has to act"""
+        boss = battle.boss
+        embed = discord.Embed(title=f"Raid on {boss.char_name}",
+                              description=f"Group {battle.group + 1} of {len(battle.groups)}, what's your move?",
+                              color=discord.Color.dark_red())
+        embed.add_field(name="Health", value=generate_bar(boss.health, boss.max_health), inline=False)
+        embed.add_field(name="Raiders standing", value=str(len(battle.raiders())), inline=False)
+        embed.add_field(name="Waiting for",
+                        value=" ".join(mention(player.id) for player in battle.waiting_for()) or "No one", inline=False)
+        return embed
+
+    async def end_battle(self, ctx: commands.Context, battle: Battle, lines: list[str]):
+        """Gives everyone the experience, the winner twice, and closes the battle"""
+        del self.active_battles[battle.battle_id]
+        self.battle_locks.pop(battle.battle_id, None)
+        self.snapshots.discard(battle.battle_id)
+        self.reaper.close(battle.battle_id)
+        self.turns.cancel(battle.battle_id)
+        board = self.boards.pop(battle.battle_id)
+        players = [player for player in battle.players if player.id not in battle.npcs]
+        winners = [player for player in battle.winners() if player.id not in battle.npcs]
+        experience = {player.character_id: battle.experience for player in players}
+        for winner in winners:
+            experience[winner.character_id] += battle.experience
+        totals = await self.db.combat.add_experience_many(experience)
+        replay_id = await self.save_replay(battle)
+
+        if isinstance(battle, Raid):
+            boss = who(battle, battle.boss.id)
+            lines.append(f"{len(players)} raiders have received **{battle.experience:.1f}** experience points"
+                         + (f", the {len(winners)} still standing twice that!" if winners else "!"))
+            lines.append(f"The raid is over! {boss} has been defeated!" if battle.boss.health <= 0
+                         else f"The raid is over! {boss} has wiped out the raid.")
         else:
-            targets = turn_order[:-1]
-            await ctx.send(embed=embed, view=ActionView(self, ctx, battle_id, current_player, targets))
-
-
-class EnemyAI:
-    """An Enemy AI object that will make moves against human players"""
-    def __init__(self):
-        self.name = "Goblin Warrior"
-        self.health = 20
-        self.attack_damage = randint(3, 7)
-
-    async def take_action(self, ctx: commands.Context, cog: Combat, battle_id: int):
-        """Lets the NPC choose a player and attack them"""
-        battle = cog.active_battles[battle_id]
-        players = [p for p in battle["players"] if not isinstance(p, EnemyAI)]
-        if not players:
+            for player in players:
+                lines.append(f"{mention(player.id)} has received **{experience[player.character_id]:.1f}** experience points"
+                             f"{', twice as much for winning' if player in winners else ''}! "
+                             f"They now have **{totals.get(player.character_id, 0):.1f}** experience!")
+            lines.append(
+                f"The battle is over! {who(battle, battle.winner.id)} is the winner!"
+                if battle.winner
+                else "The battle has ended with no winner.")
+        if replay_id is not None:
+            lines.append(f"This battle was saved as replay **{replay_id}**.")
+        await board.close(lines)
+
+    async def save_replay(self, battle: Battle) -> int | None:
+        """Stores the replay of a battle that is over, returns its replay_id"""
+        opening = self.openings.pop(battle.battle_id, None)
+        if opening is None:
+            return None
+        winner_id = battle.winner.id if battle.winner else None
+        try:
+            return await self.db.combat.save_replay(battle.battle_id, battle.turn, winner_id,
+                                                    dump_replay(record(opening, battle)))
+        except Exception as e:
+            # The battle itself is done, only the record of it is lost
+            print(f"Could not save the replay of battle {battle.battle_id}: {e}")
+            return None
+
+    async def expire_battle(self, battle_id: int):
+        """Closes a battle the reaper found idle, no one gets experience for it"""
+        # Waits for an action that is still being shown
+        async with self.battle_lock(battle_id):
+            battle = self.active_battles.pop(battle_id, None)
+        self.battle_locks.pop(battle_id, None)
+        self.turns.cancel(battle_id)
+        board = self.boards.pop(battle_id, None)
+        if battle is None:
             return
+        self.snapshots.discard(battle_id)
+        await self.save_replay(battle)
+        print(f'Battle {battle_id} expired at turn {battle.turn}')
+        if board is not None:
+            minutes = self.reaper.idle_timeout / 60
+            await board.close([f"The battle was closed after {minutes:.0f} minutes without a move."])
 
-        target = choice(players)
-        await ctx.send(f"{self.name} attacks {target.mention} for {self.attack_damage} damage!")
-        await cog.next_turn(ctx, battle_id)
+    @commands.command()
+    async def battle_stats(self, ctx: commands.Context):
+        """Shows how many battles and views are alive, how many battles were closed for
+        being idle and how many turns were passed for taking too long"""
+        if not ctx.author.guild_permissions.administrator:
+            await ctx.send("You must be an admin to use this command.")
+            return
+
+        stats = self.reaper.stats()
+        turns = self.turns.stats()
+        joining = sum(1 for battle in self.active_battles.values() if not battle.turn)
+        await ctx.send(
+            f"Battles: {len(self.active_battles)} live ({joining} waiting for players), "
+            f"{stats['reaped']} closed for being idle\n"
+            f"Views: {stats['views']} listening for clicks\n"
+            f"Turns: {turns['waiting']} on the clock, {turns['expired']} passed for taking too long")
+
+    @commands.command()
+    async def replay(self, ctx: commands.Context, replay_id: int):
+        """Plays a finished battle again from its replay and posts how it went, e.g. to settle a dispute"""
+        if not ctx.author.guild_permissions.administrator:
+            await ctx.send("You must be an admin to use this command.")
+            return
+
+        data = await self.db.combat.get_replay(replay_id)
+        if data is None:
+            await ctx.send(f"There is no replay {replay_id}.")
+            return
+        started = time.perf_counter()
+        try:
+            replay = load_replay(data)
+            battle, events = play(replay)
+        except ReplayError as e:
+            await ctx.send(f"Replay {replay_id} can't be played: {e}")
+            return
+        elapsed = (time.perf_counter() - started) * 1000
+
+        result = (f"{who(battle, battle.winner.id)} won" if battle.winner
+                  else "The raid won" if isinstance(battle, Raid) and battle.over
+                  else "No one won" if battle.over else "The battle was left unfinished")
+        log = "\n".join(self.describe_all(battle, events))
+        await ctx.send(f"Replay {replay_id}: {len(replay.actions)} actions over {battle.turn} turns, "
+                       f"played again in {elapsed:.1f} ms. {result}.",
+                       file=discord.File(io.BytesIO(log.encode()), filename=f"replay_{replay_id}.txt"))
 
 
 class JoinBattleView(discord.ui.View):
     """The View that Players will be presented with to join combat"""
-    def __init__(self, cog: Combat, ctx: commands.Context, battle_id: int, battle_message: str):
+    def __init__(self, cog: Combat, ctx: commands.Context, battle_id: int, battle_message: discord.Message,
+                 difficulty: str = 'normal'):
         super().__init__()
         self.cog = cog
         self.ctx = ctx
         self.battle_id = battle_id
         self.battle_message = battle_message
-        self.players = []
+        self.difficulty = difficulty
+        # Only the users are recorded, their characters are loaded together at the start
+        self.joined: dict[int, discord.abc.User] = {}
+        cog.reaper.track(battle_id, self)
+
+    async def on_timeout(self):
+        self.cog.reaper.forget(self.battle_id, self)
 
     @discord.ui.button(label="Join Battle", style=discord.ButtonStyle.green)
     async def join_battle(self, interaction: discord.Interaction, button: discord.ui.Button):
         """A Button that allows the player to join combat"""
-        
+        battle = self.cog.active_battles.get(self.battle_id)
         user = interaction.user
-        if user in self.players:
+        if battle is None:
+            await interaction.response.send_message("This battle is over.", ephemeral=True)
+            return
+        if battle.turn:
+            await interaction.response.send_message("The battle has already started!", ephemeral=True)
+            return
+        if user.id in self.joined:
             await interaction.response.send_message("You've already joined!", ephemeral=True)
             return
 
-        player = Player(user, self.cog.conn, self.cog)
-        
-
-        self.players.append(user)
-        self.cog.active_battles[self.battle_id]["players"].append(player)
-        self.cog.active_battles[self.battle_id]["experience"] += max(
-            (player.show_exp(self.cog.conn) / 10), 50)
-
-        await self.battle_message.edit(content=f"{len(self.players)} players have joined the battle.")
+        self.joined[user.id] = user
+        self.cog.reaper.touch(self.battle_id)
         await interaction.response.send_message("You joined the battle!", ephemeral=True)
-
-
+        await self.battle_message.edit(content=f"{len(self.joined)} players have joined the battle.")
 
     @discord.ui.button(label="Start Battle", style=discord.ButtonStyle.blurple)
     async def start_battle(self, interaction: discord.Interaction, button: discord.ui.Button):
         """Lets the players start combat with the number of players that has joined"""
-        if len(self.players) > 1:
-            await self.cog.start_battle(self.ctx, self.battle_id)
-        else:
-            await interaction.response.send_message("You need another player to start the battle", ephemeral=True)
-
+        battle = self.cog.active_battles.get(self.battle_id)
+        if battle is None:
+            await interaction.response.send_message("This battle is over.", ephemeral=True)
+            return
+        if battle.turn:
+            await interaction.response.send_message("The battle has already started!", ephemeral=True)
+            return
+        try:
+            await interaction.response.defer()
+            await self.cog.start_battle(self.ctx, self.battle_id, list(self.joined.values()), self.difficulty)
+        except CombatError as e:
+            await interaction.followup.send(str(e), ephemeral=True)
+            return
+        # The board has the turn's buttons now, these no longer do anything
+        for item in self.children:
+            item.disabled = True
+        self.stop()
 
     @discord.ui.button(label="Cancel", style=discord.ButtonStyle.red)
     async def cancel_battle(self, interaction: discord.Interaction, button: discord.ui.Button):
@@ -526,221 +564,220 @@ class JoinBattleView(discord.ui.View):
             await interaction.response.send_message("Only the battle initiator can cancel!", ephemeral=True)
             return
 
-        del self.cog.active_battles[self.battle_id]
+        self.cog.active_battles.pop(self.battle_id, None)
+        self.cog.battle_locks.pop(self.battle_id, None)
+        self.cog.boards.pop(self.battle_id, None)
+        self.cog.reaper.close(self.battle_id)
         await self.battle_message.edit(content="The battle has been canceled.", view=None)
         await interaction.response.send_message("Battle canceled.", ephemeral=True)
 
 
-class ActionView(discord.ui.View):
-    """View for player actions.
-    Casting a spell
-    Using an item
-    Meditating
-    or Fleeing"""
+class TurnView(discord.ui.View):
+    """Base class for the views of one turn, only the turn player can use them
+    and only on that turn"""
 
-    def __init__(self, cog: Combat, ctx: commands.Context, battle_id: int, player: Player, targets: list[Player]):
-        super().__init__()
+    def __init__(self, cog: Combat, ctx: commands.Context, battle_id: int, player: Combatant, turn: int, timeout: int = 180):
+        super().__init__(timeout=timeout)
         self.cog = cog
         self.ctx = ctx
         self.battle_id = battle_id
         self.player = player
-        self.targets = targets
+        self.turn = turn
+        cog.reaper.track(battle_id, self)
+
+    async def on_timeout(self):
+        self.cog.reaper.forget(self.battle_id, self)
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        if interaction.user.id != self.player.id:
+            await interaction.response.send_message("It's not your turn!", ephemeral=True)
+            return False
+        return True
+
+    def acting(self, interaction: discord.Interaction) -> Combatant:
+        """The combatant of the user who clicked"""
+        return self.player
+
+    async def resolve(self, interaction: discord.Interaction, action: Action):
+        """Acknowledges the click and resolves the action"""
+        await interaction.response.defer()
+        try:
+            await self.cog.resolve(self.ctx, self.battle_id, action)
+        except CombatError as e:
+            await interaction.followup.send(str(e), ephemeral=True)
+
+
+class ActionView(TurnView):
+    """View for player actions.
+    Casting a spell
+    Using an item
+    Meditating
+    or Fleeing"""
 
     @discord.ui.button(label="Attack", style=discord.ButtonStyle.red)
     async def attack(self, interaction: discord.Interaction, button: discord.ui.Button):
         """Attack action"""
-        if interaction.user != self.player.user:
-            await interaction.response.send_message("It's not your turn!", ephemeral=True)
-            return
-
-        await interaction.response.send_message(f"{self.player.mention} attacks!", ephemeral=False)
-        await self.cog.next_turn(self.ctx, self.battle_id)
+        await self.resolve(interaction, Action(Action.ATTACK, self.acting(interaction).id, turn=self.turn))
 
     @discord.ui.button(label="Spell", style=discord.ButtonStyle.blurple)
     async def spell(self, interaction: discord.Interaction, button: discord.ui.Button):
         """Spell action"""
-        if interaction.user != self.player.user:
-            await interaction.response.send_message("It's not your turn!", ephemeral=True)
-            return
-        await interaction.response.send_message("Choose a spell!", view=SpellSelectionView(self.ctx, self.player, self.targets, self.battle_id), ephemeral=True)
-
+        await interaction.response.send_message("Choose a spell!", view=SpellSelectionView(self.cog, self.ctx, self.battle_id, self.acting(interaction), self.turn, Action.CAST), ephemeral=True)
 
     @discord.ui.button(label="Item", style=discord.ButtonStyle.green)
     async def item(self, interaction: discord.Interaction, button: discord.ui.Button):
         """Item action"""
-        if interaction.user != self.player.user:
-            await interaction.response.send_message("It's not your turn!", ephemeral=True)
-            return
-
-        await interaction.response.send_message("Choose an item!", view=ItemSelectionView(self.ctx, self.player, self.targets, self.battle_id), ephemeral=True)
+        await interaction.response.send_message("Choose an item!", view=SpellSelectionView(self.cog, self.ctx, self.battle_id, self.acting(interaction), self.turn, Action.USE_ITEM), ephemeral=True)
 
     @discord.ui.button(label="Meditate", style=discord.ButtonStyle.gray)
     async def meditate(self, interaction: discord.Interaction, button: discord.ui.Button):
         """Regenerate mana"""
-
-        if interaction.user != self.player.user:
-            await interaction.response.send_message("It's not your turn!", ephemeral=True)
-            return
-
-        restore = randint(int(self.player.max_mana // 3),
-                            int(self.player.max_mana))
-
-        self.player.mana += restore
-        self.player.mana = min(self.player.mana, self.player.max_mana)
-        await interaction.response.send_message(f"{self.player.mention} meditates and restores {restore} mana!\nCurrent Mana {self.player.mana}/{self.player.max_mana}", ephemeral=False)
-
-        await self.cog.next_turn(self.ctx, self.battle_id)
+        await self.resolve(interaction, Action(Action.MEDITATE, self.acting(interaction).id, turn=self.turn))
 
     @discord.ui.button(label="Run", style=discord.ButtonStyle.danger)
     async def run(self, interaction: discord.Interaction, button: discord.ui.Button):
         """Concede the battle"""
-        if interaction.user != self.player.user:
-            await interaction.response.send_message("It's not your turn!", ephemeral=True)
-            return
+        await self.resolve(interaction, Action(Action.RUN, self.acting(interaction).id, turn=self.turn))
 
-        await interaction.response.send_message(f"{self.player.mention} flees the battle!", ephemeral=False)
-        self.cog.active_battles[self.battle_id]["turn_order"].remove(
-            self.player)
 
-        await self.cog.next_turn(self.ctx, self.battle_id)
+class RaidView(ActionView):
+    """The buttons of a raid group's turn, one view shared by the whole group.
+    Each member can use them once, the menus they open are their own"""
 
+    def __init__(self, cog: Combat, ctx: commands.Context, battle_id: int, turn: int):
+        super().__init__(cog, ctx, battle_id, None, turn)
 
-async def setup(bot: commands.Bot):
-    """Sets up the combat cog with a database connection.
-    This allows the commands to be used by the Discord bot"""
-    conn = DatabaseConnection.get_connection()
-    await bot.add_cog(Combat(bot, conn))
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        battle = self.cog.active_battles.get(self.battle_id)
+        if battle is None or battle.turn != self.turn or not battle.can_act(interaction.user.id):
+            await interaction.response.send_message("It's not your group's turn, or you've already acted!", ephemeral=True)
+            return False
+        return True
 
+    def acting(self, interaction: discord.Interaction) -> Combatant:
+        return self.cog.active_battles[self.battle_id].get(interaction.user.id)
 
-class ItemSelectionView(discord.ui.View):
-    """Creates a button foe each item"""
 
-    def __init__(self, ctx: commands.Command, player: Player, targets: list[Player], battle_id: int, timeout = 60):
-        super().__init__(timeout=timeout)
-        self.ctx = ctx
-        self.player = player
-        self.targets = targets
-        self.battle_id = battle_id
+async def setup(bot: commands.Bot):
+    """Sets up the combat cog with the database access layer.
+    This allows the commands to be used by the Discord bot"""
+    db = DatabaseConnection.get_database()
+    await bot.add_cog(Combat(bot, db))
 
-        for item in self.player.inventory:
-            # No need for passives to get a button
-            if item.spell.spell_type != "Passive":
-                self.add_item(SpellButton(self.ctx, item.spell, self.player, self.targets, self.battle_id))
 
-class SpellSelectionView(discord.ui.View):
-    """Dynamically creates buttons for each spell"""
+class SpellSelectionView(TurnView):
+    """Dynamically creates buttons for each spell, or each enchanted item"""
 
-    def __init__(self, ctx: commands.Context, player: Player, targets: list[Player], battle_id: int, timeout: int = 60):
-        super().__init__(timeout=timeout)
-        self.ctx = ctx
-        self.player = player
-        self.targets = targets
-        self.battle_id = battle_id
+    def __init__(self, cog: Combat, ctx: commands.Context, battle_id: int, player: Combatant, turn: int, kind: str, timeout: int = 60):
+        super().__init__(cog, ctx, battle_id, player, turn, timeout=timeout)
+        spells = player.spells if kind == Action.CAST else [item.spell for item in player.inventory]
 
         # Create a button for each spell
-        for spell in self.player.spells:
-            # If Passive, cast immediately
+        for index, spell in enumerate(spells):
+            # No need for passives to get a button
             if spell.spell_type != "Passive":
-                self.add_item(SpellButton(self.ctx, spell, self.player, self.targets, self.battle_id))
+                self.add_item(SpellButton(Action(kind, player.id, index, turn=turn), spell))
 
 
 class SpellButton(discord.ui.Button):
     """Button representing a spell"""
 
-    def __init__(self, ctx: commands.Context, spell: Spell, player: Player, targets: list[Player], battle_id: int):
-        super().__init__(label=f'{spell.name}\n({spell.cost if player.mana_hidden is False else '???'}) mana', style=discord.ButtonStyle.green)
-        self.ctx = ctx
+    def __init__(self, action: Action, spell: Spell):
+        super().__init__(label=f'{spell.name}\n({spell.cost if spell.caster.mana_hidden is False else '???'}) mana', style=discord.ButtonStyle.green)
+        self.action = action
         self.spell = spell
-        self.player = player
-        self.targets = targets
-        self.battle_id = battle_id
 
     async def callback(self, interaction: discord.Interaction):
         """Step 1: Player selects a spell"""
-        await interaction.response.defer()
+        view: TurnView = self.view
+        if view.player.mana < self.spell.cost:
+            # The battle reports the missing mana and the turn is lost
+            await view.resolve(interaction, self.action)
+            return
 
-        if self.player.mana < self.spell.cost:
-            await interaction.followup.send("You don't have enough mana to cast this spell!", ephemeral=True)
-            await self.player.cog.next_turn(self.ctx, self.battle_id)
-        else:
-            # Step 2: Open target selection menu
-            view = TargetSelectionView(self.ctx, self.spell, self.player, self.targets, self.battle_id)
-            await interaction.followup.send("Choose your target:", view=view, ephemeral=True)
+        # Step 2: Open target selection menu
+        battle = view.cog.active_battles.get(view.battle_id)
+        if battle is None:
+            await interaction.response.send_message("This battle is over.", ephemeral=True)
+            return
+        target_view = TargetSelectionView(view.cog, view.ctx, view.battle_id, view.player, self.action, self.spell, battle)
+        await interaction.response.send_message("Choose your target:", view=target_view, ephemeral=True)
 
 
-class TargetSelectionView(discord.ui.View):
-    """Creates buttons for choosing a target"""
+class TargetSelectionView(TurnView):
+    """Creates buttons for choosing a target, or a select menu a page at a
+    time when there are more targets than a message can have buttons"""
+    # Discord allows 25 buttons on a message and 25 options in a select menu
+    PAGE_SIZE = 25
 
-    def __init__(self, ctx: commands.Context, spell: Spell, caster: Player, players: list[Player], battle_id: int, timeout: int = 30):
-        super().__init__(timeout=timeout)
-        self.ctx = ctx
-        self.spell = spell
-        self.caster = caster
-        self.battle_id = battle_id
+    def __init__(self, cog: Combat, ctx: commands.Context, battle_id: int, player: Combatant, action: Action, spell: Spell, battle: Battle, page: int = 0, timeout: int = 30):
+        super().__init__(cog, ctx, battle_id, player, action.turn, timeout=timeout)
 
-        # Determine valid targets
         if spell.spell_type == "Area of Effect":
-            self.add_item(AOETargetButton(
-                ctx, spell, players, caster, battle_id))
-        else:
+            self.add_item(TargetButton("Cast on all targets", action))
+            return
+
+        targets = battle.targets(player, spell)
+        if len(targets) <= self.PAGE_SIZE:
             # Create a button for each individual target for single-target spells
-            targets = spell.get_targets(caster, players)
             for target in targets:
-                self.add_item(TargetButton(
-                    ctx, spell, target, caster, battle_id))
+                self.add_item(TargetButton(target.name, action._replace(target=target.id)))
+            return
+
+        pages = -(-len(targets) // self.PAGE_SIZE)
+        page = min(page, pages - 1)
+        self.add_item(TargetSelect(action, targets[page * self.PAGE_SIZE:(page + 1) * self.PAGE_SIZE],
+                                   f"Choose your target ({page + 1}/{pages})"))
+        if page > 0:
+            self.add_item(PageButton("Previous", page - 1, action, spell))
+        if page < pages - 1:
+            self.add_item(PageButton("Next", page + 1, action, spell))
 
 
 class TargetButton(discord.ui.Button):
-    """Button representing a target"""
+    """Button representing a target, or every target of an Area of Effect spell"""
 
-    def __init__(self, ctx: commands.Context, spell: Spell, target: Player, caster: Player, battle_id: int):
-        super().__init__(label=target.user.display_name, style=discord.ButtonStyle.red)
-        self.ctx = ctx
-        self.spell = spell
-        self.target = target
-        self.caster = caster
-        self.battle_id = battle_id
+    def __init__(self, label: str, action: Action):
+        super().__init__(label=label, style=discord.ButtonStyle.red)
+        self.action = action
 
     async def callback(self, interaction: discord.Interaction):
         """Step 3: Player selects a target, spell is cast"""
-        await interaction.response.defer()
-        result = self.spell.cast(self.caster, self.target)  # Call spell logic
-
-        await interaction.followup.send(f"{self.caster.mention} casts **{self.spell.name}** on {self.target.mention}!\n{result if result and isinstance(result, str) else ""}")
-        await self.caster.cog.next_turn(self.ctx, self.battle_id)
-        if result is True:
-            await self.ctx.send(f'{self.target.mention} has fainted')
+        await self.view.resolve(interaction, self.action)
 
 
+class TargetSelect(discord.ui.Select):
+    """Select menu of one page of targets"""
 
-class AOETargetButton(discord.ui.Button):
-    """Button representing an Area of Effect spell"""
-
-    def __init__(self, ctx: commands.Context, spell: Spell, targets: list[Player], caster: Player, battle_id: int):
-        super().__init__(label="Cast on all targets", style=discord.ButtonStyle.red)
-        self.ctx = ctx
-        self.spell = spell
-        self.targets = targets
-        self.caster = caster
-        self.battle_id = battle_id
+    def __init__(self, action: Action, targets: list[Combatant], placeholder: str):
+        super().__init__(placeholder=placeholder, options=[
+            discord.SelectOption(label=target.name[:100], value=str(target.id),
+                                 description=f"{target.health:.0f}/{target.max_health:.0f} health")
+            for target in targets])
+        self.action = action
 
     async def callback(self, interaction: discord.Interaction):
-        """Casts the AOE spell when clicked"""
-
-        await interaction.response.defer()
+        """Step 3: Player selects a target, spell is cast"""
+        await self.view.resolve(interaction, self.action._replace(target=int(self.values[0])))
 
-        # Cast the spell on all valid targets
-        results = self.spell.cast(self.caster, self.targets)
-        result_text = "\n".join(
-            [f"{target.name}: {result}" for target,
-                result in zip(self.targets, results)]
-        )
 
-        await interaction.followup.send(f"{self.caster.mention} casts **{self.spell.name}** on everyone!\n{result_text}")
+class PageButton(discord.ui.Button):
+    """Button turning the target select menu to another page"""
 
-        await self.caster.cog.next_turn(self.ctx, self.battle_id)
+    def __init__(self, label: str, page: int, action: Action, spell: Spell):
+        super().__init__(label=label, style=discord.ButtonStyle.gray)
+        self.page = page
+        self.action = action
+        self.spell = spell
 
-        # Check if any targets fainted
-        for target in self.targets:
-            if target.health <= 0:
-                await self.ctx.send(f"{target.mention} has fainted!")
+    async def callback(self, interaction: discord.Interaction):
+        """Shows the page in place of this one"""
+        view: TurnView = self.view
+        battle = view.cog.active_battles.get(view.battle_id)
+        if battle is None:
+            await interaction.response.send_message("This battle is over.", ephemeral=True)
+            return
+        view.stop()
+        view.cog.reaper.forget(view.battle_id, view)
+        await interaction.response.edit_message(view=TargetSelectionView(
+            view.cog, view.ctx, view.battle_id, view.player, self.action, self.spell, battle, self.page))
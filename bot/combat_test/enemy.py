@@ -0,0 +1,251 @@
+"""The combatants the bot plays and the search that chooses their actions"""
+import time
+from typing import NamedTuple
+
+from .engine import Action, Battle, Combatant, Spell
+from .raid import Raid
+from .rng import RandomStream
+from .status_effects import StatusEffect
+
+GOBLIN_ID = -2
+
+# Statuses worth casting on oneself rather than on an opponent:
+# Regenerating, Blessed, Mana Boost, Health Boost, Extreme Speed and Armor
+_HELPFUL = frozenset({8, 9, 11, 12, 13, 14})
+
+
+def make_goblin() -> Combatant:
+    """The opponent of a player who starts a battle on their own"""
+    goblin = Combatant(GOBLIN_ID, "Goblin Warrior", None, "Goblin Warrior", health=100, mana=60, speed=5)
+    goblin.spells = [Spell(goblin, "Slash", 14, 0, 1, "Earth", None, None, None, "Single Target"),
+                     Spell(goblin, "Poison Dart", 8, 15, 1, "Earth", "Poisoned", 60, 3, "Single Target"),
+                     Spell(goblin, "Mend", 10, 20, 1, "Water", "Regenerating", 90, 3, "Single Target")]
+    return goblin
+
+
+class Difficulty(NamedTuple):
+    """How hard an EnemyAI thinks: how many turns ahead it looks, how many
+    rolls it tries for every chance it takes and how long it may think"""
+    depth: int
+    samples: int
+    budget: float
+
+
+DIFFICULTIES = {
+    'easy': Difficulty(depth=1, samples=1, budget=0.01),
+    'normal': Difficulty(depth=2, samples=2, budget=0.05),
+    'hard': Difficulty(depth=4, samples=3, budget=0.05),
+}
+
+
+class _OutOfTime(Exception):
+    pass
+
+
+class EnemyAI:
+    """Chooses the actions of a combatant the bot plays.
+
+    It plays the turns ahead on copies of the battle with the engine's own
+    rules and picks the action with the best expected outcome (expectimax).
+    On its own turns it takes the best action, the opponents' turns and the
+    rolls of statuses and meditation are chances that are averaged: every
+    action an opponent can take is equally likely and each roll is tried
+    `samples` times. In a raid group's turn, which would have far too many
+    outcomes to average, every member casts whatever does the most damage.
+    Positions it has already valued are cached, so the same position
+    reached in another order or on a later turn is not searched again.
+
+    The search deepens one turn at a time until the difficulty's depth or
+    its time budget is reached, whichever comes first, and uses the deepest
+    search that finished. When not even one turn ahead finishes in time it
+    casts whatever does the most damage this turn.
+
+    The copies roll from the AI's own stream, never from the battle's, so
+    it can't foresee the rolls the battle will make."""
+
+    # Single target spells are only tried on this many of the weakest opponents
+    TARGETS = 3
+    CACHE_SIZE = 100_000
+
+    def __init__(self, difficulty: str = 'normal', seed: int | None = None):
+        if difficulty not in DIFFICULTIES:
+            raise ValueError(f"Unknown difficulty {difficulty}, pick one of {', '.join(DIFFICULTIES)}")
+        self.difficulty = difficulty
+        self.depth, self.samples, self.budget = DIFFICULTIES[difficulty]
+        self.rng = RandomStream(seed)
+        self.cache: dict[tuple, float] = {}
+        # How deep the last decision searched and how many positions it valued
+        self.searched = 0
+        self.nodes = 0
+        self.hits = 0
+
+    def choose(self, battle: Battle, player: Combatant) -> Action:
+        """The action the player takes on the battle's current turn"""
+        deadline = time.perf_counter() + self.budget
+        self.searched = self.nodes = self.hits = 0
+        best = self.greedy(battle, player)
+        actions = self.candidates(battle, player)
+        if len(actions) == 1:
+            return actions[0]
+
+        for depth in range(1, self.depth + 1):
+            try:
+                scores = [self._expected(battle, action, depth, player.id, deadline) for action in actions]
+            except _OutOfTime:
+                break
+            best = actions[max(range(len(actions)), key=scores.__getitem__)]
+            self.searched = depth
+        return best
+
+    def greedy(self, battle: Battle, player: Combatant) -> Action:
+        """The action that does the most damage this turn: the Area of Effect spell
+        with the most power over all its targets, or the strongest single target
+        spell at the weakest target. It meditates when it can't afford any spell"""
+        spells = [(index, spell) for index, spell in enumerate(player.spells)
+                  if spell.spell_type != "Passive" and player.mana >= spell.cost]
+        opponents = battle.opponents(player)
+        if not spells or not opponents:
+            return Action(Action.MEDITATE, player.id, turn=battle.turn)
+
+        def damage(entry) -> float:
+            _, spell = entry
+            return spell.power * (len(opponents) if spell.spell_type == "Area of Effect" else 1)
+
+        index, spell = max(spells, key=damage)
+        if spell.spell_type == "Area of Effect":
+            return Action(Action.CAST, player.id, index, turn=battle.turn)
+        opponent_ids = {opponent.id for opponent in opponents}
+        targets = [target for target in battle.targets(player, spell) if target.id in opponent_ids]
+        if not targets:
+            return Action(Action.MEDITATE, player.id, turn=battle.turn)
+        target = min(targets, key=lambda target: target.health)
+        return Action(Action.CAST, player.id, index, target=target.id, turn=battle.turn)
+
+    def candidates(self, battle: Battle, player: Combatant) -> list[Action]:
+        """The actions worth searching: every spell and item the player can afford,
+        helpful statuses on themselves and everything else on the TARGETS weakest
+        opponents they may aim at, then meditating"""
+        opponents = sorted(battle.opponents(player), key=lambda opponent: opponent.health)
+        weakest = opponents[:self.TARGETS]
+        actions = []
+        slots = [(Action.CAST, player.spells), (Action.USE_ITEM, [item.spell for item in player.inventory])]
+        for kind, spells in slots:
+            for index, spell in enumerate(spells):
+                if spell.spell_type == "Passive" or player.mana < spell.cost:
+                    continue
+                if spell.spell_type == "Area of Effect":
+                    if opponents:
+                        actions.append(Action(kind, player.id, index, turn=battle.turn))
+                    continue
+                allowed = {target.id for target in battle.targets(player, spell)}
+                if spell.status and spell.status.status_id in _HELPFUL:
+                    aims = [player]
+                else:
+                    aims = weakest
+                actions.extend(Action(kind, player.id, index, target=target.id, turn=battle.turn)
+                               for target in aims if target.id in allowed)
+        actions.append(Action(Action.MEDITATE, player.id, turn=battle.turn))
+        return actions
+
+    def evaluate(self, battle: Battle, me: int) -> float:
+        """How good the position is for the combatant: their health and some of
+        their mana against the health the others have left, winning outweighs it all"""
+        player = battle.get(me)
+        others = [other for other in battle.players if other.id != me and other.id not in battle.npcs]
+        score = max(player.health, 0) / (player.max_health or 1) + 0.1 * player.mana / (player.max_mana or 1)
+        if others:
+            score -= sum(max(other.health, 0) / (other.max_health or 1) for other in others) / len(others)
+            score += 0.5 * sum(1 for other in others if other.health <= 0) / len(others)
+        if battle.over:
+            score += 10 if player in battle.winners() else -10
+        return score
+
+    def _expected(self, battle: Battle, action: Action, depth: int, me: int, deadline: float) -> float:
+        """The average value of the positions the action leads to over its rolls"""
+        spell = None if action.kind == Action.MEDITATE else battle.spell_for(battle.get(action.actor), action)
+        rolls = action.kind == Action.MEDITATE or (spell is not None and spell.status is not None and spell.status.lasting)
+        samples = self.samples if rolls else 1
+        total = 0
+        for _ in range(samples):
+            position = self._copy(battle)
+            self._check(deadline)
+            position.act(action)
+            total += self._value(position, depth - 1, me, deadline)
+        return total / samples
+
+    def _value(self, battle: Battle, depth: int, me: int, deadline: float) -> float:
+        self._check(deadline)
+        self.nodes += 1
+        if battle.over or depth == 0:
+            return self.evaluate(battle, me)
+
+        key = (me, depth, self._key(battle))
+        value = self.cache.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+
+        if isinstance(battle, Raid) and battle.group is not None:
+            position = self._copy(battle)
+            group = position.group
+            while not position.over and position.group == group:
+                self._check(deadline)
+                member = position.waiting_for()[0]
+                position.act(self.greedy(position, member))
+            value = self._value(position, depth - 1, me, deadline)
+        else:
+            player = battle.current_turn
+            values = [self._expected(battle, action, depth, me, deadline)
+                      for action in self.candidates(battle, player)]
+            value = max(values) if player.id == me else sum(values) / len(values)
+
+        if len(self.cache) >= self.CACHE_SIZE:
+            self.cache.clear()
+        self.cache[key] = value
+        return value
+
+    @staticmethod
+    def _check(deadline: float):
+        """Gives up the search once the decision's time is up"""
+        if time.perf_counter() > deadline:
+            raise _OutOfTime
+
+    @staticmethod
+    def _key(battle: Battle) -> tuple:
+        """What tells positions apart, whatever turn they were reached on"""
+        current = battle.current_turn.id if battle.current_turn else None
+        players = tuple((player.id, round(player.health, 1), round(player.mana, 1), player.speed,
+                         tuple((effect.definition.status_id, effect.duration) for effect in player.status_effects))
+                        for player in battle.players)
+        if isinstance(battle, Raid):
+            return current, battle.group, frozenset(battle.acted), players
+        return current, players
+
+    def _copy(self, battle: Battle) -> Battle:
+        """A copy of the battle to play ahead on, rolling from the AI's stream"""
+        position = battle.__class__.__new__(battle.__class__)
+        position.__dict__.update(battle.__dict__)
+        copies = {}
+        for player in battle.players:
+            copy = Combatant.__new__(Combatant)
+            for field in Combatant.__slots__:
+                setattr(copy, field, getattr(player, field))
+            copy.weaknesses = list(player.weaknesses)
+            copies[player.id] = copy
+        for player in battle.players:
+            copies[player.id].status_effects = [
+                StatusEffect(effect.definition, copies.get(effect.caster.id, effect.caster), effect.power, effect.duration)
+                for effect in player.status_effects]
+
+        position.players = list(copies.values())
+        position._by_id = copies
+        position.turn_order = battle.turn_order.__class__(copies[player.id] for player in battle.turn_order)
+        position.current_turn = copies[battle.current_turn.id] if battle.current_turn else None
+        position._root = position.rng = RandomStream(self.rng.randint(0, 2 ** 62))
+        position.log = []
+        if isinstance(battle, Raid):
+            position.boss = copies[battle.boss.id]
+            position.groups = [[copies[player.id] for player in group] for group in battle.groups]
+            position.group_of = dict(battle.group_of)
+            position.acted = set(battle.acted)
+        return position
@@ -0,0 +1,406 @@
+"""The rules of combat without Discord or the database.
+
+A Battle is fed Actions and returns the Events they caused, the Combat cog
+loads the combatants and turns the events into messages. Nothing here does
+any I/O, so battles can be simulated, tested and profiled on their own."""
+
+from collections import deque
+from itertools import islice
+from typing import NamedTuple
+from .rng import RandomStream
+from .status_effects import EffectDefinition, get_effect
+
+
+class CombatError(Exception):
+    """Raised when an action isn't allowed, the message can be shown to the player"""
+
+
+class Action(NamedTuple):
+    """Something the turn player chose to do.
+    `index` is the spell or inventory slot, `target` a combatant id and
+    `turn` the turn it was chosen on, if it must only count on that turn.
+    PASS is only ever logged, for a raid group's turn that was closed"""
+    kind: str
+    actor: int
+    index: int | None = None
+    target: int | None = None
+    turn: int | None = None
+
+    ATTACK = 'attack'
+    CAST = 'cast'
+    USE_ITEM = 'use_item'
+    MEDITATE = 'meditate'
+    RUN = 'run'
+    PASS = 'pass'
+
+
+class Event(NamedTuple):
+    """Something that happened in the battle, actor and target are combatant ids"""
+    kind: str
+    actor: int | None = None
+    target: int | None = None
+    spell: str | None = None
+    amount: float | None = None
+    text: str | None = None
+
+    STARTED = 'started'
+    TURN = 'turn'
+    STATUS_TICK = 'status_tick'
+    PASSIVE = 'passive'
+    PASSIVE_FAILED = 'passive_failed'
+    ATTACK = 'attack'
+    CAST = 'cast'
+    NOT_ENOUGH_MANA = 'not_enough_mana'
+    STATUS_APPLIED = 'status_applied'
+    DAMAGE = 'damage'
+    FAINTED = 'fainted'
+    MEDITATE = 'meditate'
+    FLED = 'fled'
+    ENDED = 'ended'
+
+
+class Combatant:
+    """A character taking part in a battle.
+
+    Every field is declared in __slots__, so combatants are small and
+    status effects can't add attributes on the fly. The base stats are the
+    character's own, before any effect changed them. Nothing here refers
+    to the database row or the Discord user they were built from."""
+    __slots__ = ('id', 'name', 'character_id', 'char_name', 'image', 'race_name', 'class_name',
+                 'base_health', 'base_mana', 'base_speed',
+                 'health', 'max_health', 'mana', 'max_mana', 'speed', 'defense',
+                 'status_effects', 'can_move', 'cannot_attack_caster', 'mana_hidden', 'leech_active',
+                 'weaknesses', 'spells', 'inventory')
+
+    def __init__(self, combatant_id: int, name: str, character_id: int, char_name: str,
+                 health: int, mana: int, speed: int, image: str | None = None,
+                 race_name: str | None = None, class_name: str | None = None):
+        self.id = combatant_id
+        self.name = name
+        self.character_id = character_id
+        self.char_name = char_name
+        self.image = image
+        self.race_name = race_name
+        self.class_name = class_name
+        self.base_health = self.health = self.max_health = health
+        self.base_mana = self.mana = self.max_mana = mana
+        self.base_speed = self.speed = speed
+        self.defense = 1
+        self.status_effects = []
+        self.can_move = True
+        self.cannot_attack_caster = False
+        self.mana_hidden = False
+        self.leech_active = False
+        self.weaknesses = []
+        self.spells = []
+        self.inventory = []
+
+    @classmethod
+    def from_rows(cls, combatant_id: int, name: str, character: dict,
+                  spells: list[dict], items: list[dict]) -> 'Combatant':
+        """Builds a combatant from CombatDatabase.get_combatants' rows, `combatant_id`
+        and `name` are the Discord user's id and display name"""
+        combatant = cls(combatant_id, name,
+                        character.get('character_id'),
+                        character.get('character_name'),
+                        character.get('health'),
+                        character.get('mana'),
+                        character.get('speed'),
+                        character.get('image_url'),
+                        character.get('race_name'),
+                        character.get('class_name'))
+        combatant.spells = [Spell.from_row(combatant, spell, spell.get('mana_cost')) for spell in spells]
+        combatant.inventory = [Item(item.get('item_name'), Spell.from_row(combatant, item, 0), item.get('spell_charges'))
+                               for item in items]
+        return combatant
+
+    def take_damage(self, damage: int):
+        """Combatant takes damage equal to damage variable"""
+        self.health -= damage
+        return self.health <= 0
+
+
+class Spell:
+    """A Spell object that can be cast to damage a player or to inflict a status effect on them"""
+    __slots__ = ('caster', 'name', 'power', 'cost', 'cooldown', 'element', 'status', 'chance',
+                 'duration', 'spell_type')
+
+    def __init__(self,
+                 caster: Combatant,
+                 name: str,
+                 power: int,
+                 cost: int,
+                 cooldown: int,
+                 element: str,
+                 status: int | str | None,
+                 chance: int,
+                 duration: int,
+                 spell_type: str):
+        self.caster = caster
+        self.name = name
+        self.power = power
+        self.cost = cost
+        self.cooldown = cooldown
+        self.element = element
+        self.status: EffectDefinition | None = get_effect(status)
+        self.chance = chance
+        self.duration = duration
+        self.spell_type = spell_type
+
+    @classmethod
+    def from_row(cls, caster: Combatant, row: dict, cost: int) -> 'Spell':
+        """Builds a spell from an equipped spell or enchanted item row"""
+        return cls(caster,
+                   row.get('spell_name'),
+                   row.get('spell_power'),
+                   cost,
+                   row.get('cooldown'),
+                   row.get('element_name'),
+                   row.get('spell_status_id') or row.get('status_name'),
+                   row.get('chance'),
+                   row.get('duration'),
+                   row.get('spell_type_name'))
+
+    def cast(self, caster: Combatant, targets: list[Combatant] | Combatant, rng: RandomStream):
+        """Casts the spell on the target(s), returns the status message
+        or whether the target fainted for each target"""
+
+        # If a single target is provided, convert it to a list for uniform handling
+        if isinstance(targets, Combatant):
+            targets = [targets]
+
+        caster.mana -= self.cost
+        results = []
+
+        for target in targets:
+            if self.status:
+                results.append(self.status.apply(caster, self.power, self.chance, self.duration, target, rng))
+            else:
+                results.append(target.take_damage(self.power))
+
+        return results
+
+    def get_targets(self, caster: Combatant, players: list[Combatant]) -> list[Combatant]:
+        """Determines valid targets for a spell"""
+        # Initialize the list of targets based on the spell type
+        if self.spell_type == "Single Target":
+            targets = [caster] + players
+        elif self.spell_type == "Passive":
+            targets = [caster]
+        else:
+            targets = list(players)
+
+        for effect in caster.status_effects:
+            change_targets = effect.definition.change_targets
+            if change_targets:
+                targets = change_targets(effect, caster, targets)
+
+        return targets
+
+
+class Item:
+    """An item object that has a spell enchantment that a player can use"""
+    __slots__ = ('name', 'spell', 'charges')
+
+
+    def __init__(self, name: str, spell: Spell, charges: int):
+        self.name = name
+        self.spell = spell
+        self.charges = charges
+
+
+class Battle:
+    """The state of one battle and the rules that move it forward.
+
+    Players join, `start` rolls initiative and begins the first turn.
+    Each turn the turn player's status effects tick and their passive
+    spells activate, then the battle waits for their Action. `act`
+    resolves it and begins the next turn, until one player is left.
+
+    Every roll comes from `rng`, so the same seed, players and actions
+    always play out the same battle. Each turn's action rolls from a
+    stream derived from the seed and the turn number, so a battle saved
+    while waiting for an action resumes with exactly the same rolls."""
+
+    def __init__(self, battle_id: int, seed: int | None = None):
+        self.battle_id = battle_id
+        self._root = RandomStream(seed)
+        self.seed = self._root.seed
+        self.rng = self._root
+        self.players = []
+        self._by_id: dict[int, Combatant] = {}
+        self.turn_order: deque[Combatant] = deque()
+        # The AI choosing the actions of each combatant the bot plays, by combatant id
+        self.npcs: dict[int, object] = {}
+        self.current_turn = None
+        self.experience = 0
+        self.turn = 0
+        self.over = False
+        self.winner = None
+        # Every action taken since the battle was created or restored, see replay.py
+        self.log: list[Action] = []
+
+    def get(self, combatant_id: int) -> Combatant | None:
+        """Returns the combatant with the id, if they joined"""
+        return self._by_id.get(combatant_id)
+
+    def join(self, combatant: Combatant, experience: float = 0, ai=None):
+        """Adds a combatant and the experience they are worth to the battle,
+        `ai` chooses the actions if the bot plays them"""
+        if self.turn:
+            raise CombatError("The battle has already started!")
+        if self.get(combatant.id):
+            raise CombatError("You've already joined!")
+        self.players.append(combatant)
+        self._by_id[combatant.id] = combatant
+        if ai is not None:
+            self.npcs[combatant.id] = ai
+        self.experience += experience
+
+    def opponents(self, player: Combatant | None = None) -> list[Combatant]:
+        """The living combatants the player, by default the turn player, can act on"""
+        player = player or self.current_turn
+        return [other for other in self.turn_order if other is not player and other.health > 0]
+
+    def targets(self, player: Combatant, spell: Spell) -> list[Combatant]:
+        """Who the player may aim a single target spell at"""
+        return spell.get_targets(player, self.opponents(player))
+
+    def can_act(self, combatant_id: int) -> bool:
+        """Whether the battle is waiting for the combatant's action"""
+        return not self.over and self.current_turn is not None and self.current_turn.id == combatant_id
+
+    def winners(self) -> list[Combatant]:
+        """Who won, once the battle is over"""
+        return [self.winner] if self.winner else []
+
+    def start(self) -> list[Event]:
+        """Rolls initiative, with priority to the faster players, and begins the first turn"""
+        if self.turn:
+            raise CombatError("The battle has already started!")
+        if len(self.players) < 2:
+            raise CombatError("You need another player to start the battle")
+
+        self.turn_order = deque(self.initiative(self.players))
+        return [Event(Event.STARTED, self.turn_order[0].id)] + self.next_turn()
+
+    def initiative(self, players: list[Combatant]) -> list[Combatant]:
+        """The players in the order a d20 roll plus their speed puts them"""
+        return sorted(players, key=lambda p: self.rng.randint(1, 20) + p.speed, reverse=True)
+
+    def next_turn(self) -> list[Event]:
+        """Passes the turn to the next living player, or ends the battle"""
+        order = self.turn_order
+        # Fainted players leave the order when it comes round to them, not every turn
+        while order and order[0].health <= 0:
+            order.popleft()
+        if not any(player.health > 0 for player in islice(order, 1, None)):
+            return self._end()
+
+        current_player = order.popleft()
+        order.append(current_player)
+        self.current_turn = current_player
+        self.turn += 1
+
+        events = self._begin_turn(current_player)
+        events.append(Event(Event.TURN, current_player.id, amount=self.turn))
+        self.rng = self.turn_stream(self.turn)
+        return events
+
+    def _begin_turn(self, player: Combatant) -> list[Event]:
+        """Ticks the player's status effects and activates their passive spells"""
+        events = []
+        for status_effect in list(player.status_effects):
+            events.append(Event(Event.STATUS_TICK, player.id,
+                                spell=status_effect.name,
+                                text=status_effect.reduce_status(player)))
+
+        for spell in player.spells:
+            if spell.spell_type != "Passive":
+                continue
+            if player.mana > spell.cost:
+                result = spell.cast(player, player, self.rng)
+                events.append(Event(Event.PASSIVE, player.id, player.id, spell.name,
+                                    text=result[0] if result and isinstance(result[0], str) else None))
+            else:
+                events.append(Event(Event.PASSIVE_FAILED, player.id, spell=spell.name))
+        return events
+
+    def turn_stream(self, turn: int) -> RandomStream:
+        """The stream the action of a turn rolls from"""
+        return self._root.derive(f"turn {turn}")
+
+    def act(self, action: Action) -> list[Event]:
+        """Resolves the turn player's action and begins the next turn"""
+        player = self.current_turn
+        if self.over or player is None or action.actor != player.id:
+            raise CombatError("It's not your turn!")
+        if action.turn is not None and action.turn != self.turn:
+            # e.g. a second click on the buttons of a turn that has passed
+            raise CombatError("That turn is already over!")
+        events = self._resolve(player, action)
+        self.log.append(action)
+        return events + self.next_turn()
+
+    def _resolve(self, player: Combatant, action: Action) -> list[Event]:
+        if action.kind == Action.ATTACK:
+            events = [Event(Event.ATTACK, player.id)]
+        elif action.kind in (Action.CAST, Action.USE_ITEM):
+            events = self._cast(player, action)
+        elif action.kind == Action.MEDITATE:
+            events = self._meditate(player)
+        elif action.kind == Action.RUN:
+            self._leave(player)
+            events = [Event(Event.FLED, player.id)]
+        else:
+            raise CombatError(f"Unknown action {action.kind}")
+        return events
+
+    def _leave(self, player: Combatant):
+        self.turn_order.remove(player)
+
+    def spell_for(self, player: Combatant, action: Action) -> Spell:
+        """The equipped spell or item spell the action uses"""
+        slots = player.spells if action.kind == Action.CAST else [item.spell for item in player.inventory]
+        if action.index is None or not 0 <= action.index < len(slots):
+            raise CombatError("You don't have that spell!")
+        return slots[action.index]
+
+    def _cast(self, player: Combatant, action: Action) -> list[Event]:
+        spell = self.spell_for(player, action)
+        if player.mana < spell.cost:
+            return [Event(Event.NOT_ENOUGH_MANA, player.id, spell=spell.name)]
+
+        if spell.spell_type == "Area of Effect":
+            targets = self.opponents(player)
+        else:
+            target = self.get(action.target)
+            if target not in self.targets(player, spell):
+                raise CombatError("You can't target them!")
+            targets = [target]
+
+        # A lasting status only landed if the target has one more effect than before
+        before = [len(target.status_effects) for target in targets]
+        results = spell.cast(player, targets, self.rng)
+        aimed_at = None if spell.spell_type == "Area of Effect" else targets[0].id
+        events = [Event(Event.CAST, player.id, aimed_at, spell.name)]
+        for target, result, effects in zip(targets, results, before):
+            if isinstance(result, str):
+                landed = not spell.status.lasting or len(target.status_effects) > effects
+                events.append(Event(Event.STATUS_APPLIED, player.id, target.id, spell.name,
+                                    amount=int(landed), text=result))
+            else:
+                events.append(Event(Event.DAMAGE, player.id, target.id, spell.name, amount=spell.power))
+        events.extend(Event(Event.FAINTED, target=target.id) for target in targets if target.health <= 0)
+        return events
+
+    def _meditate(self, player: Combatant) -> list[Event]:
+        restore = self.rng.randint(int(player.max_mana // 3), int(player.max_mana))
+        player.mana = min(player.mana + restore, player.max_mana)
+        return [Event(Event.MEDITATE, player.id, amount=restore)]
+
+    def _end(self) -> list[Event]:
+        self.over = True
+        self.current_turn = None
+        self.winner = next((player for player in self.turn_order if player.health > 0), None)
+        return [Event(Event.ENDED, self.winner.id if self.winner else None, amount=self.experience)]
@@ -0,0 +1,167 @@
+"""Raids: any number of players against one boss the bot plays"""
+from .engine import Action, Battle, Combatant, CombatError, Event, Spell
+
+BOSS_ID = -1
+
+
+def make_boss() -> Combatant:
+    """The boss of a raid, its health grows with every raider when the raid starts"""
+    boss = Combatant(BOSS_ID, "Ancient Dragon", None, "Ancient Dragon", health=120, mana=120, speed=0)
+    boss.spells = [Spell(boss, "Claw", 30, 0, 1, "Earth", None, None, None, "Single Target"),
+                   Spell(boss, "Dragon Fire", 12, 40, 1, "Fire", "Burning", 35, 3, "Area of Effect")]
+    return boss
+
+
+class Raid(Battle):
+    """A battle of many raiders against a boss.
+
+    Raiders don't take turns one at a time. Initiative sorts them into
+    groups of `group_size`, and a group shares its turn: every living
+    member acts once, in any order, and the turn passes once all of them
+    have or when `close_turn` is called on them. The boss takes its turn
+    after every group. Raiders may aim single target spells at each other
+    as well as the boss, Area of Effect spells only hit the other side."""
+
+    def __init__(self, battle_id: int, seed: int | None = None, group_size: int = 25):
+        super().__init__(battle_id, seed)
+        self.group_size = group_size
+        self.boss = None
+        self.groups: list[list[Combatant]] = []
+        self.group_of: dict[int, int] = {}
+        # The group whose turn it is, None on the boss's turn
+        self.group = None
+        self.next_group = 0
+        self.acted: set[int] = set()
+
+    def join(self, combatant: Combatant, experience: float = 0, ai=None):
+        """Adds a raider, the raid is worth what its boss is worth however many join"""
+        super().join(combatant, 0, ai)
+
+    def join_boss(self, boss: Combatant, ai, experience: float):
+        """Adds the boss, played by `ai`"""
+        super().join(boss, experience, ai)
+        self.boss = boss
+
+    def raiders(self) -> list[Combatant]:
+        """The living raiders"""
+        return [player for group in self.groups for player in group if player.health > 0]
+
+    def opponents(self, player: Combatant | None = None) -> list[Combatant]:
+        """The raiders for the boss, the boss for a raider"""
+        player = player or self.current_turn
+        if player is self.boss:
+            return self.raiders()
+        return [self.boss] if self.boss.health > 0 else []
+
+    def targets(self, player: Combatant, spell: Spell) -> list[Combatant]:
+        """A raider may also aim at the other raiders, e.g. to heal them"""
+        if player is self.boss:
+            return super().targets(player, spell)
+        allies = [raider for raider in self.raiders() if raider is not player]
+        return spell.get_targets(player, self.opponents(player) + allies)
+
+    def can_act(self, combatant_id: int) -> bool:
+        """Whether the raider is in the group whose turn it is and hasn't acted yet"""
+        if self.over:
+            return False
+        if self.group is None:
+            return super().can_act(combatant_id)
+        player = self.get(combatant_id)
+        return (self.group_of.get(combatant_id) == self.group and combatant_id not in self.acted
+                and player.health > 0)
+
+    def waiting_for(self) -> list[Combatant]:
+        """The members of the group whose turn it is that haven't acted yet"""
+        if self.group is None:
+            return []
+        return [player for player in self.groups[self.group]
+                if player.health > 0 and player.id not in self.acted]
+
+    def winners(self) -> list[Combatant]:
+        """The raiders still standing if the boss fell, otherwise the boss"""
+        if not self.over:
+            return []
+        return self.raiders() if self.boss.health <= 0 else [self.boss]
+
+    def start(self) -> list[Event]:
+        """Rolls initiative, sorts the raiders into groups and begins the first group's turn"""
+        if self.turn:
+            raise CombatError("The battle has already started!")
+        raiders = [player for player in self.players if player is not self.boss]
+        if self.boss is None or not raiders:
+            raise CombatError("A raid needs at least one raider")
+
+        self.boss.health = self.boss.max_health = self.boss.base_health * len(raiders)
+        ordered = self.initiative(raiders)
+        self.groups = [ordered[start:start + self.group_size] for start in range(0, len(ordered), self.group_size)]
+        self.group_of = {player.id: index for index, group in enumerate(self.groups) for player in group}
+        return [Event(Event.STARTED, ordered[0].id)] + self.next_turn()
+
+    def act(self, action: Action) -> list[Event]:
+        """Resolves a raider's or the boss's action, the turn passes once the whole group acted"""
+        if not self.can_act(action.actor):
+            raise CombatError("It's not your turn!")
+        if action.turn is not None and action.turn != self.turn:
+            raise CombatError("That turn is already over!")
+
+        player = self.get(action.actor)
+        events = self._resolve(player, action)
+        self.log.append(action)
+        if self.group is None or self.boss.health <= 0:
+            return events + self.next_turn()
+        self.acted.add(player.id)
+        if not self.waiting_for():
+            events += self.next_turn()
+        return events
+
+    def close_turn(self) -> list[Event]:
+        """Ends the group's turn without the members who haven't acted"""
+        if self.over or self.group is None:
+            return []
+        self.log.append(Action(Action.PASS, None, turn=self.turn))
+        return self.next_turn()
+
+    def next_turn(self) -> list[Event]:
+        """Passes the turn from a group to the boss and from the boss to the next
+        group with someone still standing, or ends the raid"""
+        if self.boss.health <= 0 or not self.raiders():
+            return self._end()
+
+        self.turn += 1
+        self.acted = set()
+        if self.group is not None:
+            self.group = None
+            self.current_turn = self.boss
+            events = self._begin_turn(self.boss)
+            events.append(Event(Event.TURN, self.boss.id, amount=self.turn))
+        else:
+            self.current_turn = None
+            self.group = self._next_living_group()
+            members = [player for player in self.groups[self.group] if player.health > 0]
+            events = [event for player in members for event in self._begin_turn(player)]
+            events.append(Event(Event.TURN, amount=self.turn))
+        self.rng = self.turn_stream(self.turn)
+
+        # Status effects can finish off the boss or everyone whose turn it is
+        if self.boss.health <= 0 or (self.group is not None and not self.waiting_for()):
+            return events + self.next_turn()
+        return events
+
+    def _next_living_group(self) -> int:
+        for offset in range(len(self.groups)):
+            index = (self.next_group + offset) % len(self.groups)
+            if any(player.health > 0 for player in self.groups[index]):
+                self.next_group = index + 1
+                return index
+        raise CombatError("Every raider has fallen")
+
+    def _leave(self, player: Combatant):
+        group = self.groups[self.group_of.pop(player.id)]
+        group.remove(player)
+
+    def _end(self) -> list[Event]:
+        self.over = True
+        self.current_turn = None
+        self.group = None
+        self.winner = self.boss if self.boss.health > 0 else None
+        return [Event(Event.ENDED, self.winner.id if self.winner else None, amount=self.experience)]
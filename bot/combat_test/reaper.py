@@ -0,0 +1,98 @@
+"""Closes battles nobody is playing anymore, and the views they left behind"""
+import asyncio
+import time
+from typing import Awaitable, Callable
+
+
+class BattleReaper:
+    """Tracks when each battle last moved and which views it has open.
+
+    Every turn sends a new ActionView, and the spell, item and target
+    menus each send another, all holding on to the cog, the context and
+    the turn player. `retire` stops a battle's views once its turn has
+    passed, so only the current turn's buttons stay alive. A battle that
+    hasn't been touched for `idle_timeout` seconds, e.g. one that was
+    started with !combat and never joined or a player who walked away
+    mid turn, is closed and handed to `expire(battle_id)`, a coroutine
+    function that drops it from the cog."""
+
+    def __init__(self, expire: Callable[[int], Awaitable], idle_timeout: float = 900, interval: float = 60):
+        self.expire = expire
+        self.idle_timeout = idle_timeout
+        self.interval = interval
+        self.last_active: dict[int, float] = {}
+        self.views: dict[int, set] = {}
+        self.reaped = 0
+        self._task = None
+
+    def start(self):
+        """Starts checking for idle battles in the background on the running loop"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stops checking"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def touch(self, battle_id: int):
+        """Records that something happened in the battle"""
+        self.last_active[battle_id] = time.monotonic()
+
+    def track(self, battle_id: int, view):
+        """Remembers a view of the battle so it can be stopped later"""
+        self.views.setdefault(battle_id, set()).add(view)
+
+    def forget(self, battle_id: int, view):
+        """Drops a view that stopped by itself, e.g. when it timed out"""
+        views = self.views.get(battle_id)
+        if views is not None:
+            views.discard(view)
+            if not views:
+                del self.views[battle_id]
+
+    def retire(self, battle_id: int):
+        """Stops every view of the battle, their buttons no longer respond"""
+        for view in self.views.pop(battle_id, ()):
+            view.stop()
+
+    def close(self, battle_id: int):
+        """Stops the views of a battle that is over and stops tracking it"""
+        self.retire(battle_id)
+        self.last_active.pop(battle_id, None)
+
+    def idle(self, now: float = None) -> list[int]:
+        """The battles that haven't been touched for idle_timeout seconds"""
+        now = time.monotonic() if now is None else now
+        return [battle_id for battle_id, last in self.last_active.items() if now - last >= self.idle_timeout]
+
+    async def sweep(self, now: float = None) -> int:
+        """Closes and expires the idle battles, returns how many there were"""
+        idle = self.idle(now)
+        for battle_id in idle:
+            self.close(battle_id)
+            self.reaped += 1
+            try:
+                await self.expire(battle_id)
+            except Exception as e:
+                # The battle is already closed, only the goodbye is lost
+                print(f"Could not expire battle {battle_id}: {e}")
+        return len(idle)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.sweep()
+
+    def stats(self) -> dict[str, int]:
+        """How many battles and views are alive and how many battles were reaped"""
+        return {
+            'battles': len(self.last_active),
+            'views': sum(len(views) for views in self.views.values()),
+            'reaped': self.reaped,
+        }
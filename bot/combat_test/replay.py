@@ -0,0 +1,138 @@
+"""Battle replays, so a finished battle can be played again without Discord
+
+A replay is the battle as it stood when recording began, encoded like a
+snapshot, with its seed and every player's stats, spells and items, and
+every action taken since, in order. That is all the engine needs: the
+rolls follow from the seed, see Battle.turn_stream, and the actions of
+the combatants the bot plays are recorded like everyone else's. A battle
+resumed after a restart is recorded from the state it resumed at.
+
+Packed, a replay is MAGIC, the version byte and then, zlib compressed,
+the length and JSON of the opening state followed by the action count and
+the actions. Each action is its kind as one byte, then as varints: the
+actor and target as their position among the players plus one, the slot
+plus one, 0 standing for none, and the turn as the number of turns since
+the previous action plus one, 0 if the action had no turn. Most actions
+take five bytes before compression.
+
+Bump REPLAY_VERSION whenever the layout changes."""
+
+import json
+import zlib
+from typing import NamedTuple
+
+from .engine import Action, Battle, CombatError, Event
+from .snapshot import SnapshotError, decode
+
+MAGIC = b'PXRP'
+REPLAY_VERSION = 1
+
+_KINDS = (Action.ATTACK, Action.CAST, Action.USE_ITEM, Action.MEDITATE, Action.RUN, Action.PASS)
+_KIND_CODES = {kind: code for code, kind in enumerate(_KINDS)}
+
+
+class ReplayError(Exception):
+    """Raised when a replay can't be read or played"""
+
+
+class Replay(NamedTuple):
+    """The state recording began at, as snapshot.encode gives it, and every action since"""
+    opening: dict
+    actions: list[Action]
+
+
+def record(opening: dict, battle: Battle) -> Replay:
+    """The replay of a battle that was encoded as `opening` before any of its logged actions"""
+    return Replay(opening, list(battle.log))
+
+
+def _write_varint(out: bytearray, value: int):
+    while value > 0x7F:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data: bytes, offset: int) -> tuple[int, int]:
+    value = shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+
+def dumps(replay: Replay) -> bytes:
+    """The replay packed into bytes"""
+    positions = {fields[0][0]: position for position, fields in enumerate(replay.opening['players'])}
+    opening = json.dumps(replay.opening, separators=(',', ':')).encode()
+    body = bytearray()
+    _write_varint(body, len(opening))
+    body += opening
+    _write_varint(body, len(replay.actions))
+
+    previous = replay.opening['turn']
+    for action in replay.actions:
+        body.append(_KIND_CODES[action.kind])
+        _write_varint(body, 0 if action.actor is None else positions[action.actor] + 1)
+        _write_varint(body, 0 if action.index is None else action.index + 1)
+        _write_varint(body, 0 if action.target is None else positions[action.target] + 1)
+        if action.turn is None:
+            _write_varint(body, 0)
+        else:
+            _write_varint(body, action.turn - previous + 1)
+            previous = action.turn
+    return MAGIC + bytes([REPLAY_VERSION]) + zlib.compress(bytes(body))
+
+
+def loads(data: bytes) -> Replay:
+    """The replay in packed bytes"""
+    if data[:len(MAGIC)] != MAGIC:
+        raise ReplayError("Not a replay")
+    version = data[len(MAGIC)] if len(data) > len(MAGIC) else None
+    if version != REPLAY_VERSION:
+        raise ReplayError(f"Replay version {version} can't be read by version {REPLAY_VERSION}")
+    try:
+        body = zlib.decompress(data[len(MAGIC) + 1:])
+        length, offset = _read_varint(body, 0)
+        opening = json.loads(body[offset:offset + length])
+        offset += length
+        ids = [fields[0][0] for fields in opening['players']]
+        count, offset = _read_varint(body, offset)
+
+        previous = opening['turn']
+        actions = []
+        for _ in range(count):
+            kind = _KINDS[body[offset]]
+            actor, offset = _read_varint(body, offset + 1)
+            index, offset = _read_varint(body, offset)
+            target, offset = _read_varint(body, offset)
+            turn, offset = _read_varint(body, offset)
+            if turn:
+                previous = turn = previous + turn - 1
+            actions.append(Action(kind,
+                                  ids[actor - 1] if actor else None,
+                                  index - 1 if index else None,
+                                  ids[target - 1] if target else None,
+                                  turn if turn else None))
+    except (zlib.error, ValueError, IndexError, KeyError) as e:
+        raise ReplayError(f"Corrupt replay: {e}") from e
+    return Replay(opening, actions)
+
+
+def play(replay: Replay) -> tuple[Battle, list[Event]]:
+    """Plays the replay again from its opening, returns the battle as the last
+    action left it and every event on the way"""
+    try:
+        battle = decode(replay.opening)
+    except SnapshotError as e:
+        raise ReplayError(str(e)) from e
+    events = [] if battle.turn else battle.start()
+    for number, action in enumerate(replay.actions, 1):
+        try:
+            events += battle.close_turn() if action.kind == Action.PASS else battle.act(action)
+        except CombatError as e:
+            raise ReplayError(f"Action {number} of {len(replay.actions)} no longer plays: {e}") from e
+    return battle, events
@@ -0,0 +1,55 @@
+"""Seeded random streams, so battles and crafting rolls can be replayed"""
+
+import hashlib
+import random
+import secrets
+
+
+class RandomStream:
+    """A stream of rolls from one recorded seed.
+
+    The same seed gives the same rolls in the same order, so a battle or a
+    crafting attempt can be replayed exactly by giving it the seed again.
+    Use `derive` for an independent stream, e.g. for an NPC's thinking,
+    so drawing from one doesn't shift the rolls of the other."""
+
+    def __init__(self, seed: int | None = None):
+        self.seed = secrets.randbits(63) if seed is None else seed
+        self._random = None
+
+    @property
+    def _generator(self) -> random.Random:
+        # Seeding takes longer than a whole turn, and many streams are never
+        # drawn from, so it waits for the first roll
+        if self._random is None:
+            self._random = random.Random(self.seed)
+        return self._random
+
+    def __repr__(self) -> str:
+        return f"RandomStream(seed={self.seed})"
+
+    def randint(self, low: int, high: int) -> int:
+        """A roll between low and high, both included"""
+        return self._generator.randint(low, high)
+
+    def roll(self, sides: int = 100) -> int:
+        """A roll of a die with `sides` sides, e.g. a percentile roll"""
+        return self._generator.randint(1, sides)
+
+    def rolls(self, count: int, low: int, high: int) -> list[int]:
+        """`count` rolls between low and high drawn in one go, much faster than
+        calling randint in a loop"""
+        return self._generator.choices(range(low, high + 1), k=count)
+
+    def choice(self, options: list):
+        """One of the options"""
+        return self._generator.choice(options)
+
+    def random(self) -> float:
+        """A float in [0, 1)"""
+        return self._generator.random()
+
+    def derive(self, name: str) -> 'RandomStream':
+        """An independent stream that always follows from this seed and the name"""
+        digest = hashlib.blake2b(f"{self.seed}:{name}".encode(), digest_size=8).digest()
+        return RandomStream(int.from_bytes(digest, 'big') >> 1)
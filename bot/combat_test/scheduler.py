@@ -0,0 +1,100 @@
+"""One timer for the turn deadlines of every battle"""
+import asyncio
+import heapq
+import time
+from typing import Awaitable, Callable
+
+
+class TurnScheduler:
+    """Passes the turns nobody took in time.
+
+    Each battle has at most one deadline, for the turn it is waiting on.
+    The deadlines of every battle share one heap and one task that sleeps
+    until the earliest is due, so thousands of battles cost thousands of
+    heap entries instead of thousands of sleeping tasks. Scheduling a
+    battle's next turn leaves the entry of its last turn in the heap, it is
+    skipped when it comes up since it no longer matches the battle's
+    deadline, and the heap is rebuilt once such entries outnumber the live
+    ones. A turn that is due is handed to `expire(battle_id, turn)`, a
+    coroutine function that should check the battle is still on that turn."""
+
+    def __init__(self, expire: Callable[[int, int], Awaitable], timeout: float = 180):
+        self.expire = expire
+        self.timeout = timeout
+        # battle_id: (deadline, turn) of the turn the battle waits on
+        self.deadlines: dict[int, tuple[float, int]] = {}
+        self.expired = 0
+        self._heap: list[tuple[float, int, int]] = []
+        self._wakeup = asyncio.Event()
+        self._expiring: set[asyncio.Task] = set()
+        self._task = None
+
+    def start(self):
+        """Starts passing turns in the background on the running loop"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stops passing turns, the deadlines are kept"""
+        tasks = [task for task in (self._task, *self._expiring) if task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = None
+
+    def schedule(self, battle_id: int, turn: int, timeout: float | None = None):
+        """Gives the battle's turn `timeout` seconds, by default `self.timeout`,
+        replacing the deadline of its last turn"""
+        deadline = time.monotonic() + (self.timeout if timeout is None else timeout)
+        self.deadlines[battle_id] = (deadline, turn)
+        entry = (deadline, battle_id, turn)
+        heapq.heappush(self._heap, entry)
+        if len(self._heap) > 2 * len(self.deadlines) + 64:
+            self._compact()
+        if self._heap[0] == entry:
+            # Due before whatever the task is sleeping until
+            self._wakeup.set()
+
+    def cancel(self, battle_id: int):
+        """Drops the battle's deadline, e.g. once it is over"""
+        self.deadlines.pop(battle_id, None)
+
+    def due(self, now: float = None) -> list[tuple[int, int]]:
+        """Takes the battle ids and turns whose deadline has passed off the heap"""
+        now = time.monotonic() if now is None else now
+        heap = self._heap
+        due = []
+        while heap and heap[0][0] <= now:
+            deadline, battle_id, turn = heapq.heappop(heap)
+            if self.deadlines.get(battle_id) == (deadline, turn):
+                del self.deadlines[battle_id]
+                due.append((battle_id, turn))
+        return due
+
+    def _compact(self):
+        self._heap = [(deadline, battle_id, turn) for battle_id, (deadline, turn) in self.deadlines.items()]
+        heapq.heapify(self._heap)
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            timeout = self._heap[0][0] - time.monotonic() if self._heap else None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            for battle_id, turn in self.due():
+                self.expired += 1
+                task = asyncio.create_task(self._expire(battle_id, turn))
+                self._expiring.add(task)
+                task.add_done_callback(self._expiring.discard)
+
+    async def _expire(self, battle_id: int, turn: int):
+        try:
+            await self.expire(battle_id, turn)
+        except Exception as e:
+            print(f"Could not pass turn {turn} of battle {battle_id}: {e}")
+
+    def stats(self) -> dict[str, int]:
+        """How many turns are waiting on a deadline and how many were passed"""
+        return {'waiting': len(self.deadlines), 'expired': self.expired}
@@ -0,0 +1,445 @@
+"""Monte Carlo balance simulator for the spell catalog
+
+Every spell duels every other spell. Each side casts its spell whenever
+it can and meditates otherwise, following the rules in engine.py. The
+duels are played side by side in NumPy arrays, one array operation per
+rule per turn, so the whole catalog takes seconds rather than hours.
+
+    python -m bot.combat_test.simulator
+    python -m bot.combat_test.simulator --dsn "dbname=phoenix host=localhost" --duels 200 --output balance.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import time
+from typing import NamedTuple
+import numpy as np
+import psycopg2
+from psycopg2.extras import RealDictCursor
+
+from bot.database_utils import CombatDatabase, DatabaseConnection, SpellQuery
+from .rng import RandomStream
+
+# A new character's stats, from the character table defaults
+HEALTH = 100
+MANA = 100
+# Duels nobody has won after this many turns are draws
+MAX_TURNS = 200
+
+# BURN to LASTING are rolled for and kept on the target as stacks
+(DAMAGE, BURN, POISON, LEECH, REGEN, PARALYZE, CHARM, LASTING,
+ BLESS, MANA_BOOST, HEALTH_BOOST, NO_EFFECT) = range(12)
+
+EFFECTS = {
+    "Burning": BURN,
+    "Poisoned": POISON,
+    "Leech": LEECH,
+    "Regenerating": REGEN,
+    "Paralyze": PARALYZE,
+    "Charmed": CHARM,
+    "Blessed": BLESS,
+    "Mana Boost": MANA_BOOST,
+    "Health Boost": HEALTH_BOOST,
+    # Rolled for and kept on the target, but they change nothing in a duel
+    "Frozen": LASTING,
+    "Confusion": LASTING,
+    "Taunt": LASTING,
+    # Always applied and change nothing in a duel
+    "Extreme Speed": NO_EFFECT,
+    "Armor": NO_EFFECT,
+    "Fire Weakness": NO_EFFECT,
+    "Water Weakness": NO_EFFECT,
+    "Earth Weakness": NO_EFFECT,
+    "Air Weakness": NO_EFFECT,
+}
+# Statuses without a status class, e.g. None or Sleep, make a damage spell
+BENEFICIAL = {"Regenerating", "Blessed", "Mana Boost", "Health Boost", "Extreme Speed", "Armor"}
+
+
+class SpellTable(NamedTuple):
+    """The catalog as one array per spell property"""
+    names: list[str]
+    elements: list[str]
+    statuses: list[str]
+    power: np.ndarray
+    cost: np.ndarray
+    effect: np.ndarray
+    chance: np.ndarray
+    duration: np.ndarray
+    passive: np.ndarray
+    aoe: np.ndarray
+    on_self: np.ndarray
+    difficulty: np.ndarray
+
+    @classmethod
+    def from_rows(cls, rows: list[dict]) -> 'SpellTable':
+        """Builds the table from CombatDatabase.get_spell_catalog rows"""
+        statuses = [row.get('status_name') or 'None' for row in rows]
+        spell_types = [row.get('spell_type_name') for row in rows]
+        # get_spell_difficulty prints its working, which would drown the results
+        with contextlib.redirect_stdout(io.StringIO()):
+            difficulty = [SpellQuery.get_spell_difficulty(row['spell_power'], row['mana_cost'], row['cooldown'],
+                                                          1, row.get('chance') or 0, row.get('duration') or 0)
+                          for row in rows]
+        passive = np.array([spell_type == "Passive" for spell_type in spell_types])
+        aoe = np.array([spell_type == "Area of Effect" for spell_type in spell_types])
+        beneficial = np.array([status in BENEFICIAL for status in statuses])
+        return cls(
+            names=[row['spell_name'] for row in rows],
+            elements=[row.get('element_name') for row in rows],
+            statuses=statuses,
+            power=np.array([row['spell_power'] for row in rows], dtype=np.float64),
+            cost=np.array([row['mana_cost'] for row in rows], dtype=np.float64),
+            effect=np.array([EFFECTS.get(status, DAMAGE) for status in statuses]),
+            # EffectDefinition.apply lands a status when rng.roll(), 1 to 100, is below chance
+            chance=np.array([max((row.get('chance') or 0) - 1, 0) / 100 for row in rows]),
+            # A zero duration Burning would divide by zero, the engine would crash
+            duration=np.array([max(row.get('duration') or 1, 1) for row in rows], dtype=np.int16),
+            passive=passive,
+            aoe=aoe,
+            # Passives land on the caster, so do single target spells that help
+            on_self=passive | (~aoe & beneficial),
+            difficulty=np.array(difficulty),
+        )
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+
+# The rows of Duels.values, the state of each side then the properties of its spell
+(_HEALTH, _MAX_HEALTH, _MANA, _MAX_MANA, _DAMAGE, _SPENT,
+ _POWER, _COST, _CHANCE, _DURATION, _EFFECT, _PASSIVE, _AOE, _ON_SELF) = range(14)
+# 1 / remaining duration by remaining duration, what a Burning stack deals per power
+_INVERSE = np.array([0] + [1 / duration for duration in range(1, 2 ** 15)])
+_SPELL_PROPS = {_POWER: 'power', _COST: 'cost', _CHANCE: 'chance', _DURATION: 'duration',
+                _EFFECT: 'effect', _PASSIVE: 'passive', _AOE: 'aoe', _ON_SELF: 'on_self'}
+
+
+class Duels:
+    """A batch of duels in progress.
+
+    Everything about a side is a row of `values`, shaped (row, position,
+    duel), and each rule is applied to every duel with one array operation.
+    Position 0 is always the side whose turn it is: after every turn the
+    positions swap, which is just a reversed view. Status stacks are kept
+    per target position and by whether they came from the target's own
+    spell (0) or the opponent's (1), as each side only casts its one spell."""
+
+    def __init__(self, table: SpellTable, spells: np.ndarray, rng: np.random.Generator):
+        count = spells.shape[1]
+        self.rng = rng
+        self.ids = np.arange(count)
+        self.turns = 0
+        self.values = np.zeros((len(_SPELL_PROPS) + 6, 2, count))
+        self.values[[_HEALTH, _MAX_HEALTH]] = HEALTH
+        self.values[[_MANA, _MAX_MANA]] = MANA
+        for row, prop in _SPELL_PROPS.items():
+            self.values[row] = getattr(table, prop)[spells]
+        self.stacks = np.zeros((2, 2, int(table.duration.max()) + 1, count), dtype=np.int16)
+        # Equal speed, so initiative is the higher d20 with ties to the first side
+        initiative = rng.integers(1, 21, size=(2, count))
+        self.swapped = initiative[1] > initiative[0]
+        self.values[:, :, self.swapped] = self.values[:, ::-1, self.swapped]
+        # Rules for effects no spell in the batch has are skipped
+        self.effects = set(np.unique(self.values[_EFFECT]).astype(int).tolist())
+
+    def swap(self):
+        """Passes the turn to the other position"""
+        self.values = self.values[:, ::-1]
+        self.stacks = self.stacks[::-1]
+
+    def tick(self) -> tuple[np.ndarray, np.ndarray]:
+        """Status.reduce_status for the turn player's stacks,
+        returns who is paralyzed and who is charmed by their opponent"""
+        values = self.values
+        paralyzed = np.zeros(values.shape[2], dtype=bool)
+        charmed = np.zeros(values.shape[2], dtype=bool)
+        for source in (0, 1):
+            # Most duels have no stacks, so only the ones that do are worked on
+            stacks = self.stacks[0, source]
+            duels = np.flatnonzero(stacks.any(axis=0))
+            if not len(duels):
+                continue
+            remaining = stacks[:, duels]
+            active = remaining > 0
+            count = active.sum(axis=0)
+            effect, power = values[_EFFECT, source, duels], values[_POWER, source, duels]
+            health, max_health = values[_HEALTH, 0, duels], values[_MAX_HEALTH, 0, duels]
+
+            losses = np.where(effect == BURN, power * _INVERSE[remaining].sum(axis=0), 0)
+            losses += np.where(effect == POISON, health * (1 - (1 - power / 100) ** count), 0)
+            leech = np.where(effect == LEECH, count * max_health * power / 100, 0)
+            health -= losses + leech
+            regenerated = np.minimum(health + count * max_health * power / 100, max_health)
+            values[_HEALTH, 0, duels] = np.where(effect == REGEN, regenerated, health)
+            values[_HEALTH, source, duels] += leech
+            if source == 1:
+                values[_DAMAGE, 1, duels] += losses + leech
+
+            remaining -= active
+            stacks[:, duels] = remaining
+            lasting = (remaining > 0).any(axis=0)
+            paralyzed[duels] |= lasting & (effect == PARALYZE)
+            if source == 1:
+                charmed[duels] = lasting & (effect == CHARM)
+        return paralyzed, charmed
+
+    def cast(self, mask: np.ndarray):
+        """Spell.cast by the turn player where masked, on themselves or their opponent"""
+        values = self.values
+        cost = values[_COST, 0]
+        values[_MANA, 0] -= mask * cost
+        values[_SPENT, 0] += mask * cost
+        on_self = values[_ON_SELF, 0] == 1
+        self._apply(mask & on_self, 0)
+        self._apply(mask & ~on_self, 1)
+
+    def _apply(self, mask: np.ndarray, target: int):
+        values = self.values
+        effect, power = values[_EFFECT, 0], values[_POWER, 0]
+
+        if DAMAGE in self.effects:
+            hit = mask & (effect == DAMAGE)
+            values[_HEALTH, target] -= hit * power
+            if target == 1:
+                values[_DAMAGE, 0] += hit * power
+
+        rolled = mask & (effect >= BURN) & (effect <= LASTING)
+        if rolled.any():
+            rolled &= self.rng.random(len(mask)) < values[_CHANCE, 0]
+            stacks = self.stacks[target, target]
+            duels = np.flatnonzero(rolled)
+            free = stacks[:, duels] == 0
+            room = free.any(axis=0)
+            duels = duels[room]
+            stacks[free[:, room].argmax(axis=0), duels] = values[_DURATION, 0, duels]
+
+        if BLESS in self.effects:
+            blessed = mask & (effect == BLESS)
+            if blessed.any():
+                self.stacks[target][:, :, blessed] = 0
+        if MANA_BOOST in self.effects:
+            boost = 1 + np.where(mask & (effect == MANA_BOOST), power, 0) / 100
+            values[_MAX_MANA, target] *= boost
+            values[_MANA, target] *= 1 + (boost - 1) / 2
+        if HEALTH_BOOST in self.effects:
+            boost = 1 + np.where(mask & (effect == HEALTH_BOOST), power, 0) / 100
+            values[_MAX_HEALTH, target] *= boost
+            values[_HEALTH, target] *= boost
+
+    def meditate(self, mask: np.ndarray):
+        """Restores between a third of and all of the turn player's max mana"""
+        mana, max_mana = self.values[_MANA, 0], self.values[_MAX_MANA, 0]
+        low, high = np.floor(max_mana / 3), np.floor(max_mana)
+        restore = low + np.floor(self.rng.random(len(mana)) * (high - low + 1))
+        mana[:] = np.where(mask, np.minimum(mana + restore, max_mana), mana)
+
+    def play_turn(self):
+        """One Battle.next_turn and the turn player's action, for every duel"""
+        values = self.values
+        paralyzed, charmed = self.tick()
+        cost = values[_COST, 0]
+        passive = values[_PASSIVE, 0] == 1
+        self.cast(passive & (values[_MANA, 0] > cost))
+
+        # Paralyze and Charm filter the targets of single target spells only
+        single = values[_AOE, 0] == 0
+        blocked = single & (paralyzed | (charmed & (values[_ON_SELF, 0] == 0)))
+        casting = ~passive & (values[_MANA, 0] >= cost) & ~blocked
+        self.cast(casting)
+        self.meditate(~casting)
+        self.turns += 1
+        self.swap()
+
+    def results(self, mask: np.ndarray) -> dict:
+        """The results of the masked duels by original side"""
+        values = self.values[:, :, mask]
+        # The first side is back at position 0 after an even number of swaps
+        first = np.where(self.swapped[mask] == (self.turns % 2 == 1), 0, 1)
+        duels = np.arange(len(first))
+        alive = values[_HEALTH] > 0
+        winner = np.where(alive[first, duels] & ~alive[1 - first, duels], 0,
+                          np.where(alive[1 - first, duels] & ~alive[first, duels], 1, -1))
+        return {
+            'ids': self.ids[mask],
+            'winner': winner,
+            'turns': np.full(len(duels), self.turns),
+            'damage': np.stack([values[_DAMAGE][first, duels], values[_DAMAGE][1 - first, duels]]),
+            'spent': np.stack([values[_SPENT][first, duels], values[_SPENT][1 - first, duels]]),
+        }
+
+    def keep(self, mask: np.ndarray):
+        """Drops the duels that aren't masked"""
+        self.values = self.values[:, :, mask]
+        self.stacks = self.stacks[:, :, :, mask]
+        self.ids = self.ids[mask]
+        self.swapped = self.swapped[mask]
+
+    def play(self) -> dict:
+        """Plays every duel to the end or MAX_TURNS, returns the results in duel order"""
+        count = len(self.ids)
+        results = {'winner': np.full(count, -1), 'turns': np.full(count, MAX_TURNS),
+                   'damage': np.zeros((2, count)), 'spent': np.zeros((2, count))}
+
+        def store(result):
+            ids = result['ids']
+            results['winner'][ids] = result['winner']
+            results['turns'][ids] = result['turns']
+            results['damage'][:, ids] = result['damage']
+            results['spent'][:, ids] = result['spent']
+
+        # Finished duels are recorded straight away but only dropped in bulk,
+        # as dropping copies every array and playing on can't change a result
+        done = np.zeros(count, dtype=bool)
+        while self.turns < MAX_TURNS and not done.all():
+            self.play_turn()
+            health = self.values[_HEALTH]
+            finished = ((health[0] <= 0) | (health[1] <= 0)) & ~done
+            if finished.any():
+                store(self.results(finished))
+                done |= finished
+            if done.sum() * 4 > len(done):
+                self.keep(~done)
+                done = done[~done]
+        if not done.all():
+            store(self.results(~done))
+        return results
+
+
+def matchups(count: int) -> np.ndarray:
+    """Every pair of different spells once, (2, pairs)"""
+    if count == 1:
+        return np.zeros((2, 1), dtype=np.int64)
+    first, second = np.triu_indices(count, k=1)
+    return np.stack([first, second])
+
+
+def can_kill(table: SpellTable) -> np.ndarray:
+    """Whether each spell can bring a side's health to 0. Poison takes a share
+    of the health left, so on its own it never does"""
+    damaging = (table.effect == DAMAGE) | (table.effect == BURN) | (table.effect == LEECH)
+    return damaging & (table.power > 0) & ((table.effect == DAMAGE) | (table.chance > 0))
+
+
+def simulate(table: SpellTable, duels: int = 100, seed: int | None = None,
+             batch_size: int = 250_000) -> dict:
+    """Runs `duels` duels for every pair of spells and returns the totals per spell.
+    Pairs where neither spell can kill are draws, so they aren't played"""
+    rng = np.random.default_rng(RandomStream(seed).seed)
+    pairs = matchups(len(table))
+    killers = can_kill(table)
+    playable = killers[pairs[0]] | killers[pairs[1]]
+    stalemates, pairs = pairs[:, ~playable], pairs[:, playable]
+    spells = np.repeat(pairs, duels, axis=1)
+    count = len(table)
+    totals = {key: np.zeros(count) for key in ('duels', 'wins', 'draws', 'kill_turns', 'damage', 'spent')}
+
+    for start in range(0, spells.shape[1], batch_size):
+        batch = spells[:, start:start + batch_size]
+        results = Duels(table, batch.copy(), rng).play()
+        for side in (0, 1):
+            spell = batch[side]
+            won = results['winner'] == side
+            totals['duels'] += np.bincount(spell, minlength=count)
+            totals['wins'] += np.bincount(spell, weights=won, minlength=count)
+            totals['draws'] += np.bincount(spell, weights=results['winner'] == -1, minlength=count)
+            totals['kill_turns'] += np.bincount(spell, weights=won * results['turns'], minlength=count)
+            totals['damage'] += np.bincount(spell, weights=results['damage'][side], minlength=count)
+            totals['spent'] += np.bincount(spell, weights=results['spent'][side], minlength=count)
+    for side in (0, 1):
+        drawn = np.bincount(stalemates[side], minlength=count) * duels
+        totals['duels'] += drawn
+        totals['draws'] += drawn
+    return totals
+
+
+def summarize(table: SpellTable, totals: dict) -> dict:
+    """Win rate, average turns to kill and damage per mana, per spell, element and status"""
+    def stats(wins, duels, draws, kill_turns, damage, spent):
+        wins, duels, draws, kill_turns, damage, spent = map(float, (wins, duels, draws, kill_turns, damage, spent))
+        return {
+            'duels': int(duels),
+            'win_rate': round(wins / duels, 4) if duels else None,
+            'draw_rate': round(draws / duels, 4) if duels else None,
+            'turns_to_kill': round(kill_turns / wins, 2) if wins else None,
+            'damage_per_mana': round(damage / spent, 3) if spent else None,
+        }
+
+    keys = ('wins', 'duels', 'draws', 'kill_turns', 'damage', 'spent')
+    spells = [{'spell': name, 'element': element, 'status': status,
+               'difficulty': int(table.difficulty[index]),
+               **stats(*(totals[key][index] for key in keys))}
+              for index, (name, element, status) in enumerate(zip(table.names, table.elements, table.statuses))]
+
+    def group(labels: list[str]) -> dict:
+        grouped = {}
+        for label in sorted(set(labels)):
+            members = np.array([value == label for value in labels])
+            grouped[label] = stats(*(totals[key][members].sum() for key in keys))
+        return grouped
+
+    return {'spells': spells, 'elements': group(table.elements), 'statuses': group(table.statuses)}
+
+
+def print_summary(summary: dict):
+    """Prints the spells from most to least winning, then the elements and statuses"""
+    def row(label, stats):
+        win_rate = f"{stats['win_rate']:7.1%}" if stats['win_rate'] is not None else '      -'
+        kill = f"{stats['turns_to_kill']:8.1f}" if stats['turns_to_kill'] is not None else '       -'
+        efficiency = f"{stats['damage_per_mana']:8.2f}" if stats['damage_per_mana'] is not None else '       -'
+        return f"{label[:30]:<30} {win_rate} {kill} {efficiency} {stats['duels']:>10}"
+
+    header = f"{'':<30} {'win':>7} {'ttk':>8} {'dmg/mana':>8} {'duels':>10}"
+    spells = sorted(summary['spells'], key=lambda spell: spell['win_rate'] or 0, reverse=True)
+    print(header)
+    for spell in spells:
+        print(row(f"{spell['spell']} ({spell['difficulty']})", spell))
+    for title in ('elements', 'statuses'):
+        print(f"\n{title.title()}\n{header}")
+        for label, stats in summary[title].items():
+            print(row(label, stats))
+
+
+def main():
+    """Simulates the catalog of the database from the .env, or --dsn"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dsn", default=None,
+                        help="defaults to the HOSTED_DB_* settings in the .env")
+    parser.add_argument("--server", type=int, default=None,
+                        help="only the spells of this server id")
+    parser.add_argument("--duels", type=int, default=100,
+                        help="duels per pair of spells")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--output", default=None,
+                        help="also write the results to this JSON file")
+    args = parser.parse_args()
+
+    if args.dsn:
+        conn = psycopg2.connect(args.dsn, cursor_factory=RealDictCursor)
+    else:
+        conn = DatabaseConnection.connect()
+    try:
+        rows = CombatDatabase.get_spell_catalog(conn, args.server)
+    finally:
+        conn.close()
+    if not rows:
+        print("There are no spells to simulate")
+        return
+
+    table = SpellTable.from_rows(rows)
+    seed = RandomStream(args.seed).seed
+    start = time.perf_counter()
+    totals = simulate(table, args.duels, seed)
+    elapsed = time.perf_counter() - start
+    summary = summarize(table, totals)
+    print_summary(summary)
+    print(f"\n{int(totals['duels'].sum() / 2):,} duels of {len(table)} spells in {elapsed:.1f}s (seed {seed})")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump({'seed': seed, 'duels_per_pair': args.duels, **summary}, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
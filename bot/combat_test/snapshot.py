@@ -0,0 +1,197 @@
+"""Battle snapshots, so battles in progress survive a restart of the bot
+
+A snapshot is everything a Battle needs to carry on: the players with
+their stats, spells, items and status effects, the turn order, the turn
+and the seed. Players and spells are stored as lists in the order of the
+field tuples below rather than as dicts, then the whole thing is JSON and
+zlib compressed. A snapshot of a duel is a few hundred bytes.
+
+Raids also keep their groups and who has acted this turn. Combatants the
+bot plays are listed by id with the difficulty of their EnemyAI, which is
+all it needs, its cache only saves time.
+
+The rolls don't need storing: a battle waiting for an action rolls from
+a stream derived from its seed and turn number, see Battle.turn_stream.
+
+Bump SNAPSHOT_VERSION whenever the layout changes. Snapshots of another
+version are refused rather than guessed at."""
+
+import asyncio
+import json
+import zlib
+from collections import deque
+
+from .enemy import EnemyAI
+from .engine import Battle, Combatant, Item, Spell
+from .raid import Raid
+from .status_effects import StatusEffect, get_effect
+
+SNAPSHOT_VERSION = 1
+
+_COMBATANT_FIELDS = ('id', 'name', 'character_id', 'char_name', 'image', 'race_name', 'class_name',
+                     'base_health', 'base_mana', 'base_speed',
+                     'health', 'max_health', 'mana', 'max_mana', 'speed', 'defense',
+                     'can_move', 'cannot_attack_caster', 'mana_hidden', 'leech_active', 'weaknesses')
+_SPELL_FIELDS = ('name', 'power', 'cost', 'cooldown', 'element', 'chance', 'duration', 'spell_type')
+
+
+class SnapshotError(Exception):
+    """Raised when a snapshot can't be restored"""
+
+
+def _encode_spell(spell: Spell) -> list:
+    return [getattr(spell, field) for field in _SPELL_FIELDS] + [spell.status.status_id if spell.status else None]
+
+
+def _decode_spell(caster: Combatant, values: list) -> Spell:
+    *fields, status_id = values
+    spell = Spell(caster, None, None, None, None, None, status_id, None, None, None)
+    for field, value in zip(_SPELL_FIELDS, fields):
+        setattr(spell, field, value)
+    return spell
+
+
+def encode(battle: Battle) -> dict:
+    """The state of a battle as plain lists and numbers, a copy that later turns don't change"""
+    state = {
+        'v': SNAPSHOT_VERSION,
+        'id': battle.battle_id,
+        'seed': battle.seed,
+        'turn': battle.turn,
+        'xp': battle.experience,
+        'order': [player.id for player in battle.turn_order],
+        'current': battle.current_turn.id if battle.current_turn else None,
+        'players': [[
+            [getattr(player, field) for field in _COMBATANT_FIELDS[:-1]] + [list(player.weaknesses)],
+            [_encode_spell(spell) for spell in player.spells],
+            [[item.name, item.charges, _encode_spell(item.spell)] for item in player.inventory],
+            [[effect.definition.status_id, effect.caster.id, effect.power, effect.duration]
+             for effect in player.status_effects],
+        ] for player in battle.players],
+        'npcs': list(battle.npcs),
+        'difficulty': [ai.difficulty for ai in battle.npcs.values()],
+    }
+    if isinstance(battle, Raid):
+        state['raid'] = {
+            'size': battle.group_size,
+            'boss': battle.boss.id,
+            'groups': [[player.id for player in group] for group in battle.groups],
+            'group': battle.group,
+            'next': battle.next_group,
+            'acted': list(battle.acted),
+        }
+    return state
+
+
+def decode(state: dict) -> Battle:
+    """Rebuilds the battle waiting for the same action as when it was encoded"""
+    if state.get('v') != SNAPSHOT_VERSION:
+        raise SnapshotError(f"Snapshot version {state.get('v')} can't be read by version {SNAPSHOT_VERSION}")
+
+    raid = state.get('raid')
+    battle = Raid(state['id'], state['seed'], raid['size']) if raid else Battle(state['id'], state['seed'])
+    npcs = state.get('npcs', [])
+    difficulties = dict(zip(npcs, state.get('difficulty', ['normal'] * len(npcs))))
+    for fields, _, _, _ in state['players']:
+        combatant = Combatant.__new__(Combatant)
+        for field, value in zip(_COMBATANT_FIELDS, fields):
+            setattr(combatant, field, value)
+        difficulty = difficulties.get(combatant.id)
+        battle.join(combatant, ai=EnemyAI(difficulty) if difficulty else None)
+
+    # Status effects refer to their caster, so every player has to exist first
+    for player, (_, spells, items, effects) in zip(battle.players, state['players']):
+        player.spells = [_decode_spell(player, spell) for spell in spells]
+        player.inventory = [Item(name, _decode_spell(player, spell), charges) for name, charges, spell in items]
+        player.status_effects = [StatusEffect(get_effect(status_id), battle.get(caster_id), power, duration)
+                                 for status_id, caster_id, power, duration in effects]
+
+    battle.turn = state['turn']
+    battle.experience = state['xp']
+    battle.turn_order = deque(battle.get(player_id) for player_id in state['order'])
+    battle.current_turn = battle.get(state['current']) if state['current'] is not None else None
+    if raid:
+        battle.boss = battle.get(raid['boss'])
+        battle.groups = [[battle.get(player_id) for player_id in group] for group in raid['groups']]
+        battle.group_of = {player.id: index for index, group in enumerate(battle.groups) for player in group}
+        battle.group = raid['group']
+        battle.next_group = raid['next']
+        battle.acted = set(raid['acted'])
+    if battle.turn:
+        battle.rng = battle.turn_stream(battle.turn)
+    return battle
+
+
+def dumps(state: dict) -> bytes:
+    """An encoded battle as compressed bytes"""
+    return zlib.compress(json.dumps(state, separators=(',', ':')).encode())
+
+
+def loads(data: bytes) -> Battle:
+    """The battle in compressed snapshot bytes"""
+    try:
+        state = json.loads(zlib.decompress(data))
+    except (zlib.error, ValueError) as e:
+        raise SnapshotError(f"Corrupt snapshot: {e}") from e
+    return decode(state)
+
+
+class SnapshotWriter:
+    """Saves battle snapshots in the background, so a turn never waits on the database.
+
+    `save` only copies the battle's state, the writer task compresses and
+    stores it afterwards. Only the latest state of each battle is kept
+    while waiting, so a slow database skips snapshots instead of queueing
+    them up. `store(battle_id, version, data)` and `delete(battle_id)` are
+    coroutine functions, e.g. CombatDatabase's through AsyncDatabase."""
+
+    def __init__(self, store, delete):
+        self.store = store
+        self.delete = delete
+        # battle_id: encoded state, or None to delete the snapshot
+        self._pending: dict[int, dict | None] = {}
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._task = None
+
+    def start(self):
+        """Starts writing in the background on the running loop"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._write())
+
+    async def stop(self):
+        """Writes what is still pending, then stops"""
+        if self._task is not None:
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+
+    def save(self, battle: Battle):
+        """Queues the battle's current state to be written"""
+        self._pending[battle.battle_id] = encode(battle)
+        self._wakeup.set()
+
+    def discard(self, battle_id: int):
+        """Queues the battle's snapshot to be deleted, once it is over"""
+        self._pending[battle_id] = None
+        self._wakeup.set()
+
+    async def _write(self):
+        while not self._stopping:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            await self._flush()
+        await self._flush()
+
+    async def _flush(self):
+        pending, self._pending = self._pending, {}
+        for battle_id, state in pending.items():
+            try:
+                if state is None:
+                    await self.delete(battle_id)
+                else:
+                    await self.store(battle_id, SNAPSHOT_VERSION, dumps(state))
+            except Exception as e:
+                # A lost snapshot only matters if the bot restarts before the next one
+                print(f"Could not write the snapshot of battle {battle_id}: {e}")
@@ -1,275 +1,195 @@
-"""Defines all the status effects that a spell can have"""
-
-from random import randint
-
-class Status:
-    """A Status base class object"""
-    def __init__(self, status, caster: str, power: int, chance: int, duration: int):
+"""Defines all the status effects that a spell can have
+
+Every status in the spell_status table has one immutable EffectDefinition
+in STATUS_EFFECTS, keyed by its spell_status_id from seed.sql. A definition
+is a row of hooks, and the effect does nothing more than what they do:
+on_apply when the status lands, on_tick at the start of each of the
+target's turns, on_expire when it wears off and change_targets when the
+target picks who to aim a spell at.
+
+A status that lasts leaves a StatusEffect on the target, which only holds
+what differs per cast. Instant statuses, e.g. Blessed or Mana Boost,
+always land, run on_apply once and leave nothing behind."""
+
+from functools import partial
+from types import MappingProxyType
+from typing import Callable, NamedTuple
+from .rng import RandomStream
+
+
+class EffectDefinition(NamedTuple):
+    """How one status behaves, shared by every spell and target that has it"""
+    status_id: int
+    name: str
+    # Lasting statuses roll against the spell's chance and stay for its duration
+    lasting: bool = True
+    on_apply: Callable | None = None         # (effect, target) -> message or None
+    on_tick: Callable | None = None          # (effect, target) -> message
+    on_expire: Callable | None = None        # (effect, target)
+    change_targets: Callable | None = None   # (effect, player, targets) -> targets
+
+    def apply(self, caster, power: int, chance: int, duration: int, target, rng: RandomStream) -> str:
+        """Applies the status to the target, rolling against its chance with rng if it lasts"""
+        effect = StatusEffect(self, caster, power, duration)
+        if not self.lasting:
+            return self.on_apply(effect, target)
+
+        if rng.roll() >= chance:
+            return f"{target.name} resisted {self.name}."
+        target.status_effects.append(effect)
+        if self.on_apply:
+            self.on_apply(effect, target)
+        return f"{target.name} is now affected by {self.name}!"
+
+
+class StatusEffect:
+    """A status on one target, counting down the turns it has left"""
+    __slots__ = ('definition', 'caster', 'power', 'duration')
+
+    def __init__(self, definition: EffectDefinition, caster, power: int, duration: int):
+        self.definition = definition
         self.caster = caster
-        self.status = status
         self.power = power
-        self.chance = chance
         self.duration = duration
-        self.max_duration = duration
-
-
-    def apply_status(self, target) -> str:
-        """Applies a status effect object on the player"""
-        roll = randint(1, 100)
-        if roll < self.chance:
-            new_status = type(self)(self.caster, self.power,
-                                    self.chance, self.duration)
-            target.status_effects.append(new_status)
-        return f"{target.user.display_name} is now affected by {self.status}!" if roll < self.chance else f"{target.user.display_name} resisted {self.status}."
 
+    @property
+    def name(self) -> str:
+        """The status name, e.g. Burning"""
+        return self.definition.name
 
     def reduce_status(self, target) -> str:
-        """Reduces status duration each turn"""
+        """Ticks the status and reduces its duration each turn"""
+        definition = self.definition
+        message = definition.on_tick(self, target) if definition.on_tick else None
         if self.duration > 0:
             self.duration -= 1
         if self.duration == 0:
             target.status_effects.remove(self)
-            self.duration = self.max_duration
-            return f"{self.status} effect on {target.user.display_name} has worn off."
-        return f"Duration {self.duration} turns on {self.status}"
-
-    def change_targets(self, player, targets):
-        """Default: Does nothing, override in subclasses if needed"""
-        return [player] + targets
-
-
-
-# Specific Status Effect Classes
-class Paralyze(Status):
-    """A Paralysis object, that allows the player to skip a targets turn"""
-    def __init__(self, caster, power, chance, duration):
-        super().__init__("Paralyze", caster, power, chance, duration)
-
-    def apply_status(self, target):
-        message = super().apply_status(target)
-        target.can_move = False  # Prevents movement
-        return message
-
-    def reduce_status(self, target):
-        message = super().reduce_status(target)
-        if self.duration == 0:
-            target.can_move = True  # Restore movement
-        return message
-
-    def change_targets(self, player, targets):
-        return []
-
-
-class Frozen(Status):
-    """Slows a targets speed"""
-    def __init__(self, caster, power, chance, duration):
-        super().__init__("Frozen", caster, power, chance, duration)
-
-    def apply_status(self, target):
-        message = super().apply_status(target)
-        target.speed -= self.power  # Example: Reduce speed
-        return message
-
-    def reduce_status(self, target):
-        message = super().reduce_status(target)
-        if self.duration == 0:
-            target.speed = target.data.get('speed')  # Restore speed
-        return message
-
+            if definition.on_expire:
+                definition.on_expire(self, target)
+            status_message = f"{self.name} effect on {target.name} has worn off."
+        else:
+            status_message = f"Duration {self.duration} turns on {self.name}"
+        return f"{message}\n{status_message}" if message else status_message
 
-class Burning(Status):
-    """Burns the target for some damage over a duration"""
-    def __init__(self, caster, power, chance, duration):
-        super().__init__("Burning", caster, power, chance, duration)
 
-    def reduce_status(self, target):
-        damage = self.power/self.duration
-        target.health -= damage
-        message = super().reduce_status(target)
-        return f"{target.user.display_name} takes {damage} burn damage!\n{message}" if message else f"{target.user.display_name} takes {damage} burn damage!"
+def _set(attribute: str, value, effect: StatusEffect, target):
+    setattr(target, attribute, value)
 
 
-class Poisoned(Status):
-    """Poisons the target for a percentage of health for a duration"""
-    def __init__(self, caster, power, chance, duration):
-        super().__init__("Poisoned", caster, power, chance, duration)
+def _paralyzed_targets(effect, player, targets):
+    return []
 
-    def reduce_status(self, target):
-        damage = target.health * (self.power / 100)  # Power% of HP
-        target.health -= damage
-        message = super().reduce_status(target)
-        return f"{target.user.display_name} suffers {damage} poison damage!\n{message}" if message else f"{target.user.display_name} suffers {damage} poison damage!"
-
-
-class Charmed(Status):
-    """Charms the target so they can't attack the target"""
-    def __init__(self, caster, power, chance, duration):
-        super().__init__("Charmed", caster, power, chance, duration)
-
-    def apply_status(self, target):
-        message = super().apply_status(target)
-        target.cannot_attack_caster = True
-        return message
-
-    def reduce_status(self, target):
-        message = super().reduce_status(target)
-        if self.duration == 0:
-            target.cannot_attack_caster = False
-        return message
-
-    def change_targets(self, player, targets):
-        if self.caster in targets:
-            targets.remove(self.caster)
-        return targets
-
-
-class Regenerating(Status):
-    """The target heals a percentage of power"""
-    def __init__(self, caster, power, chance, duration):
-        super().__init__("Regenerating", caster, power, chance, duration)
-
-    def reduce_status(self, target):
-        heal = target.max_health * (self.power/100)  # 5% of max HP
-        target.health += heal
-        target.health = min(target.health, target.max_health)
-        message = super().reduce_status(target)
-        return f"{target.user.display_name} regenerates {heal} HP!\n{message}" if message else f"{target.user.display_name} regenerates {heal} HP!"
-
-
-class Blessed(Status):
-    """The target removes all status effects"""
-    def __init__(self, caster, power, chance, duration):
-        super().__init__("Blessed", caster, power, chance, duration)
-
-    def apply_status(self, target):
-        target.status_effects.clear()
-        return f"{target.user.display_name} is cleansed of all status effects!"
-
-
-
-class Confusion(Status):
-    """The Target can't see the mana cost for their spells"""
-    def __init__(self, caster, power, chance, duration):
-        super().__init__("Confusion", caster, power, chance, duration)
-
-    def apply_status(self, target):
-        message = super().apply_status(target)
-        target.mana_hidden = True
-        return message
-
-    def reduce_status(self, target):
-        message = super().reduce_status(target)
-        if self.duration == 0:
-            target.mana_hidden = False
-        return message
 
+def _slow(effect, target):
+    target.speed -= effect.power
 
-class ManaBoost(Status):
-    """The max mana the target has is boosted"""
-    def __init__(self, caster, power, chance, duration):
-        super().__init__("Mana Boost", caster, power, chance, duration)
-        self.boost_amount = 1 + (power / 100)  # Scale increase by power
-        self.regen_amount = 1 + (power / 200)  # Regenerate half the boost
 
-    def apply_status(self, target):
-        target.max_mana *= self.boost_amount
-        target.mana *= self.regen_amount
-        return f"{target.user.display_name}'s max mana increased by {round((self.boost_amount - 1) * 100, 2)}%!"
+def _restore_speed(effect, target):
+    target.speed += effect.power
 
 
-class HealthBoost(Status):
-    """The max health of the target is boosted"""
-    def __init__(self, caster, power, chance, duration):
-        super().__init__("Health Boost", caster, power, chance, duration)
-        self.boost_amount = 1 + (power / 100)  # Scale increase by power
-        self.regen_amount = 1+ (power / 200)  # Regenerate half the boost
+def _burn(effect, target):
+    damage = effect.power / effect.duration
+    target.health -= damage
+    return f"{target.name} takes {damage} burn damage!"
 
 
-def apply_status(self, target):
-    """Applies the health boost effect"""
-    target.max_health *= self.boost_amount
-    target.health *= self.boost_amount
-    return f"{target.user.display_name}'s max health increased by {round((self.boost_amount - 1) * 100, 2)}%!"
+def _poison(effect, target):
+    damage = target.health * (effect.power / 100)  # Power% of HP
+    target.health -= damage
+    return f"{target.name} suffers {damage} poison damage!"
 
 
+def _charmed_targets(effect, player, targets):
+    if effect.caster in targets:
+        targets.remove(effect.caster)
+    return targets
 
-class ExtremeSpeed(Status):
-    """Massively increases the targets speed"""
-    def __init__(self, caster, power, chance, duration):
-        super().__init__("Extreme Speed", caster, power, chance, duration)
 
-    def apply_status(self, target):
-        target.speed += self.power  # Example: Increase speed
-        return f"{target.user.display_name} moves at extreme speed!"
+def _regenerate(effect, target):
+    heal = target.max_health * (effect.power / 100)
+    target.health = min(target.health + heal, target.max_health)
+    return f"{target.name} regenerates {heal} HP!"
 
 
-class Armor(Status):
-    """Increases the targets defense"""
-    def __init__(self, caster, power, chance, duration):
-        super().__init__("Armor", caster, power, chance, duration)
+def _bless(effect, target):
+    # Expired rather than dropped, so e.g. a cleansed Paralyze lets the target move again
+    cleansed, target.status_effects = target.status_effects, []
+    for cleansed_effect in cleansed:
+        if cleansed_effect.definition.on_expire:
+            cleansed_effect.definition.on_expire(cleansed_effect, target)
+    return f"{target.name} is cleansed of all status effects!"
 
-    def apply_status(self, target):
-        target.defense *= 1 + (self.power / 100)
-        return f"{target.user.display_name} gains {round(((self.power / 100) - 1) * 100, 2)} extra defense!"
 
+def _boost_mana(effect, target):
+    target.max_mana *= 1 + (effect.power / 100)
+    target.mana *= 1 + (effect.power / 200)  # Regenerate half the boost
+    return f"{target.name}'s max mana increased by {round(effect.power, 2)}%!"
 
-class Taunt(Status):
-    """The target can only target the caster"""
-    def __init__(self, caster, power, chance, duration):
-        super().__init__("Taunt", caster, power, chance, duration)
 
-    def change_targets(self, player, targets):
-        return [self.caster]
+def _boost_health(effect, target):
+    target.max_health *= 1 + (effect.power / 100)
+    target.health *= 1 + (effect.power / 100)
+    return f"{target.name}'s max health increased by {round(effect.power, 2)}%!"
 
 
-class Leech(Status):
-    """The target looses some health a turn and the caster gains that health"""
-    def __init__(self, caster, power, chance, duration):
-        super().__init__("Leech", caster, power, chance, duration)
+def _speed_up(effect, target):
+    target.speed += effect.power
+    return f"{target.name} moves at extreme speed!"
 
-    def apply_status(self, target):
-        message = super().apply_status(target)
-        target.leech_active = True
-        return message
 
-    def reduce_status(self, target):
-        damage = target.max_health * (self.power / 100) # 4% HP loss
-        target.health -= damage
-        self.caster.health += damage
-        message = super().reduce_status(target)
-        return f"{target.user.display_name} loses {damage} HP due to leech!\n{message}" if message else f"{target.user.display_name} loses {damage} HP due to leech!"
+def _armor(effect, target):
+    target.defense *= 1 + (effect.power / 100)
+    return f"{target.name} gains {round(((effect.power / 100) - 1) * 100, 2)} extra defense!"
 
-# Weaknesses as specific subclasses
 
-class ElementalWeakness(Status):
-    """Sets a players elemental weakness"""
-    def __init__(self, element: str):
-        super().__init__(f"{element} Weakness", chance=100, duration=3)
-        self.element = element
+def _taunted_targets(effect, player, targets):
+    return [effect.caster]
 
-    def apply_status(self, target):
-        target.weaknesses.append(self.element)
-        return f"{target.user.display_name} is now weak to {self.element}!"
 
-class FireWeakness(ElementalWeakness):
-    """A fire weakness"""
-    def __init__(self):
-        super().__init__("Fire")
+def _leech(effect, target):
+    damage = target.max_health * (effect.power / 100)
+    target.health -= damage
+    effect.caster.health += damage
+    return f"{target.name} loses {damage} HP due to leech!"
 
 
-class WaterWeakness(ElementalWeakness):
-    """A water weakness"""
-    def __init__(self):
-        super().__init__("Water")
+def _weaken(element: str, effect, target):
+    target.weaknesses.append(element)
+    return f"{target.name} is now weak to {element}!"
 
 
-class EarthWeakness(ElementalWeakness):
-    """A Earth Weakness"""
-    def __init__(self):
-        super().__init__("Earth")
+# None (1) and Sleep (5) have no effect, spells with them just deal damage
+STATUS_EFFECTS = MappingProxyType({definition.status_id: definition for definition in (
+    EffectDefinition(2, "Paralyze", on_apply=partial(_set, 'can_move', False),
+                     on_expire=partial(_set, 'can_move', True), change_targets=_paralyzed_targets),
+    EffectDefinition(3, "Frozen", on_apply=_slow, on_expire=_restore_speed),
+    EffectDefinition(4, "Burning", on_tick=_burn),
+    EffectDefinition(6, "Poisoned", on_tick=_poison),
+    EffectDefinition(7, "Charmed", on_apply=partial(_set, 'cannot_attack_caster', True),
+                     on_expire=partial(_set, 'cannot_attack_caster', False), change_targets=_charmed_targets),
+    EffectDefinition(8, "Regenerating", on_tick=_regenerate),
+    EffectDefinition(9, "Blessed", lasting=False, on_apply=_bless),
+    EffectDefinition(10, "Confusion", on_apply=partial(_set, 'mana_hidden', True),
+                     on_expire=partial(_set, 'mana_hidden', False)),
+    EffectDefinition(11, "Mana Boost", lasting=False, on_apply=_boost_mana),
+    EffectDefinition(12, "Health Boost", lasting=False, on_apply=_boost_health),
+    EffectDefinition(13, "Extreme Speed", lasting=False, on_apply=_speed_up),
+    EffectDefinition(14, "Armor", lasting=False, on_apply=_armor),
+    EffectDefinition(15, "Taunt", change_targets=_taunted_targets),
+    EffectDefinition(16, "Fire Weakness", lasting=False, on_apply=partial(_weaken, "Fire")),
+    EffectDefinition(17, "Water Weakness", lasting=False, on_apply=partial(_weaken, "Water")),
+    EffectDefinition(18, "Earth Weakness", lasting=False, on_apply=partial(_weaken, "Earth")),
+    EffectDefinition(19, "Air Weakness", lasting=False, on_apply=partial(_weaken, "Air")),
+    EffectDefinition(20, "Leech", on_apply=partial(_set, 'leech_active', True), on_tick=_leech,
+                     on_expire=partial(_set, 'leech_active', False)),
+)})
+_BY_NAME = MappingProxyType({definition.name: definition for definition in STATUS_EFFECTS.values()})
 
 
-class AirWeakness(ElementalWeakness):
-    """A Air weakness"""
-    def __init__(self):
-        super().__init__("Air")
+def get_effect(status: int | str | None) -> EffectDefinition | None:
+    """The definition of a spell_status id or status name, None if the status has no effect"""
+    if isinstance(status, int):
+        return STATUS_EFFECTS.get(status)
+    return _BY_NAME.get(status)
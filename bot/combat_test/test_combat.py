@@ -0,0 +1,705 @@
+# pylint: disable-all
+
+import asyncio
+import json
+import time
+import zlib
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from combat_test.board import BattleBoard
+from combat_test.enemy import EnemyAI
+from combat_test.engine import Battle, Combatant, Action, Event, CombatError
+from combat_test.raid import Raid, make_boss
+from combat_test.reaper import BattleReaper
+from combat_test.replay import Replay, ReplayError, record
+from combat_test import replay as replays
+from combat_test.scheduler import TurnScheduler
+from combat_test.rng import RandomStream
+from combat_test.status_effects import STATUS_EFFECTS, StatusEffect, get_effect
+from combat_test.snapshot import SnapshotError, SnapshotWriter, decode, dumps, encode, loads
+from combat_test.simulator import SpellTable, simulate, summarize, BURN, DAMAGE, REGEN
+# The cog imports the package as bot.combat_test, its battles are built from those modules
+from bot.combat_test import combat as cog_module, replay as cog_replays
+
+
+def spell_row(name, spell_type="Single Target", power=10, mana_cost=5, status_name=None, chance=None, duration=None):
+    return {'spell_name': name, 'spell_power': power, 'mana_cost': mana_cost, 'cooldown': 1,
+            'element_name': 'Fire', 'status_name': status_name, 'chance': chance,
+            'duration': duration, 'spell_type_name': spell_type}
+
+
+def play(battle):
+    """Plays a battle to the end, everyone casting their first spell at the first opponent"""
+    events = battle.start()
+    while not battle.over:
+        player = battle.current_turn
+        events += battle.act(Action(Action.CAST, player.id, 0, target=battle.opponents()[0].id))
+    return events
+
+
+def make_combatant(combatant_id, speed=30, health=100, mana=50, spells=None, items=None):
+    character = {'character_id': combatant_id * 10, 'character_name': f'hero {combatant_id}',
+                 'health': health, 'mana': mana, 'speed': speed, 'experience': 0}
+    return Combatant.from_rows(combatant_id, f'player {combatant_id}', character, spells or [], items or [])
+
+
+@pytest.fixture
+def battle():
+    """A started duel where player 1 always goes first"""
+    battle = Battle(123)
+    battle.join(make_combatant(1, speed=100, spells=[
+        spell_row('Fireball'),
+        spell_row('Inferno', spell_type='Area of Effect', power=20, mana_cost=40),
+        spell_row('Ignite', power=30, status_name='Burning', chance=101, duration=3)]), 50)
+    battle.join(make_combatant(2, speed=0), 50)
+    battle.start()
+    return battle
+
+
+class TestBattle:
+    def test_start_needs_two_players(self):
+        battle = Battle(123)
+        battle.join(make_combatant(1), 50)
+        with pytest.raises(CombatError):
+            battle.start()
+        with pytest.raises(CombatError):
+            battle.join(make_combatant(1))
+
+    def test_start_rolls_initiative_and_begins_a_turn(self):
+        battle = Battle(123)
+        battle.join(make_combatant(1, speed=0), 50)
+        battle.join(make_combatant(2, speed=100), 50)
+
+        events = battle.start()
+        assert events[0] == Event(Event.STARTED, 2)
+        assert events[-1] == Event(Event.TURN, 2, amount=1)
+        assert battle.current_turn.id == 2
+        assert battle.experience == 100
+
+    def test_only_the_turn_player_can_act(self, battle):
+        with pytest.raises(CombatError):
+            battle.act(Action(Action.ATTACK, 2))
+
+    def test_actions_from_a_past_turn_are_rejected(self, battle):
+        action = Action(Action.MEDITATE, 1, turn=battle.turn)
+        battle.act(action)
+        battle.act(Action(Action.MEDITATE, 2, turn=battle.turn))
+        assert battle.current_turn.id == 1
+        with pytest.raises(CombatError):
+            battle.act(action)
+
+    def test_cast_damages_and_passes_the_turn(self, battle):
+        events = battle.act(Action(Action.CAST, 1, 0, target=2))
+
+        assert Event(Event.DAMAGE, 1, 2, 'Fireball', amount=10) in events
+        assert battle.get(1).mana == 45
+        assert battle.get(2).health == 90
+        assert battle.current_turn.id == 2
+
+    def test_not_enough_mana_loses_the_turn(self, battle):
+        battle.get(1).mana = 1
+        events = battle.act(Action(Action.CAST, 1, 1))
+
+        assert events[0] == Event(Event.NOT_ENOUGH_MANA, 1, spell='Inferno')
+        assert battle.get(2).health == 100
+        assert battle.current_turn.id == 2
+
+    def test_status_ticks_on_the_targets_turn(self, battle):
+        events = battle.act(Action(Action.CAST, 1, 2, target=2))
+
+        assert events[1].kind == Event.STATUS_APPLIED
+        ticks = [event for event in events if event.kind == Event.STATUS_TICK]
+        assert ticks and ticks[0].actor == 2
+        assert battle.get(2).health == 90
+
+    def test_last_player_standing_wins(self, battle):
+        battle.get(2).health = 15
+        events = battle.act(Action(Action.CAST, 1, 1))
+
+        assert Event(Event.FAINTED, target=2) in events
+        assert events[-1] == Event(Event.ENDED, 1, amount=100)
+        assert battle.over and battle.winner.id == 1
+        with pytest.raises(CombatError):
+            battle.act(Action(Action.ATTACK, 1))
+
+    def test_running_ends_a_duel(self, battle):
+        events = battle.act(Action(Action.RUN, 1))
+        assert Event(Event.FLED, 1) in events
+        assert battle.winner.id == 2
+
+    def test_meditate_restores_up_to_max_mana(self, battle):
+        battle.get(1).mana = 0
+        with patch.object(battle.rng, 'randint', return_value=30):
+            events = battle.act(Action(Action.MEDITATE, 1))
+        assert events[0] == Event(Event.MEDITATE, 1, amount=30)
+        assert battle.get(1).mana == 30
+
+    def test_many_battles_play_to_the_end(self):
+        for battle_id in range(1000):
+            battle = Battle(battle_id)
+            battle.join(make_combatant(1, spells=[spell_row('Fireball', power=25)]))
+            battle.join(make_combatant(2, spells=[spell_row('Fireball', power=25)]))
+            play(battle)
+            assert battle.winner is not None
+
+
+def make_duel(ai, health=10, start=True):
+    """A duel where the bot's combatant, played by `ai`, goes first"""
+    battle = Battle(9, seed=4)
+    battle.join(make_combatant(-2, speed=100, spells=[
+        spell_row('Ignite', power=90, mana_cost=10, status_name='Burning', chance=101, duration=3),
+        spell_row('Jab', power=12, mana_cost=0)]), 50, ai)
+    battle.join(make_combatant(1, speed=0, health=health, spells=[spell_row('Fireball')]), 50)
+    if start:
+        battle.start()
+    return battle
+
+
+class TestEnemyAI:
+    def test_search_finds_the_win_greedy_misses(self):
+        ai = EnemyAI(seed=1)
+        battle = make_duel(ai)
+        npc = battle.get(-2)
+        # Ignite has the most power, but only Jab wins this turn
+        assert ai.greedy(battle, npc).index == 0
+        assert ai.choose(battle, npc) == Action(Action.CAST, -2, 1, target=1, turn=battle.turn)
+        assert ai.searched == ai.depth
+
+    def test_thinking_changes_nothing(self):
+        ai = EnemyAI('hard', seed=1)
+        battle = make_duel(ai, health=100)
+        before = encode(battle)
+        ai.choose(battle, battle.get(-2))
+        assert encode(battle) == before and battle.log == []
+        assert battle.rng.rolls(5, 1, 100) == battle.turn_stream(battle.turn).rolls(5, 1, 100)
+
+    def test_out_of_time_falls_back_to_greedy(self):
+        ai = EnemyAI(seed=1)
+        ai.budget = 0
+        battle = make_duel(ai)
+        assert ai.choose(battle, battle.get(-2)) == ai.greedy(battle, battle.get(-2))
+        assert ai.searched == 0
+
+    def test_harder_searches_deeper_and_reuses_positions(self):
+        easy, hard = EnemyAI('easy', seed=1), EnemyAI('hard', seed=1)
+        easy.budget = hard.budget = 60
+        battle = make_duel(hard, health=100)
+        easy.choose(battle, battle.get(-2))
+        hard.choose(battle, battle.get(-2))
+        assert (easy.searched, hard.searched) == (1, 4)
+        assert hard.nodes > easy.nodes and hard.hits
+
+    def test_difficulty_survives_a_snapshot(self):
+        battle = make_duel(EnemyAI('hard'))
+        assert decode(encode(battle)).npcs[-2].difficulty == 'hard'
+        with pytest.raises(ValueError):
+            EnemyAI('impossible')
+
+
+def make_raid(raiders, group_size=25):
+    raid = Raid(7, seed=3, group_size=group_size)
+    raid.join_boss(make_boss(), EnemyAI(), experience=200)
+    for combatant_id in range(1, raiders + 1):
+        raid.join(make_combatant(combatant_id, speed=combatant_id % 7, spells=[
+            spell_row('Fireball', power=25),
+            spell_row('Mend', status_name='Regenerating', chance=101, duration=2)]), 50)
+    raid.start()
+    return raid
+
+
+class TestRaid:
+    def test_initiative_sorts_raiders_into_groups(self):
+        raid = make_raid(60)
+        assert [len(group) for group in raid.groups] == [25, 25, 10]
+        assert raid.boss.max_health == 120 * 60 and raid.experience == 200
+        assert raid.group == 0 and raid.current_turn is None
+
+    def test_each_member_acts_once_then_the_boss(self):
+        raid = make_raid(30)
+        first, second = raid.groups[0][:2]
+        raid.act(Action(Action.CAST, first.id, 0, target=raid.boss.id, turn=raid.turn))
+        assert raid.boss.health == raid.boss.max_health - 25
+        with pytest.raises(CombatError):
+            raid.act(Action(Action.MEDITATE, first.id))
+        with pytest.raises(CombatError):
+            raid.act(Action(Action.MEDITATE, raid.groups[1][0].id))
+        # Raiders can heal each other
+        raid.act(Action(Action.CAST, second.id, 1, target=first.id))
+        assert raid.get(first.id).status_effects
+
+        events = raid.close_turn()
+        assert events[-1] == Event(Event.TURN, raid.boss.id, amount=2)
+        raid.act(raid.npcs[raid.boss.id].choose(raid, raid.boss))
+        assert raid.group == 1 and raid.waiting_for() == [p for p in raid.groups[1] if p.health > 0]
+
+    def test_boss_casts_its_area_spell_on_every_raider(self):
+        raid = make_raid(10)
+        raid.close_turn()
+        events = raid.act(Action(Action.CAST, raid.boss.id, 1))
+        assert events[0] == Event(Event.CAST, raid.boss.id, None, 'Dragon Fire')
+        statuses = [event for event in events if event.kind == Event.STATUS_APPLIED]
+        assert len(statuses) == 10
+        assert sum(event.amount for event in statuses) == sum(
+            1 for raider in raid.raiders() for effect in raider.status_effects if effect.name == 'Burning')
+
+    def test_raid_plays_to_the_end(self):
+        raid = make_raid(40, group_size=8)
+        while not raid.over:
+            if raid.group is None:
+                raid.act(EnemyAI().choose(raid, raid.boss))
+            else:
+                for raider in raid.waiting_for():
+                    if raid.over:
+                        break
+                    raid.act(Action(Action.CAST, raider.id, 0, target=raid.boss.id))
+        assert raid.boss.health <= 0
+        assert raid.winners() == raid.raiders() and raid.winners()
+
+    def test_boss_decides_within_its_budget(self):
+        raid = make_raid(25)
+        raid.close_turn()
+        for difficulty in ('normal', 'hard'):
+            ai = EnemyAI(difficulty, seed=1)
+            greedy = ai.greedy
+
+            def slow_greedy(battle, player):
+                # Slow enough that playing out one group's turn takes longer than the budget
+                time.sleep(0.003)
+                return greedy(battle, player)
+
+            started = time.perf_counter()
+            with patch.object(ai, 'greedy', slow_greedy):
+                ai.choose(raid, raid.boss)
+            assert time.perf_counter() - started < ai.budget + 0.01
+
+    def test_snapshot_keeps_the_groups(self):
+        raid = make_raid(30)
+        raid.act(Action(Action.MEDITATE, raid.groups[0][0].id))
+        restored = decode(encode(raid))
+        assert isinstance(restored, Raid) and encode(restored) == encode(raid)
+        assert restored.boss is restored.get(raid.boss.id) and restored.npcs.keys() == {raid.boss.id}
+        assert not restored.can_act(raid.groups[0][0].id) and restored.can_act(raid.groups[0][1].id)
+
+
+class TestSnapshot:
+    def started(self):
+        battle = Battle(123, seed=5)
+        for combatant_id in (1, 2, 3):
+            battle.join(make_combatant(combatant_id, speed=combatant_id * 10, spells=[
+                spell_row('Ignite', power=12, status_name='Burning', chance=50, duration=3),
+                spell_row('Charm', power=1, status_name='Charmed', chance=70, duration=2)]), 50)
+        battle.start()
+        for _ in range(4):
+            battle.act(Action(Action.CAST, battle.current_turn.id, 1, target=battle.opponents()[0].id))
+        return battle
+
+    def test_round_trip_keeps_the_state(self):
+        battle = self.started()
+        restored = loads(dumps(encode(battle)))
+
+        assert encode(restored) == encode(battle)
+        assert restored.current_turn.id == battle.current_turn.id
+        charmed = [effect for player in restored.players for effect in player.status_effects]
+        assert charmed and all(effect.caster is restored.get(effect.caster.id) for effect in charmed)
+
+    def test_restored_battle_plays_out_the_same(self):
+        battle = self.started()
+        restored = decode(encode(battle))
+
+        def finish(battle):
+            events = []
+            while not battle.over:
+                player = battle.current_turn
+                if player.mana < 5:
+                    events += battle.act(Action(Action.MEDITATE, player.id))
+                else:
+                    events += battle.act(Action(Action.CAST, player.id, 0, target=battle.opponents()[0].id))
+            return events
+
+        assert finish(restored) == finish(battle)
+        assert restored.winner.id == battle.winner.id
+
+    def test_refuses_other_versions_and_corrupt_data(self):
+        state = encode(self.started())
+        with pytest.raises(SnapshotError):
+            decode({**state, 'v': 0})
+        with pytest.raises(SnapshotError):
+            loads(b'not a snapshot')
+
+    def test_writer_keeps_only_the_latest_state(self):
+        stored, deleted = {}, []
+
+        async def store(battle_id, version, data):
+            stored[battle_id] = loads(data).turn
+
+        async def delete(battle_id):
+            deleted.append(battle_id)
+
+        async def run():
+            writer = SnapshotWriter(store, delete)
+            battle = self.started()
+            writer.start()
+            writer.save(battle)
+            battle.act(Action(Action.MEDITATE, battle.current_turn.id))
+            writer.save(battle)
+            writer.discard(7)
+            await writer.stop()
+            return battle.turn
+
+        turn = asyncio.run(run())
+        assert stored == {123: turn} and deleted == [7]
+
+
+class TestReplay:
+    def test_duel_plays_again_the_same(self):
+        battle = make_duel(EnemyAI('easy', seed=1), health=60, start=False)
+        # Recorded from before the start, as the cog does
+        opening = encode(battle)
+        events = battle.start()
+        while not battle.over:
+            player = battle.current_turn
+            action = (battle.npcs[player.id].choose(battle, player) if player.id in battle.npcs
+                      else Action(Action.CAST, player.id, 0, target=-2, turn=battle.turn))
+            events += battle.act(action)
+
+        packed = replays.dumps(record(opening, battle))
+        replay = replays.loads(packed)
+        assert replay == Replay(opening, battle.log)
+        replayed, replayed_events = replays.play(replay)
+        assert replayed_events == events and encode(replayed) == encode(battle)
+
+    def test_raid_replays_from_where_it_resumed(self):
+        raid = make_raid(30, group_size=10)
+        raid.act(Action(Action.CAST, raid.groups[0][0].id, 0, target=raid.boss.id, turn=raid.turn))
+        raid.close_turn()
+        restored = decode(encode(raid))
+        opening = encode(restored)
+        while not restored.over:
+            if restored.group is None:
+                restored.act(EnemyAI('easy').choose(restored, restored.boss))
+            else:
+                for raider in restored.waiting_for()[:5]:
+                    restored.act(Action(Action.CAST, raider.id, 0, target=restored.boss.id, turn=restored.turn))
+                restored.close_turn()
+
+        packed = replays.dumps(record(opening, restored))
+        assert Action.PASS in {action.kind for action in restored.log}
+        # Five bytes or so an action, the opening is most of it
+        assert len(packed) < len(zlib.compress(json.dumps(opening).encode())) + 2 * len(restored.log)
+        replayed, _ = replays.play(replays.loads(packed))
+        assert encode(replayed) == encode(restored)
+
+    def test_refuses_what_it_cant_play(self):
+        battle = make_duel(None)
+        opening = encode(battle)
+        battle.act(Action(Action.CAST, -2, 1, target=1, turn=battle.turn))
+        packed = replays.dumps(record(opening, battle))
+        with pytest.raises(ReplayError):
+            replays.loads(b'not a replay')
+        with pytest.raises(ReplayError):
+            replays.loads(packed[:-3])
+        # An action the rules no longer allow
+        with pytest.raises(ReplayError):
+            replays.play(Replay(opening, [Action(Action.CAST, -2, 5, target=1)]))
+
+    def test_second_start_click_keeps_the_replay(self):
+        saved = {}
+
+        async def save_replay(battle_id, turns, winner_id, data):
+            saved[battle_id] = data
+            return 1
+
+        def user(user_id):
+            user = MagicMock()
+            user.id, user.name, user.display_name = user_id, f'user {user_id}', f'player {user_id}'
+            return user
+
+        def loadout(combatant_id, speed):
+            return {'character': {'character_id': combatant_id * 10, 'character_name': f'hero {combatant_id}',
+                                  'health': 40, 'mana': 50, 'speed': speed, 'experience': 0},
+                    'spells': [spell_row('Fireball')], 'items': []}
+
+        async def run():
+            cog = cog_module.Combat(MagicMock(), MagicMock())
+            cog.db.combat.get_combatants = AsyncMock(return_value={'user 1': loadout(1, 100), 'user 2': loadout(2, 0)})
+            cog.db.combat.add_experience_many = AsyncMock(return_value={})
+            cog.db.combat.save_replay = save_replay
+            channel, ctx = MagicMock(), MagicMock()
+            channel.send = AsyncMock()
+            battle = cog_module.Battle(5, seed=2)
+            cog.active_battles[5] = battle
+            cog.boards[5] = cog_module.BattleBoard(channel, min_interval=0)
+            view = cog_module.JoinBattleView(cog, ctx, 5, MagicMock())
+            view.joined = {1: user(1), 2: user(2)}
+
+            def click():
+                interaction = MagicMock()
+                interaction.response.defer = AsyncMock()
+                interaction.response.send_message = AsyncMock()
+                interaction.followup.send = AsyncMock()
+                return interaction
+
+            def play_turn():
+                player = battle.current_turn
+                return cog.resolve(ctx, 5, cog_module.Action(Action.CAST, player.id, 0,
+                                                             target=battle.opponents()[0].id, turn=battle.turn))
+
+            await view.start_battle.callback(click())
+            for _ in range(3):
+                await play_turn()
+            assert view.is_finished()
+
+            # A late click on the old buttons, and one that slipped past them to the cog
+            late = click()
+            await view.start_battle.callback(late)
+            late.response.send_message.assert_awaited_once()
+            with pytest.raises(cog_module.CombatError):
+                await cog.start_battle(ctx, 5, list(view.joined.values()))
+            assert cog.db.combat.get_combatants.await_count == 1
+
+            while not battle.over:
+                await play_turn()
+            await asyncio.sleep(0)
+            return battle
+
+        battle = asyncio.run(run())
+        replayed, _ = cog_replays.play(cog_replays.loads(saved[5]))
+        assert replayed.winner.id == battle.winner.id and replayed.turn == battle.turn
+
+
+class TestCombatCog:
+    def test_busy_channel_keeps_its_battle(self):
+        async def run():
+            cog = cog_module.Combat(MagicMock(), MagicMock())
+            ctx = MagicMock()
+            ctx.channel.id = 5
+            ctx.send = AsyncMock()
+            await cog_module.Combat.combat.callback(cog, ctx)
+            battle, board = cog.active_battles[5], cog.boards[5]
+
+            await cog_module.Combat.raid.callback(cog, ctx)
+            assert cog.active_battles[5] is battle and cog.boards[5] is board
+            ctx.send.assert_awaited_with("A battle is already in progress in this channel!")
+            # The board of the first battle was the only one posted
+            assert ctx.send.await_count == 2
+
+        asyncio.run(run())
+
+
+class TestBattleReaper:
+    class View:
+        stopped = False
+
+        def stop(self):
+            self.stopped = True
+
+    def test_idle_battles_expire_and_their_views_stop(self):
+        expired = []
+
+        async def expire(battle_id):
+            expired.append(battle_id)
+
+        reaper = BattleReaper(expire, idle_timeout=60)
+        view, other = self.View(), self.View()
+        reaper.touch(1)
+        reaper.touch(2)
+        reaper.track(1, view)
+        reaper.track(2, other)
+        reaper.last_active[1] -= 120
+
+        assert asyncio.run(reaper.sweep()) == 1
+        assert expired == [1] and view.stopped and not other.stopped
+        assert reaper.stats() == {'battles': 1, 'views': 1, 'reaped': 1}
+
+    def test_retire_stops_the_last_turns_views(self):
+        reaper = BattleReaper(None)
+        views = [self.View(), self.View()]
+        for view in views:
+            reaper.track(1, view)
+        reaper.forget(1, views[1])
+        reaper.retire(1)
+
+        assert [view.stopped for view in views] == [True, False]
+        assert reaper.stats()['views'] == 0
+
+
+class TestTurnScheduler:
+    def test_only_the_latest_turn_of_a_battle_is_due(self):
+        scheduler = TurnScheduler(None, timeout=60)
+        scheduler.schedule(1, turn=4)
+        scheduler.schedule(2, turn=9, timeout=10)
+        scheduler.schedule(1, turn=5, timeout=5)
+        scheduler.schedule(3, turn=1)
+        scheduler.cancel(3)
+        now = time.monotonic()
+
+        assert scheduler.due(now) == []
+        assert scheduler.due(now + 11) == [(1, 5), (2, 9)]
+        assert scheduler.due(now + 100) == [] and scheduler.stats()['waiting'] == 0
+
+    def test_heap_stays_small_over_many_turns(self):
+        scheduler = TurnScheduler(None)
+        for turn in range(1, 500):
+            for battle_id in range(10):
+                scheduler.schedule(battle_id, turn)
+        assert len(scheduler._heap) <= 2 * 10 + 64
+
+    def test_expired_turns_are_passed(self):
+        passed = []
+
+        async def expire(battle_id, turn):
+            passed.append((battle_id, turn))
+
+        async def run():
+            scheduler = TurnScheduler(expire)
+            scheduler.start()
+            scheduler.schedule(1, turn=3, timeout=60)
+            scheduler.schedule(2, turn=7, timeout=0.01)
+            await asyncio.sleep(0.05)
+            await scheduler.stop()
+            return scheduler.stats()
+
+        assert asyncio.run(run()) == {'waiting': 1, 'expired': 1}
+        assert passed == [(2, 7)]
+
+
+class TestBattleBoard:
+    def test_updates_in_a_burst_are_one_edit(self):
+        channel = AsyncMock()
+
+        async def run():
+            board = BattleBoard(channel, min_interval=0.05)
+            board.update(["Battle has begun!"], view="join")
+            await asyncio.sleep(0.01)
+            for turn in range(1, 4):
+                board.update([f"turn {turn}"], view=f"view {turn}")
+            await board.close(["The battle is over!"])
+
+        asyncio.run(run())
+        channel.send.assert_awaited_once()
+        message = channel.send.return_value
+        message.edit.assert_awaited_once_with(
+            content="Battle has begun!\nturn 1\nturn 2\nturn 3\nThe battle is over!", embed=None, view=None)
+
+    def test_content_keeps_the_newest_lines_that_fit(self):
+        board = BattleBoard(None, log_size=100)
+        board.log.extend(["x" * 999, "y" * 999, "z" * 10])
+        assert board.content() == "y" * 999 + "\n" + "z" * 10
+
+
+class TestCombatant:
+    def test_built_from_rows_without_keeping_them(self):
+        combatant = make_combatant(1, health=80, spells=[spell_row('Fireball')],
+                                   items=[{**spell_row('Mend'), 'item_name': 'Scroll', 'spell_charges': 2}])
+        assert (combatant.character_id, combatant.char_name) == (10, 'hero 1')
+        assert combatant.health == combatant.max_health == combatant.base_health == 80
+        assert combatant.spells[0].caster is combatant and combatant.inventory[0].spell.cost == 0
+        assert not hasattr(combatant, '__dict__') and not hasattr(combatant, 'data')
+        with pytest.raises(AttributeError):
+            combatant.user = object()
+
+
+class TestStatusEffects:
+    def test_registry_is_keyed_by_spell_status_id(self):
+        assert STATUS_EFFECTS[4].name == 'Burning' and STATUS_EFFECTS[20].name == 'Leech'
+        assert get_effect(4) is get_effect('Burning') is STATUS_EFFECTS[4]
+        assert get_effect('None') is None and get_effect('Sleep') is None and get_effect(None) is None
+        with pytest.raises(TypeError):
+            STATUS_EFFECTS[1] = STATUS_EFFECTS[4]
+
+    def test_spells_share_definitions_and_effects_are_slotted(self, battle):
+        ignite = battle.get(1).spells[2]
+        assert ignite.status is make_combatant(3, spells=[spell_row('Ignite', status_name='Burning')]).spells[0].status
+        battle.act(Action(Action.CAST, 1, 2, target=2))
+        effect = battle.get(2).status_effects[0]
+        assert isinstance(effect, StatusEffect) and not hasattr(effect, '__dict__')
+
+    def test_expiring_runs_on_expire(self):
+        caster, target = make_combatant(1), make_combatant(2, speed=30)
+        get_effect('Frozen').apply(caster, 10, 101, 1, target, RandomStream(1))
+        assert target.speed == 20
+        assert target.status_effects[0].reduce_status(target) == "Frozen effect on player 2 has worn off."
+        assert target.speed == 30 and not target.status_effects
+
+    def test_blessed_expires_what_it_cleanses(self):
+        caster, target = make_combatant(1), make_combatant(2, speed=30)
+        for status in ('Paralyze', 'Frozen', 'Burning'):
+            get_effect(status).apply(caster, 10, 101, 3, target, RandomStream(1))
+        assert not target.can_move and target.speed == 20
+        get_effect('Blessed').apply(caster, 0, 0, 0, target, RandomStream(1))
+        assert target.can_move and target.speed == target.base_speed == 30 and not target.status_effects
+
+    def test_resisted_status_changes_nothing(self):
+        caster, target = make_combatant(1), make_combatant(2)
+        message = get_effect('Paralyze').apply(caster, 0, 0, 3, target, RandomStream(1))
+        assert message == "player 2 resisted Paralyze."
+        assert target.can_move and not target.status_effects
+
+    def test_taunt_and_charm_filter_targets(self):
+        caster, first, second = make_combatant(1, spells=[spell_row('Fireball')]), make_combatant(2), make_combatant(3)
+        spell = caster.spells[0]
+        assert spell.get_targets(caster, [first, second]) == [caster, first, second]
+        caster.status_effects.append(StatusEffect(get_effect('Charmed'), first, 0, 3))
+        assert spell.get_targets(caster, [first, second]) == [caster, second]
+        caster.status_effects.insert(0, StatusEffect(get_effect('Taunt'), second, 0, 3))
+        assert spell.get_targets(caster, [first, second]) == [second]
+
+
+class TestRandomStream:
+    def test_same_seed_same_rolls(self):
+        first, second = RandomStream(42), RandomStream(42)
+        assert [first.roll() for _ in range(20)] == [second.roll() for _ in range(20)]
+        assert first.rolls(100, 1, 6) == second.rolls(100, 1, 6)
+        assert all(1 <= roll <= 6 for roll in RandomStream().rolls(1000, 1, 6))
+
+    def test_derived_streams_are_independent_and_repeatable(self):
+        stream = RandomStream(42)
+        assert stream.derive('ai').seed == RandomStream(42).derive('ai').seed
+        assert stream.derive('ai').seed != stream.derive('loot').seed
+        assert stream.derive('ai').seed != stream.seed
+
+    def test_battle_replays_from_its_seed(self):
+        def seeded_battle(seed):
+            battle = Battle(123, seed=seed)
+            for combatant_id in (1, 2, 3):
+                battle.join(make_combatant(combatant_id, spells=[
+                    spell_row('Ignite', power=30, status_name='Burning', chance=50, duration=3),
+                    spell_row('Fireball', power=25)]))
+            return battle
+
+        first = seeded_battle(RandomStream().seed)
+        assert play(first) == play(seeded_battle(first.seed))
+
+
+class TestSimulator:
+    def table(self, *rows):
+        return SpellTable.from_rows([{'cooldown': 1, 'element_name': 'Fire', **row} for row in rows])
+
+    def test_from_rows_maps_statuses_to_effects(self):
+        table = self.table(spell_row('Ignite', status_name='Burning', chance=101, duration=0),
+                           spell_row('Mend', status_name='Regenerating', chance=50, duration=3),
+                           spell_row('Smite', status_name='Sleep'))
+        assert list(table.effect) == [BURN, REGEN, DAMAGE]
+        assert list(table.chance) == [1.0, 0.49, 0.0]
+        assert table.duration[0] == 1
+        assert list(table.on_self) == [False, True, False]
+
+    def test_stronger_spell_wins_and_stalemates_draw(self):
+        table = self.table(spell_row('Fireball', power=40, mana_cost=10),
+                           spell_row('Spark', power=5, mana_cost=10),
+                           spell_row('Mend', status_name='Regenerating', chance=101, duration=3),
+                           spell_row('Shield', status_name='Armor'))
+        summary = summarize(table, simulate(table, duels=50, seed=1))
+        fireball, spark, mend, shield = summary['spells']
+        assert fireball['win_rate'] == 1.0 and fireball['duels'] == 150
+        # Mend outheals Spark, and Mend against Shield is never played
+        assert (spark['win_rate'], spark['draw_rate']) == (0.3333, 0.3333)
+        assert (mend['win_rate'], mend['draw_rate']) == (0.0, 0.6667)
+        assert (shield['duels'], shield['draw_rate']) == (150, 0.3333)
+
+    def test_same_seed_same_results(self):
+        table = self.table(spell_row('Ignite', power=30, status_name='Burning', chance=50, duration=3),
+                           spell_row('Fireball', power=25, mana_cost=20),
+                           spell_row('Venom', power=20, status_name='Poisoned', chance=70, duration=2))
+        first, second = simulate(table, duels=200, seed=7), simulate(table, duels=200, seed=7)
+        assert all((first[key] == second[key]).all() for key in first)
@@ -3,26 +3,68 @@
 Admin commands are explicitly for the maintaining of the Database of server."""
 
 from discord.ext import commands
-from psycopg2.extensions import connection
 
-from bot.database_utils import DataInserter, DatabaseConnection
+from bot.database_utils import (AsyncDatabase,
+                                DatabaseConnection,
+                                EventLoopLagMonitor,
+                                ReferenceData,
+                                SelectedCharacterCache)
 
 class Admin(commands.Cog):
     """Commands for managing player characters"""
 
-    def __init__(self, bot: commands.bot.Bot, conn: connection):
+    def __init__(self, bot: commands.bot.Bot, db: AsyncDatabase):
         self.bot = bot
-        self.conn = conn
+        self.db = db
+        self.lag_monitor = EventLoopLagMonitor()
         print('Admin cog loaded')
 
+    async def cog_load(self):
+        """Starts measuring event loop lag"""
+        self.lag_monitor.start()
+
+    async def cog_unload(self):
+        """Stops measuring event loop lag"""
+        await self.lag_monitor.stop()
+
 
     @commands.command()
     async def add_server(self, ctx: commands.Context):
         """Manually uploads the server to the DB"""
-        await ctx.send(DataInserter.upload_server(ctx.guild, self.conn))
+        await ctx.send(await self.db.inserter.upload_server(ctx.guild))
+
+    @commands.command()
+    async def reload_reference_data(self, ctx: commands.Context):
+        """Reloads the elements, spell statuses, spell types and event types"""
+        if not ctx.author.guild_permissions.administrator:
+            await ctx.send("You must be an admin to use this command.")
+            return
+
+        counts = await self.db.run(ReferenceData.load)
+        await ctx.send("Reloaded reference data: " + ", ".join(
+            f"{count} {table.replace('_', ' ')}" for table, count in counts.items()))
+
+    @commands.command()
+    async def db_stats(self, ctx: commands.Context):
+        """Shows the event loop lag, connection pool usage and character cache hit rate"""
+        if not ctx.author.guild_permissions.administrator:
+            await ctx.send("You must be an admin to use this command.")
+            return
+
+        lag = self.lag_monitor.summary()
+        pool = self.db.pool
+        cache = SelectedCharacterCache.stats()
+        await ctx.send(
+            f"Event loop lag: last {lag['last_ms']:.1f} ms, p50 {lag['p50_ms']:.1f} ms, "
+            f"p99 {lag['p99_ms']:.1f} ms, max {lag['max_ms']:.1f} ms "
+            f"({lag['samples']} samples)\n"
+            f"Connections: {pool.in_use} in use, {pool.idle} idle, {pool.max_size} max, "
+            f"{pool.acquired} acquired, {pool.timeouts} timeouts\n"
+            f"Selected character cache: {cache['size']} entries, "
+            f"{cache['hits']} hits, {cache['misses']} misses")
 
 
 async def setup(bot):
-    """Sets up connection"""
-    conn = DatabaseConnection.get_connection()
-    await bot.add_cog(Admin(bot, conn))
+    """Sets up the database access layer"""
+    db = DatabaseConnection.get_database()
+    await bot.add_cog(Admin(bot, db))
@@ -6,7 +6,6 @@
 - !craft: lets the player create a item that they can sell or enchant
 - !inventory: lets the player view their inventory
 """
-from random import randint
 import re
 from datetime import datetime, timedelta
 import discord
@@ -14,30 +13,35 @@ from discord.ui import View, Button
 from discord.ext import commands
 from psycopg2.extensions import connection
 
-from bot.database_utils import (DatabaseMapper,
-                                DatabaseIDFetch,
-                                InventoryDatabase,
-                                EmbedHelper,
+from bot.database_utils import (EmbedHelper,
+                                DatabaseMapper,
                                 DataInserter,
                                 DatabaseConnection,
+                                AsyncDatabase,
+                                ReferenceData,
                                 UserInputHelper,
+                                PurchaseResult,
                                 SpellQuery)
+from bot.combat_test.rng import RandomStream
 
 
 
 class Character(commands.Cog):
     """Commands for managing player characters"""
 
-    def __init__(self, bot: commands.bot.Bot, conn: connection):
+    def __init__(self, bot: commands.bot.Bot, db: AsyncDatabase):
         self.bot = bot
-        self.conn = conn
+        self.db = db
         print("Character cog loaded")
 
     @commands.command()
     async def add_spell(self, ctx: commands.Context):
         """Allows a player to assign a spell to their selected character"""
-        player_spells = DatabaseMapper.get_potential_player_spells(
-            self.conn, ctx)
+        identity = await self.db.selected_character(ctx.author.name, ctx.guild.id)
+        if identity is None:
+            await ctx.send("No character selected for this player.")
+            return
+        player_spells = await self.db.mapper.get_potential_player_spells(identity.character_id)
         if not player_spells:
             await ctx.send("You have no spells available to learn.")
             return
@@ -91,8 +95,7 @@ class Character(commands.Cog):
                 await ctx.send("Invalid Spell ID. Please try again.")
                 return
 
-            DataInserter.add_spell_to_character(
-                self.conn, ctx, selected_spell_id)
+            await self.db.inserter.add_spell_to_character(identity.character_id, selected_spell_id)
 
             await ctx.send(f"Spell {selected_spell_id} has been added to your character!")
 
@@ -102,7 +105,11 @@ class Character(commands.Cog):
     @commands.command()
     async def spellbook(self, ctx: commands.Context):
         """Checks the equipped spells"""
-        equipped_spells = DatabaseMapper.get_equipped_spells(self.conn, ctx)
+        identity = await self.db.selected_character(ctx.author.name, ctx.guild.id)
+        if identity is None:
+            await ctx.send("No character selected for this player.")
+            return
+        equipped_spells = await self.db.mapper.get_equipped_spells(identity.character_id)
         if not equipped_spells:
             await ctx.send("You have no spells equipped.")
             return
@@ -129,9 +136,11 @@ class Character(commands.Cog):
     async def scavenge(self, ctx: commands.Context):
         """allows the player to scavenge for money"""
 
-        last_scavenged = DatabaseMapper.get_last_event(
-            self.conn, ctx.author.name, 'Scavenge')
-
+        identity = await self.db.selected_character(ctx.author.name, ctx.guild.id)
+        last_scavenged = None
+        if identity:
+            last_scavenged = await self.db.mapper.get_last_event(
+                identity.character_id, 'Scavenge')
 
         if last_scavenged:
             now = datetime.now()
@@ -146,14 +155,16 @@ class Character(commands.Cog):
                 return
 
             # Random shards based on time waited
-            profit = randint(
+            rng = RandomStream()
+            profit = rng.randint(
                 int(round(min(max_shards/2, min_shards))),
                 int(round(min(int(time_since_last), max_shards)))
             )
-            message = DataInserter.increase_wallet(
-                self.conn, ctx.author.name, profit)
-            DataInserter.update_last_event(
-                self.conn, ctx.author.name, 'Scavenge', now)
+            print(f'{ctx.author.name} scavenged {profit} shards (seed {rng.seed})')
+            message = await self.db.inserter.increase_wallet(
+                identity.character_id, ctx.author.name, profit)
+            await self.db.inserter.update_last_event(
+                identity.character_id, 'Scavenge', now)
 
             await ctx.send(message)
         else:
@@ -167,8 +178,11 @@ class Character(commands.Cog):
             await ctx.send('Usage !craft <item_name> <item_value>')
             return
 
-        last_crafted = DatabaseMapper.get_last_event(
-            self.conn, ctx.author.name, 'Craft')
+        identity = await self.db.selected_character(ctx.author.name, ctx.guild.id)
+        last_crafted = None
+        if identity:
+            last_crafted = await self.db.mapper.get_last_event(
+                identity.character_id, 'Craft')
 
         if last_crafted:
             # Calculate the time difference from the last crafted event
@@ -179,8 +193,8 @@ class Character(commands.Cog):
                 return
 
             # If the player hasn't crafted recently, proceed with creating the item
-            message = self.create_item(
-                self.conn, ctx.author.name, item_name, item_value)
+            message = await self.db.run(
+                self.create_item, identity.character_id, ctx.author.name, item_name, item_value)
             await ctx.send(message)
         else:
             await ctx.send('Please make a character using !create_character <race> <class>')
@@ -190,23 +204,18 @@ class Character(commands.Cog):
     async def inventory(self, ctx: commands.Context):
         """Shows the player their inventory in an embed"""
 
-        # Get character_id for the player
-        character_id = DatabaseIDFetch.fetch_selected_character_id(self.conn, ctx.author.name)
-        if not character_id:
+        # Get the inventory_id of the player's selected character
+        identity = await self.db.selected_character(ctx.author.name, ctx.guild.id)
+        if identity is None:
             await ctx.send("No character selected for this player.")
             return
-
-        # Get inventory_id for the character
-        inventory_id = DatabaseIDFetch.get_inventory_id(
-            self.conn, character_id)
-        if not inventory_id:
+        if not identity.inventory_id:
             await ctx.send("This character does not have an inventory.")
             return
 
         # Get items in the inventory
         try:
-            items = InventoryDatabase.get_items_in_inventory(
-                self.conn, inventory_id)
+            items = await self.db.inventory.get_items_in_inventory(identity.inventory_id)
         except Exception as e:
             print(e)
         print(f'items: {items}')
@@ -219,17 +228,25 @@ class Character(commands.Cog):
         await ctx.send(embed=embed)
 
 
-    def create_item(self, conn: connection, player_name: str, item_name: str, item_value: int) -> str:
-        """Attempts to create an item based on the player's craft skill."""
-        DataInserter.update_last_event(conn, player_name, 'Craft', datetime.now())
-        result = DatabaseMapper.get_craft_skill(conn, player_name)
-        character_id = result.get('character_id')
+    def create_item(self,
+                    character_id: int,
+                    player_name: str,
+                    item_name: str,
+                    item_value: int,
+                    conn: connection,
+                    rng: RandomStream | None = None) -> str:
+        """Attempts to create an item based on the player's craft skill.
+        Pass the rng of an earlier attempt to replay its roll"""
+        rng = rng or RandomStream()
+        DataInserter.update_last_event(conn, character_id, 'Craft', datetime.now())
+        result = DatabaseMapper.get_craft_skill(conn, character_id)
         craft_skill = result.get('craft_skill')
 
         # Determine crafting success chance
         success_chance = min(
             (craft_skill / (item_value * 2)) * 100, 95)
-        roll = randint(1, 100)
+        roll = rng.roll()
+        print(f'{player_name} rolled {roll} to craft {item_name} (seed {rng.seed})')
 
         if roll > success_chance:
             return f"{player_name}, your crafting attempt failed! Try again later."
@@ -266,30 +283,29 @@ class Character(commands.Cog):
             return
 
         # Call the DataInserter method properly
-        DataInserter.add_character_image(self.conn, ctx.author.name, image_url)
+        identity = await self.db.selected_character(ctx.author.name, ctx.guild.id)
+        if identity is None:
+            await ctx.send("No character selected for this player.")
+            return
+        await self.db.inserter.add_character_image(
+            identity.character_id, ctx.author.name, image_url)
         await ctx.send("Character image has been updated successfully!")
 
     @commands.command()
     async def quick_sell(self, ctx: commands.Context):
         """Allows a player to quickly sell items from their inventory."""
 
-        # Get character_id for the player
-        character_id = DatabaseIDFetch.fetch_selected_character_id(
-            self.conn, ctx.author.name)
-        if not character_id:
+        # Get the inventory_id of the player's selected character
+        identity = await self.db.selected_character(ctx.author.name, ctx.guild.id)
+        if identity is None:
             await ctx.send("No character selected for this player.")
             return
-
-        # Get inventory_id for the character
-        inventory_id = DatabaseIDFetch.get_inventory_id(
-            self.conn, character_id)
-        if not inventory_id:
+        if not identity.inventory_id:
             await ctx.send("This character does not have an inventory.")
             return
 
         # Get items in the inventory
-        items = InventoryDatabase.get_items_in_inventory(
-            self.conn, inventory_id)
+        items = await self.db.inventory.get_items_in_inventory(identity.inventory_id)
         if not items:
             await ctx.send("Your inventory is empty.")
             return
@@ -308,30 +324,24 @@ class Character(commands.Cog):
             )
 
             view = View()
-            view.add_item(SellItemButton(item_id, item_name, value, self.conn))
+            view.add_item(SellItemButton(item_id, item_name, value, self.db))
 
             await ctx.send(embed=embed, view=view)
     
 
     @commands.command()
     async def sell(self, ctx: commands.Context):
-        # Get character_id for the player
-        character_id = DatabaseIDFetch.fetch_selected_character_id(
-            self.conn, ctx.author.name)
-        if not character_id:
+        # Get the inventory_id of the player's selected character
+        identity = await self.db.selected_character(ctx.author.name, ctx.guild.id)
+        if identity is None:
             await ctx.send("No character selected for this player.")
             return
-
-        # Get inventory_id for the character
-        inventory_id = DatabaseIDFetch.get_inventory_id(
-            self.conn, character_id)
-        if not inventory_id:
+        if not identity.inventory_id:
             await ctx.send("This character does not have an inventory.")
             return
 
         # Get items in the inventory
-        items = InventoryDatabase.get_items_in_inventory(
-            self.conn, inventory_id)
+        items = await self.db.inventory.get_items_in_inventory(identity.inventory_id)
         if not items:
             await ctx.send("Your inventory is empty.")
             return
@@ -370,8 +380,7 @@ class Character(commands.Cog):
                 return
 
             # Set the item as sellable in the database
-            success = InventoryDatabase.set_sellable_item(
-                self.conn, item_id, value)
+            success = await self.db.inventory.set_sellable_item(item_id, value)
             if success:
                 # Find the item name for the confirmation message
                 item_name = next(item.get('item_name')
@@ -387,37 +396,17 @@ class Character(commands.Cog):
 
     @commands.command()
     async def marketplace(self, ctx: commands.Context):
-        """Prints the marketplace"""
-        items = InventoryDatabase.get_marketplace(self.conn)
-        # Create an embed for each item with a Sell Button
-        for item in items:
-            print(item)
-            item_name = item.get('item_name')
-            item_id = item.get('item_id')
-            spell_name = item.get('spell_name', 'None')  # Not currently working
-            value = item.get('listed_value', 0)
-            player_name = item.get('player_name')
-            character_name = item.get('character_name')
-
-            embed = discord.Embed(
-                title=item_name.title(),
-                description=f"**ID:** {item_id}\n**Spell:** {spell_name}\n**Value:** {value} shards",
-                color=discord.Color.green()
-            )
-            embed.add_field(
-                name="Sold by", value=f"{player_name} as {character_name}")
-
-            view = View()
-            view.add_item(BuyItemButton(item_id, item_name, player_name, value, self.conn))
-
-            await ctx.send(embed=embed, view=view)
+        """Shows the marketplace in a single message, one page at a time"""
+        view = MarketplaceView(self.db, ctx.author)
+        await view.load()
+        view.message = await ctx.send(embed=view.embed(), view=view)
 
     @commands.command()
     async def select_character(self, ctx: commands.Context):
         """Creates an embed for each character a player has with a button to select that character"""
         print("Select character")
         try:
-            characters = DatabaseMapper.get_players_characters(self.conn, ctx)
+            characters = await self.db.mapper.get_players_characters(ctx)
             print(characters)
             embeds = []
             views = []
@@ -444,7 +433,7 @@ class Character(commands.Cog):
                     server_id=ctx.guild.id,
                     character_name=character["character_name"],
                     character_id=character["character_id"],
-                    conn=self.conn
+                    db=self.db
                 ))
 
                 embeds.append(embed)
@@ -462,10 +451,11 @@ class Character(commands.Cog):
         """Allows the player to enchant a item with a spell"""
 
         # Choose an item from your inventory
-        player_id = DatabaseIDFetch.get_player_id(self.conn, ctx.author.name, ctx.guild.id)
-        character_id = DatabaseIDFetch.get_selected_character_id(self.conn, player_id)
-        inventory_id = DatabaseIDFetch.get_inventory_id(self.conn, character_id)
-        items = InventoryDatabase.get_non_enchanted_items_in_inventory(self.conn, inventory_id)
+        identity = await self.db.selected_character(ctx.author.name, ctx.guild.id)
+        if identity is None or not identity.inventory_id:
+            await ctx.send("No character with an inventory selected for this player.")
+            return
+        items = await self.db.inventory.get_non_enchanted_items_in_inventory(identity.inventory_id)
 
         for item in items:
             item_name = item.get('item_name')
@@ -512,7 +502,7 @@ class Character(commands.Cog):
             return
 
         # Fetch spell types and elements
-        spell_types = DatabaseMapper.get_spell_type_map(self.conn)
+        spell_types = ReferenceData.spell_types.by_id
         if not spell_types:
             await ctx.send("❌ No spell types found in the database.")
             return
@@ -527,7 +517,7 @@ class Character(commands.Cog):
             return
 
         # Fetch Elements
-        element_map = DatabaseMapper.get_element_map(self.conn)
+        element_map = ReferenceData.elements.by_name
         await ctx.send(embed=EmbedHelper.create_map_embed(
             "🔥 Elements", "Available Elements", element_map, discord.Color.red()))
         element_id = await UserInputHelper.get_input(
@@ -536,7 +526,7 @@ class Character(commands.Cog):
             await ctx.send('❌ Invalid element ID. Try again.')
             return
         # Fetch spell statuses
-        spell_statuses = DatabaseMapper.get_spell_status_map(self.conn)
+        spell_statuses = ReferenceData.spell_statuses.by_name
         await ctx.send(embed=EmbedHelper.create_map_embed("🌀 Spell Status Effects",
                                                           "Available status effects:",
                                                           spell_statuses,
@@ -548,11 +538,13 @@ class Character(commands.Cog):
         spell_duration = await UserInputHelper.get_input(
             ctx, self.bot, "Duration of status condition (in turns)", int)
         spell_difficulty = SpellQuery.get_spell_difficulty(spell_power, 50, cooldown, scaling_factor, spell_status_chance, spell_duration)
-        craft_skill_dict = DatabaseMapper.get_craft_skill(self.conn, ctx.author.name)
+        craft_skill_dict = await self.db.mapper.get_craft_skill(identity.character_id)
         craft_skill = craft_skill_dict.get('craft_skill')
 
         success_chance = SpellQuery.get_crafting_chance(craft_skill, spell_difficulty)
-        roll = randint(1, 100)
+        rng = RandomStream()
+        roll = rng.roll()
+        print(f'{ctx.author.name} rolled {roll} to enchant {item_id} (seed {rng.seed})')
 
         if roll > success_chance:
             await ctx.send(f'Your enchant attempt failed with a {success_chance:.2f}% chance of success')
@@ -560,8 +552,8 @@ class Character(commands.Cog):
         print('start generate_spell')
         # Generate the spell with null for class_id and race_id
         try:
-            spell_id = DataInserter.generate_spell(
-                self.conn, ctx.guild.id, spell_name, spell_description, spell_power,
+            spell_id = await self.db.inserter.generate_spell(
+                ctx.guild.id, spell_name, spell_description, spell_power,
                 mana_cost, cooldown, scaling_factor, spell_type_id, element_id,
                 spell_status_id, spell_status_chance, spell_duration
             )
@@ -570,9 +562,9 @@ class Character(commands.Cog):
 
         if spell_id:  # Successfully created the spell
             # Associate the created spell with the selected item
-            charges = randint(1, 5)
-            success = DataInserter.enchant_item(
-                self.conn, item_id, charges, spell_id)
+            charges = rng.randint(1, 5)
+            success = await self.db.inserter.enchant_item(
+                item_id, charges, spell_id)
             if success:
                 await ctx.send(f"✨ Successfully enchanted your item '{item_id}' with the spell {spell_name} with {charges} charges!")
             else:
@@ -583,24 +575,24 @@ class Character(commands.Cog):
 
 
 async def setup(bot):
-    """Sets up connection"""
-    conn = DatabaseConnection.get_connection()
-    await bot.add_cog(Character(bot, conn))
+    """Sets up the database access layer"""
+    db = DatabaseConnection.get_database()
+    await bot.add_cog(Character(bot, db))
 
 
 class SellItemButton(Button):
-    def __init__(self, item_id: int, item_name: str, value: int, conn: connection):
+    def __init__(self, item_id: int, item_name: str, value: int, db: AsyncDatabase):
         super().__init__(label=f"Sell {item_name}",
                          style=discord.ButtonStyle.red)
         self.item_id = item_id
         self.item_name = item_name
         self.value = value
-        self.conn = conn
+        self.db = db
 
     async def callback(self, interaction: discord.Interaction):
         # Sell the item (remove from inventory and add shards)
-        success = InventoryDatabase.sell_item(
-            self.conn, self.item_id, interaction.user.name)
+        success = await self.db.inventory.sell_item(
+            self.item_id, interaction.user.name)
 
         if success:
             await interaction.response.edit_message(content=f"✅ Sold {self.item_name} for {self.value} shards!", embed=None, view=None)
@@ -608,42 +600,161 @@ class SellItemButton(Button):
             await interaction.response.edit_message(content="⚠️ Could not sell the item!", embed=None, view=None)
 
 
+class MarketplaceView(View):
+    """Pages through the marketplace in one message.
+
+    Every page is fetched on its own with keyset pagination, so `cursors`
+    holds where each page visited so far starts for the Previous button."""
+
+    SORTS = {'newest': 'Newest', 'cheapest': 'Cheapest', 'priciest': 'Priciest'}
+    FILTERS = {'all': 'All items', 'enchanted': 'Enchanted', 'plain': 'Not enchanted'}
+
+    def __init__(self, db: AsyncDatabase, author: discord.abc.User, timeout: int = 300):
+        super().__init__(timeout=timeout)
+        self.db = db
+        self.author = author
+        self.sort = 'newest'
+        self.item_filter = 'all'
+        self.cursors = [None]
+        self.next_cursor = None
+        self.items = []
+        self.message = None
+
+    async def load(self):
+        """Fetches the current page and rebuilds the buttons"""
+        self.items, self.next_cursor = await self.db.inventory.get_marketplace_page(
+            self.sort, self.item_filter, self.cursors[-1])
+        # Go back a page when everything on this one was bought
+        while not self.items and len(self.cursors) > 1:
+            self.cursors.pop()
+            self.items, self.next_cursor = await self.db.inventory.get_marketplace_page(
+                self.sort, self.item_filter, self.cursors[-1])
+
+        self.clear_items()
+        self.add_item(MarketplacePageButton("◀ Previous", -1, disabled=len(self.cursors) == 1))
+        self.add_item(MarketplacePageButton("Next ▶", 1, disabled=self.next_cursor is None))
+        for key, label in self.SORTS.items():
+            self.add_item(MarketplaceOptionButton('sort', key, label, key == self.sort, row=1))
+        for key, label in self.FILTERS.items():
+            self.add_item(MarketplaceOptionButton('item_filter', key, label, key == self.item_filter, row=2))
+        for number, item in enumerate(self.items, 1):
+            self.add_item(BuyItemButton(
+                item['item_id'], item['item_name'], item['listed_value'], self.db, number))
+
+    def embed(self) -> discord.Embed:
+        """Creates the embed for the current page"""
+        embed = discord.Embed(
+            title="Marketplace",
+            description=f"{self.SORTS[self.sort]} · {self.FILTERS[self.item_filter]} · Page {len(self.cursors)}",
+            color=discord.Color.green()
+        )
+        if not self.items:
+            embed.description += "\nNo items are listed for sale."
+        for number, item in enumerate(self.items, 1):
+            embed.add_field(
+                name=f"{number}. {item['item_name'].title()}",
+                value=(f"**ID:** {item['item_id']}\n**Spell:** {item['spell_name'] or 'None'}\n"
+                       f"**Value:** {item['listed_value']} shards\n"
+                       f"**Sold by** {item['player_name']} as {item['character_name']}"),
+                inline=False)
+        return embed
+
+    async def show(self, interaction: discord.Interaction):
+        """Reloads the current page into the message"""
+        await self.load()
+        await interaction.response.edit_message(embed=self.embed(), view=self)
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        """Only the player who opened the marketplace can use its buttons"""
+        if interaction.user.id == self.author.id:
+            return True
+        await interaction.response.send_message(
+            "Use !marketplace to browse the marketplace yourself.", ephemeral=True)
+        return False
+
+    async def on_timeout(self):
+        if self.message:
+            await self.message.edit(view=None)
+
+
+class MarketplacePageButton(Button):
+    def __init__(self, label: str, step: int, disabled: bool):
+        super().__init__(label=label, style=discord.ButtonStyle.grey, disabled=disabled, row=0)
+        self.step = step
+
+    async def callback(self, interaction: discord.Interaction):
+        """Moves to the next or previous page"""
+        if self.step > 0:
+            self.view.cursors.append(self.view.next_cursor)
+        else:
+            self.view.cursors.pop()
+        await self.view.show(interaction)
+
+
+class MarketplaceOptionButton(Button):
+    def __init__(self, option: str, key: str, label: str, active: bool, row: int):
+        style = discord.ButtonStyle.blurple if active else discord.ButtonStyle.grey
+        super().__init__(label=label, style=style, row=row)
+        self.option = option
+        self.key = key
+
+    async def callback(self, interaction: discord.Interaction):
+        """Changes the sort or filter and starts again from the first page"""
+        setattr(self.view, self.option, self.key)
+        self.view.cursors = [None]
+        await self.view.show(interaction)
+
+
 class BuyItemButton(Button):
-    def __init__(self, item_id: int, item_name: str, player_name, value: int, conn: connection):
-        super().__init__(label=f"Buy {item_name}",
-                         style=discord.ButtonStyle.red)
+    # What to tell the buyer for each PurchaseResult status
+    MESSAGES = {
+        PurchaseResult.SUCCESS: "✅ Bought {item_name} for {value} shards!",
+        PurchaseResult.ALREADY_SOLD: "⚠️ {item_name} has already been sold!",
+        PurchaseResult.OWN_ITEM: "⚠️ You can't buy your own item!",
+        PurchaseResult.PRICE_CHANGED: "⚠️ The price of {item_name} has changed, check the !marketplace again.",
+        PurchaseResult.NO_INVENTORY: "⚠️ Your character does not have an inventory!",
+        PurchaseResult.INSUFFICIENT_FUNDS: "⚠️ You don't have enough shards to buy {item_name}!",
+    }
+
+    def __init__(self, item_id: int, item_name: str, value: int, db: AsyncDatabase, number: int):
+        super().__init__(label=f"Buy {number}. {item_name}"[:80],
+                         style=discord.ButtonStyle.red, row=3)
         self.item_id = item_id
         self.item_name = item_name
-        self.player_name = player_name
         self.value = value
-        self.conn = conn
+        self.db = db
 
     async def callback(self, interaction: discord.Interaction):
-        """Sells the item (remove from inventory and add shards)"""
-        success = InventoryDatabase.buy_item(
-            self.conn, self.item_id, self.player_name, interaction.user.name, self.value)
+        """Buys the item for the buyer's selected character and refreshes the page"""
+        identity = await self.db.selected_character(interaction.user.name, interaction.guild.id)
+        if identity is None:
+            await interaction.response.send_message("⚠️ Select a character before buying!", ephemeral=True)
+            return
 
-        if success:
-            await interaction.response.edit_message(content=f"✅ Sold {self.item_name} for {self.value} shards!", embed=None, view=None)
-        else:
-            await interaction.response.edit_message(content="⚠️ Could not Buy the item!", embed=None, view=None)
+        result = await self.db.inventory.buy_item(
+            self.item_id, identity.character_id, self.value)
+
+        message = self.MESSAGES.get(result.status, "⚠️ Could not Buy the item!")
+        await self.view.show(interaction)
+        await interaction.followup.send(
+            message.format(item_name=self.item_name, value=self.value), ephemeral=True)
 
 
 class CharacterSelectButton(Button):
-    def __init__(self, player_id: int, server_id: int, character_name: str, character_id: int, conn: connection):
+    def __init__(self, player_id: int, server_id: int, character_name: str, character_id: int, db: AsyncDatabase):
         super().__init__(label=f"Select Character {character_name}",
                          style=discord.ButtonStyle.blurple)
         self.player_id = player_id
         self.server_id = server_id
         self.character_id = character_id
         self.character_name = character_name
-        self.conn = conn
+        self.db = db
 
     async def callback(self, interaction: discord.Interaction):
         """This functions runs when the button is pressed.
         It completes the character selection and notifies the player"""
-        success = DataInserter.select_new_character(
-            self.conn, self.player_id, self.server_id, self.character_id
+        success = await self.db.inserter.select_new_character(
+            self.player_id, self.server_id, self.character_id
         )
         if success:
             await interaction.response.edit_message(content=f"✅ Now playing as {self.character_name}!", embed=None, view=None)
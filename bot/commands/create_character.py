@@ -3,15 +3,15 @@ import discord
 from discord.ext import commands
 from discord import ui
 from psycopg2.extensions import connection
-from bot.database_utils import DatabaseConnection
+from bot.database_utils import DatabaseConnection, AsyncDatabase, SelectedCharacterCache
 
 
 class CharacterCreation(commands.Cog):
     """Character creation object"""
 
-    def __init__(self, bot: commands.Bot, conn: connection):
+    def __init__(self, bot: commands.Bot, db: AsyncDatabase):
         self.bot = bot
-        self.conn = conn
+        self.db = db
         self.races = {}
         self.classes = {}
         self.character_name = ""
@@ -29,20 +29,20 @@ class CharacterCreation(commands.Cog):
         view = CharacterSelectView(self, ctx)
         await message.edit(view=view)
 
-    def get_race_dict(self, ctx: commands.Context):
+    def get_race_dict(self, conn: connection):
         """Fetches and returns a dictionary of race ids and names."""
         query = "SELECT race_id, race_name FROM race"
-        with self.conn.cursor() as cursor:
+        with conn.cursor() as cursor:
             cursor.execute(query)
             races = cursor.fetchall()
 
         # Convert the result into a dictionary
         return {race['race_id']: race['race_name'] for race in races}
 
-    def get_class_dict(self, ctx: commands.Context):
+    def get_class_dict(self, conn: connection):
         """Fetches and returns a dictionary of class ids and names."""
         query = "SELECT class_id, class_name FROM class"
-        with self.conn.cursor() as cursor:
+        with conn.cursor() as cursor:
             cursor.execute(query)
             classes = cursor.fetchall()
 
@@ -88,8 +88,8 @@ class CharacterCreateButton(ui.Button):
         self.cog.character_name = msg.content.strip()
         print(msg.content.strip())
 
-        self.cog.races = self.cog.get_race_dict(self.ctx)
-        self.cog.classes = self.cog.get_class_dict(self.ctx)
+        self.cog.races = await self.cog.db.run(self.cog.get_race_dict)
+        self.cog.classes = await self.cog.db.run(self.cog.get_class_dict)
 
         message = await self.ctx.send(
             f"Please select a race for {self.cog.character_name}.",
@@ -114,20 +114,10 @@ class CharacterSelectButtonItem(ui.Button):
         """Handles selecting an existing character"""
         await interaction.response.defer()
 
-        # Query to get the player_id based on the player_name
-        query_player_id = """
-            SELECT player_id
-            FROM player
-            WHERE player_name = %s;
-        """
-        with self.cog.conn.cursor() as cursor:
-            cursor.execute(query_player_id, (self.ctx.author.name,))
-            player_result = cursor.fetchone()
-
-        player_id = player_result['player_id']
+        player_id = await self.cog.db.run(self.get_player_id)
         # Update the character selection process
-        success = self.select_new_character(
-            player_id, self.ctx.guild.id, self.character_id)
+        success = await self.cog.db.run(
+            self.select_new_character, player_id, self.ctx.guild.id, self.character_id)
 
         if success:
             # Successfully updated the selected character
@@ -140,9 +130,20 @@ class CharacterSelectButtonItem(ui.Button):
                 "There was an error while selecting your character. Please try again.", ephemeral=True
             )
 
-    def select_new_character(self, player_id, server_id, character_id):
+    def get_player_id(self, conn: connection) -> int:
+        """Gets the player_id based on the player_name"""
+        query_player_id = """
+            SELECT player_id
+            FROM player
+            WHERE player_name = %s;
+        """
+        with conn.cursor() as cursor:
+            cursor.execute(query_player_id, (self.ctx.author.name,))
+            return cursor.fetchone()['player_id']
+
+    def select_new_character(self, player_id, server_id, character_id, conn: connection):
         """Handles the logic for updating the selected character in the database"""
-        with self.cog.conn.cursor() as cursor:
+        with conn.cursor() as cursor:
             try:
                 # Unselect the previously selected character
                 cursor.execute(
@@ -160,11 +161,12 @@ class CharacterSelectButtonItem(ui.Button):
                     (character_id, server_id)
                 )
             except Exception as e:
-                self.cog.conn.rollback()
+                conn.rollback()
                 print(e)
                 return False
 
-            self.cog.conn.commit()
+            conn.commit()
+            SelectedCharacterCache.invalidate_player(player_id)
             return True
 
 
@@ -181,7 +183,7 @@ class CharacterSelectButton(ui.Button):
         """Handles displaying a list of characters for selection"""
         await interaction.response.defer()
 
-        result = self.get_characters()
+        result = await self.cog.db.run(self.get_characters)
 
         if not result:
             await interaction.followup.send(
@@ -223,7 +225,7 @@ class CharacterSelectButton(ui.Button):
         for embed, view in zip(embeds, views):
             await interaction.followup.send(embed=embed, view=view, ephemeral=True)
             
-    def get_characters(self) -> list[dict]:
+    def get_characters(self, conn: connection) -> list[dict]:
         """gets the character of a player"""
         query = """
             SELECT character_id, character_name, race_name, class_name, health, mana, craft_skill, experience, image_url
@@ -233,7 +235,7 @@ class CharacterSelectButton(ui.Button):
             WHERE "character".player_id = (SELECT player_id FROM player WHERE player_name = %s) 
             AND "character".server_id = %s;
         """
-        with self.cog.conn.cursor() as cursor:
+        with conn.cursor() as cursor:
             cursor.execute(
                 query, (self.ctx.author.name, self.ctx.guild.id))
             result = cursor.fetchall()
@@ -307,43 +309,35 @@ class ClassButton(ui.Button):
         race_id = self.race_id
         class_id = self.class_id
 
-        # Fetch player_id based on the player's name
-        query = """
-        SELECT player_id FROM player WHERE player_name = %s
-        """
-        with self.cog.conn.cursor() as cursor:
-            cursor.execute(query, (player_name,))
-            player_result = cursor.fetchone()
-            if player_result:
-                player_id = player_result['player_id']
-            else:
-                cursor.execute(
-                    "INSERT INTO player (player_name, server_id) VALUES (%s, %s) RETURNING player_id",
-                    (self.ctx.author.name, self.ctx.guild.id)
-                )
-                player_id = cursor.fetchone()["player_id"]
-                self.cog.conn.commit()
+        player_id = await self.cog.db.run(self.get_or_create_player_id, player_name)
 
-        # Database insert logic
-        self.create_character_in_db(
-            player_id, character_name, race_id, class_id)
+        # Creates the character with its inventory and cooldowns and selects it
+        await self.cog.db.inserter.generate_character(
+            self.ctx.guild.id, player_id, character_name, race_id, class_id)
 
         # Send confirmation message
         await interaction.followup.send(f"Character {character_name} created as a {self.cog.races[race_id]} {self.class_name}!", ephemeral=False)
 
-    def create_character_in_db(self, player_id: int, character_name: str, race_id: int, class_id: int):
-        """Create the character in the database using player_id, race_id, and class_id"""
+    def get_or_create_player_id(self, player_name: str, conn: connection) -> int:
+        """Fetches player_id based on the player's name, adding the player if they are new"""
         query = """
-            INSERT INTO "character" (character_name, race_id, class_id, player_id, server_id)
-            VALUES (%s, %s, %s, %s, %s)
+        SELECT player_id FROM player WHERE player_name = %s
         """
-        with self.cog.conn.cursor() as cursor:
+        with conn.cursor() as cursor:
+            cursor.execute(query, (player_name,))
+            player_result = cursor.fetchone()
+            if player_result:
+                return player_result['player_id']
             cursor.execute(
-                query, (character_name, race_id, class_id, player_id, self.ctx.guild.id))
-            self.cog.conn.commit()
+                "INSERT INTO player (player_name, server_id) VALUES (%s, %s) RETURNING player_id",
+                (self.ctx.author.name, self.ctx.guild.id)
+            )
+            player_id = cursor.fetchone()["player_id"]
+            conn.commit()
+            return player_id
 
 
 async def setup(bot: commands.Bot):
-    """Sets up the character creation cog with a database connection"""
-    conn = DatabaseConnection.get_connection()
-    await bot.add_cog(CharacterCreation(bot, conn))
+    """Sets up the character creation cog with the database access layer"""
+    db = DatabaseConnection.get_database()
+    await bot.add_cog(CharacterCreation(bot, db))
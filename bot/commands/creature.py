@@ -5,16 +5,14 @@
 """
 
 from discord.ext import commands
-from psycopg2.extensions import connection
-from bot.database_utils import (DataInserter,
-                                DatabaseConnection)
+from bot.database_utils import DatabaseConnection, AsyncDatabase
 
 class Creature(commands.Cog):
     """Commands for managing player characters"""
 
-    def __init__(self, bot: commands.bot.Bot, conn: connection):
+    def __init__(self, bot: commands.bot.Bot, db: AsyncDatabase):
         self.bot = bot
-        self.conn = conn
+        self.db = db
         print('Creature cog loaded')
 
     @commands.command()
@@ -31,8 +29,8 @@ class Creature(commands.Cog):
             await ctx.send("Usage: !create_class <class_name> <True/False>")
             return
 
-        response = DataInserter.generate_class(
-            ctx.guild, class_name.title(), is_playable, self.conn)
+        response = await self.db.inserter.generate_class(
+            ctx.guild, class_name.title(), is_playable)
         await ctx.send(response)
 
     @commands.command()
@@ -53,8 +51,8 @@ class Creature(commands.Cog):
         if not isinstance(speed, int):
             return
 
-        response = DataInserter.generate_race(
-            ctx.guild, race_name.title(), is_playable, speed, self.conn)
+        response = await self.db.inserter.generate_race(
+            ctx.guild, race_name.title(), is_playable, speed)
         await ctx.send(response)
 
 
@@ -76,6 +74,6 @@ class Creature(commands.Cog):
 
 
 async def setup(bot: commands.bot.Bot):
-    """Sets up connection"""
-    conn = DatabaseConnection.get_connection()
-    await bot.add_cog(Creature(bot, conn))
+    """Sets up the database access layer"""
+    db = DatabaseConnection.get_database()
+    await bot.add_cog(Creature(bot, db))
@@ -4,7 +4,7 @@ import discord
 from discord.ext import commands
 from psycopg2.extensions import connection
 
-from bot.database_utils import DatabaseConnection
+from bot.database_utils import DatabaseConnection, AsyncDatabase
 
 
 def xp_required_for_level(level: int) -> int:
@@ -12,19 +12,32 @@ def xp_required_for_level(level: int) -> int:
     return int(400 * math.pow(1.5, level - 1))
 
 
+def update_character(query: str, params: tuple, conn: connection) -> dict:
+    """Runs an UPDATE ... RETURNING on a character and commits it"""
+    with conn.cursor() as cursor:
+        cursor.execute(query, params)
+        result = cursor.fetchone()
+        conn.commit()
+        return result
+
+
 class LevelUp(commands.Cog):
     """Commands for leveling up player characters"""
 
-    def __init__(self, bot: commands.bot.Bot, conn: connection):
+    def __init__(self, bot: commands.bot.Bot, db: AsyncDatabase):
         self.bot = bot
-        self.conn = conn
+        self.db = db
         print('Level cog loaded')
 
 
     @commands.command()
     async def level(self, ctx: commands.Context):
         """Checks if the player can level up"""
-        xp_data = self.get_player_xp(ctx, self.conn)
+        identity = await self.db.selected_character(ctx.author.name, ctx.guild.id)
+        if identity is None:
+            await ctx.send("No character selected for this player.")
+            return
+        xp_data = await self.db.run(self.get_character_xp, identity.character_id)
         level = xp_data.get('level')
         current_xp = xp_data.get('experience')
         xp_requirement = xp_required_for_level(level)
@@ -32,7 +45,7 @@ class LevelUp(commands.Cog):
         if current_xp >= xp_requirement:
             await ctx.send(f"🎉 You leveled up to level {level + 1}!")
 
-            view = StatUpgradeView(self.conn, ctx.author.name)
+            view = StatUpgradeView(self.db, identity.character_id)
             await ctx.send("Choose a stat to upgrade:", view=view)
         else:
             await ctx.send(f"You need {xp_requirement - current_xp} more XP to level up.")
@@ -45,20 +58,16 @@ class LevelUp(commands.Cog):
         query = """
         UPDATE character
         SET experience = experience + %s
-        WHERE character_id = (
-            SELECT c.character_id
-            FROM character c
-            JOIN player p ON c.player_id = p.player_id
-            WHERE p.player_name = %s AND c.selected_character = TRUE
-        )
+        WHERE character_id = %s
         RETURNING experience;
         """
         
         try:
-            with self.conn.cursor() as cursor:
-                cursor.execute(query, (xp_amount, member.name))
-                result = cursor.fetchone()
-                self.conn.commit()
+            identity = await self.db.selected_character(member.name, ctx.guild.id)
+            result = None
+            if identity:
+                result = await self.db.run(
+                    update_character, query, (xp_amount, identity.character_id))
 
             if result:
                 new_xp = result.get('experience')
@@ -69,28 +78,22 @@ class LevelUp(commands.Cog):
         except Exception as e:
             await ctx.send(f"❌ Failed to give XP: {str(e)}")
 
-    def get_player_xp(self, ctx: commands.Context, conn: connection) -> dict[str: int]:
-        """Gets the players current XP"""
+    def get_character_xp(self, character_id: int, conn: connection) -> dict[str: int]:
+        """Gets the character's current XP"""
         query = """SELECT c.experience, c.level
                     FROM character AS c
-                    WHERE c.character_id = (
-                        SELECT c.character_id
-                        FROM "character" c
-                        JOIN player p ON c.player_id = p.player_id
-                        WHERE p.player_name = %s
-                        AND c.selected_character = TRUE
-                    );"""
+                    WHERE c.character_id = %s;"""
 
         with conn.cursor() as cursor:
-            cursor.execute(query, (ctx.author.name,))
+            cursor.execute(query, (character_id,))
             return cursor.fetchone()
 
 
 class StatUpgradeView(discord.ui.View):
-    def __init__(self, conn: connection, player_name: str):
+    def __init__(self, db: AsyncDatabase, character_id: int):
         super().__init__(timeout=30)
-        self.conn = conn
-        self.player_name = player_name
+        self.db = db
+        self.character_id = character_id
 
     async def upgrade_health_stat(self, interaction: discord.Interaction):
         query = """
@@ -98,21 +101,14 @@ class StatUpgradeView(discord.ui.View):
         SET 
             health = health + 50,
             level = level + 1
-        WHERE character_id = (
-            SELECT c.character_id
-            FROM character c
-            JOIN player p ON c.player_id = p.player_id
-            WHERE p.player_name = %s AND c.selected_character = TRUE
-        )
+        WHERE character_id = %s
         RETURNING health;
         """
-        with self.conn.cursor() as cursor:
-            try:
-                cursor.execute(query, (self.player_name,))
-                new_health = cursor.fetchone().get('health')
-                self.conn.commit()
-            except Exception as e:
-                print(e)
+        try:
+            result = await self.db.run(update_character, query, (self.character_id,))
+            new_health = result.get('health')
+        except Exception as e:
+            print(e)
         await interaction.response.send_message(f"✅ Health increased!, new health = {new_health}", ephemeral=True)
 
 
@@ -122,18 +118,11 @@ class StatUpgradeView(discord.ui.View):
         SET 
             mana = mana + 50,
             level = level + 1
-        WHERE character_id = (
-            SELECT c.character_id
-            FROM character c
-            JOIN player p ON c.player_id = p.player_id
-            WHERE p.player_name = %s AND c.selected_character = TRUE
-        )        
+        WHERE character_id = %s
         RETURNING mana;
         """
-        with self.conn.cursor() as cursor:
-            cursor.execute(query, (self.player_name,))
-            new_mana = cursor.fetchone().get('mana')
-            self.conn.commit()
+        result = await self.db.run(update_character, query, (self.character_id,))
+        new_mana = result.get('mana')
 
         await interaction.response.send_message(f"✅ Mana increased!, new mana = {new_mana}", ephemeral=True)
 
@@ -144,18 +133,11 @@ class StatUpgradeView(discord.ui.View):
         SET 
             craft_skill = craft_skill + 10,
             level = level + 1
-        WHERE character_id = (
-            SELECT c.character_id
-            FROM character c
-            JOIN player p ON c.player_id = p.player_id
-            WHERE p.player_name = %s AND c.selected_character = TRUE
-        )
+        WHERE character_id = %s
         RETURNING craft_skill;
         """
-        with self.conn.cursor() as cursor:
-            cursor.execute(query, (self.player_name,))
-            new_craft_skill = cursor.fetchone().get('craft_skill')
-            self.conn.commit()
+        result = await self.db.run(update_character, query, (self.character_id,))
+        new_craft_skill = result.get('craft_skill')
 
         await interaction.response.send_message(f"✅ craft skill increased!, new craft skill = {new_craft_skill}", ephemeral=True)
 
@@ -173,6 +155,6 @@ class StatUpgradeView(discord.ui.View):
         await self.upgrade_craft_stat(interaction)
 
 async def setup(bot):
-    """Sets up connection"""
-    conn = DatabaseConnection.get_connection()
-    await bot.add_cog(LevelUp(bot, conn))
+    """Sets up the database access layer"""
+    db = DatabaseConnection.get_database()
+    await bot.add_cog(LevelUp(bot, db))
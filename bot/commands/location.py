@@ -5,17 +5,14 @@
 """
 import discord
 from discord.ext import commands
-from psycopg2.extensions import connection
-from bot.database_utils import (DatabaseMapper,
-                                DataInserter,
-                                DatabaseConnection)
+from bot.database_utils import DatabaseConnection, AsyncDatabase
 
 class Location(commands.Cog):
     """commands that manage a location"""
 
-    def __init__(self, bot: commands.bot.Bot, conn: connection):
+    def __init__(self, bot: commands.bot.Bot, db: AsyncDatabase):
         self.bot = bot
-        self.conn = conn
+        self.db = db
         print('Location log loaded')
 
 
@@ -48,19 +45,18 @@ class Location(commands.Cog):
             f"Thread: **{ctx.channel.name}** (ID: `{ctx.channel.id}`)"
         )
 
-        location_map = DatabaseMapper.get_location_mapping(self.conn, ctx.guild.id)
+        location_map = await self.db.mapper.get_location_mapping(ctx.guild.id)
         if ctx.channel.parent.id not in location_map.keys():
             # How to get a link to the location
             print(
                 f"https://discord.com/channels/{ctx.guild.id}/{ctx.channel.parent.id}")
-            await ctx.send(DataInserter.generate_location(ctx, self.conn))
-        location_map = DatabaseMapper.get_location_mapping(self.conn, ctx.guild.id)
-        settlement_map = DatabaseMapper.get_settlement_mapping(self.conn, ctx.guild.id)
+            await ctx.send(await self.db.inserter.generate_location(ctx))
+        location_map = await self.db.mapper.get_location_mapping(ctx.guild.id)
+        settlement_map = await self.db.mapper.get_settlement_mapping(ctx.guild.id)
         if ctx.channel.id not in settlement_map.keys():
-            await ctx.send(DataInserter.generate_settlement(ctx, self.conn, location_map))
-
+            await ctx.send(await self.db.inserter.generate_settlement(ctx, location_map))
 
 async def setup(bot: commands.bot.Bot):
-    """Sets up connection"""
-    conn = DatabaseConnection.get_connection()
-    await bot.add_cog(Location(bot, conn))
+    """Sets up the database access layer"""
+    db = DatabaseConnection.get_database()
+    await bot.add_cog(Location(bot, db))
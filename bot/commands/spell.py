@@ -2,16 +2,16 @@ import discord
 from discord.ext import commands
 import discord.ext.commands
 from psycopg2.extensions import connection
-from bot.database_utils import DatabaseConnection
+from bot.database_utils import DatabaseConnection, AsyncDatabase, ReferenceData
 import discord.ext
 
 
 class Spell(commands.Cog):
     """Defines spell-related commands"""
 
-    def __init__(self, bot: commands.bot.Bot, conn: connection):
+    def __init__(self, bot: commands.bot.Bot, db: AsyncDatabase):
         self.bot = bot
-        self.conn = conn
+        self.db = db
         print('Spell cog loaded')
     
     @commands.command()
@@ -32,33 +32,33 @@ class Spell(commands.Cog):
             f"**Creating spell: {spell_name}**\nWould you like to create a **damage spell** or a **status spell**?"
         )
 
-        view = StartCreationView(ctx, self.conn, spell_details)
+        view = StartCreationView(ctx, self.db, spell_details)
         await message.edit(content="Choose an option:", view=view)
 
 
 class StartCreationView(discord.ui.View):
     """Lets the user choose between a damage spell or status spell"""
 
-    def __init__(self, ctx: commands.Context, conn: connection, spell_details: dict, timeout=180):
+    def __init__(self, ctx: commands.Context, db: AsyncDatabase, spell_details: dict, timeout=180):
         super().__init__(timeout=timeout)
         self.ctx = ctx
-        self.conn = conn
+        self.db = db
 
         # Pass the arguments correctly to the button constructor
         self.add_item(SpellTypeButton("Damage Spell",
-                                      "damage", ctx, conn, spell_details))
+                                      "damage", ctx, db, spell_details))
         self.add_item(SpellTypeButton("Status Spell",
-                                      "status", ctx, conn, spell_details))
+                                      "status", ctx, db, spell_details))
 
 
 class SpellTypeButton(discord.ui.Button):
     """Button for choosing spell type"""
 
-    def __init__(self, label: str, spell_type: str, ctx: commands.Context, conn: connection, spell_details: dict):
+    def __init__(self, label: str, spell_type: str, ctx: commands.Context, db: AsyncDatabase, spell_details: dict):
         super().__init__(style=discord.ButtonStyle.blurple, label=label)
         self.spell_type = spell_type
         self.ctx = ctx
-        self.conn = conn
+        self.db = db
         self.spell_details = spell_details
 
     async def callback(self, interaction: discord.Interaction):
@@ -69,41 +69,34 @@ class SpellTypeButton(discord.ui.Button):
         self.spell_details['spell_type'] = self.spell_type
 
         if self.spell_type == "damage":
-            await interaction.followup.send("How much power should the spell have?", view=PowerView(self.ctx, self.spell_details, self.conn), ephemeral=True)
+            await interaction.followup.send("How much power should the spell have?", view=PowerView(self.ctx, self.spell_details, self.db), ephemeral=True)
         else:
-            await interaction.followup.send("Choose a status effect:", view=StatusEffectView(self.ctx, self.conn, self.spell_details), ephemeral=True)
+            status_effects = ReferenceData.spell_statuses.by_id
+            await interaction.followup.send("Choose a status effect:", view=StatusEffectView(self.ctx, self.db, self.spell_details, status_effects), ephemeral=True)
 
 
 class StatusEffectView(discord.ui.View):
     """Lets the user select a status effect"""
 
-    def __init__(self, ctx: commands.Context, conn: connection, spell_details: dict, timeout=180):
+    def __init__(self, ctx: commands.Context, db: AsyncDatabase, spell_details: dict, status_effects: dict[int, str], timeout=180):
         super().__init__(timeout=timeout)
         self.ctx = ctx
-        self.conn = conn
+        self.db = db
         self.spell_details = spell_details
 
-        status_effects = self.get_status_effects()
         for effect_id, effect_name in status_effects.items():
             self.add_item(StatusEffectButton(
-                effect_name, effect_id, ctx, conn, self.spell_details))
-
-    def get_status_effects(self):
-        """Fetches available status effects from DB"""
-        with self.conn.cursor() as cursor:
-            query = "SELECT spell_status_id, status_name FROM spell_status;"
-            cursor.execute(query)
-            return {row['spell_status_id']: row['status_name'] for row in cursor.fetchall()}
+                effect_name, effect_id, ctx, db, self.spell_details))
 
 
 class StatusEffectButton(discord.ui.Button):
     """Button to select a status effect"""
 
-    def __init__(self, label: str, status_id: int, ctx: commands.Context, conn: connection, spell_details: dict):
+    def __init__(self, label: str, status_id: int, ctx: commands.Context, db: AsyncDatabase, spell_details: dict):
         super().__init__(style=discord.ButtonStyle.secondary, label=label)
         self.status_id = status_id
         self.ctx = ctx
-        self.conn = conn
+        self.db = db
         self.spell_details = spell_details
 
     async def callback(self, interaction: discord.Interaction):
@@ -112,32 +105,32 @@ class StatusEffectButton(discord.ui.Button):
         await interaction.followup.send(f"Selected status effect: **{self.label}**. Now enter duration.", ephemeral=True)
         self.spell_details['spell_status_id'] = self.status_id
         print(f'status effect button {self.spell_details=}')
-        await interaction.followup.send("Enter the duration of the effect (in turns):", view=DurationView(self.ctx, self.spell_details, self.conn), ephemeral=True)
+        await interaction.followup.send("Enter the duration of the effect (in turns):", view=DurationView(self.ctx, self.spell_details, self.db), ephemeral=True)
 
 
 class DurationView(discord.ui.View):
     """View for selecting the duration of a status effect spell."""
 
-    def __init__(self, ctx, spell_details: dict, conn: connection, timeout=180):
+    def __init__(self, ctx, spell_details: dict, db: AsyncDatabase, timeout=180):
         super().__init__(timeout=timeout)
         self.ctx = ctx
         self.spell_details = spell_details
-        self.conn = connection
+        self.db = db
 
         # Add duration buttons
         durations = [1, 2, 3, 4, 5]
         for duration in durations:
-            self.add_item(DurationButton(duration, ctx, conn, self.spell_details))
+            self.add_item(DurationButton(duration, ctx, db, self.spell_details))
 
 
 class DurationButton(discord.ui.Button):
     """Button for selecting the duration of a status effect."""
 
-    def __init__(self, duration: int, ctx: discord.ext.commands.Context, conn: connection, spell_details: dict):
+    def __init__(self, duration: int, ctx: discord.ext.commands.Context, db: AsyncDatabase, spell_details: dict):
         super().__init__(style=discord.ButtonStyle.primary,
                          label=f"{duration} turns")
         self.duration = duration
-        self.conn = conn
+        self.db = db
         self.ctx = ctx
         self.spell_details = spell_details
 
@@ -151,33 +144,33 @@ class DurationButton(discord.ui.Button):
         await interaction.followup.send(f"⏳ Status effect will last **{self.duration} turns**.")
 
         next_view = ChanceView(
-            self.ctx, self.spell_details, self.conn)
+            self.ctx, self.spell_details, self.db)
         await interaction.followup.send("Next, choose the Chance of the status effect:", view=next_view, ephemeral=True)
 
 
 class ChanceView(discord.ui.View):
     """View for selecting the probability of a status effect triggering."""
 
-    def __init__(self, ctx, spell_details: dict, conn: connection, timeout=180):
+    def __init__(self, ctx, spell_details: dict, db: AsyncDatabase, timeout=180):
         super().__init__(timeout=timeout)
         self.ctx = ctx
         self.spell_details = spell_details
-        self.conn = conn
+        self.db = db
 
         # Add buttons for different chance percentages
         chances = [10, 25, 50, 75, 100]
         for chance in chances:
-            self.add_item(ChanceButton(chance, conn, ctx, spell_details))
+            self.add_item(ChanceButton(chance, db, ctx, spell_details))
     
 
 class ChanceButton(discord.ui.Button):
     """Button for selecting the status effect chance."""
 
-    def __init__(self, chance: int, conn: connection, ctx: commands.Context, spell_details: dict):
+    def __init__(self, chance: int, db: AsyncDatabase, ctx: commands.Context, spell_details: dict):
         super().__init__(style=discord.ButtonStyle.blurple,
                          label=f"{chance}% chance")
         self.chance = chance
-        self.conn = conn
+        self.db = db
         self.ctx = ctx
         self.spell_details = spell_details
 
@@ -191,7 +184,7 @@ class ChanceButton(discord.ui.Button):
             await interaction.followup.send(f"🎲 Status effect will trigger **{self.chance}%** of the time.")
 
             # Move to Power Selection (since both damage and status spells have power)
-            next_view = PowerView(self.ctx, self.spell_details, self.conn)
+            next_view = PowerView(self.ctx, self.spell_details, self.db)
             await interaction.followup.send("Next, select the spell's power:", view=next_view, ephemeral=True)
         except Exception as e:
             print(e)
@@ -200,25 +193,25 @@ class ChanceButton(discord.ui.Button):
 class PowerView(discord.ui.View):
     """View for selecting the spell's power level."""
 
-    def __init__(self, ctx: commands.Context, spell_details: dict, conn: connection, timeout=180):
+    def __init__(self, ctx: commands.Context, spell_details: dict, db: AsyncDatabase, timeout=180):
         super().__init__(timeout=timeout)
         self.ctx = ctx
         self.spell_details = spell_details
-        self.conn = conn
+        self.db = db
 
         power_levels = [10, 30, 50, 70, 90, 110]
         for power in power_levels:
-            self.add_item(PowerButton(power, conn, ctx, spell_details))
+            self.add_item(PowerButton(power, db, ctx, spell_details))
 
 
 class PowerButton(discord.ui.Button):
     """Button for selecting spell power."""
 
-    def __init__(self, power: int, conn: connection, ctx: commands.Context, spell_details: dict):
+    def __init__(self, power: int, db: AsyncDatabase, ctx: commands.Context, spell_details: dict):
         super().__init__(style=discord.ButtonStyle.primary,
                          label=f"{power} Power")
         self.power = power
-        self.conn = conn
+        self.db = db
         self.ctx = ctx
         self.spell_details = spell_details
 
@@ -231,7 +224,7 @@ class PowerButton(discord.ui.Button):
             await interaction.followup.send(f"💥 Spell power set to **{self.power}**.")
 
             # Move to Mana Cost
-            next_view = ManaCostView(self.ctx, self.spell_details, self.conn)
+            next_view = ManaCostView(self.ctx, self.spell_details, self.db)
             await interaction.followup.send("Next, select the spell's mana cost:", view=next_view, ephemeral=True)
         except Exception as e:
             print(e)
@@ -239,25 +232,25 @@ class PowerButton(discord.ui.Button):
 class ManaCostView(discord.ui.View):
     """View for selecting the spell's mana cost."""
 
-    def __init__(self, ctx: commands.Context, spell_details: dict, conn: connection, timeout=180):
+    def __init__(self, ctx: commands.Context, spell_details: dict, db: AsyncDatabase, timeout=180):
         super().__init__(timeout=timeout)
         self.ctx = ctx
         self.spell_details = spell_details
-        self.conn = conn
+        self.db = db
 
         mana_costs = [10, 20, 40, 60, 80, 100]
         for cost in mana_costs:
-            self.add_item(ManaButton(cost, conn, ctx, spell_details))
+            self.add_item(ManaButton(cost, db, ctx, spell_details))
 
 
 class ManaButton(discord.ui.Button):
     """Button for selecting mana cost."""
 
-    def __init__(self, cost: int, conn: connection, ctx: commands.Context, spell_details: dict):
+    def __init__(self, cost: int, db: AsyncDatabase, ctx: commands.Context, spell_details: dict):
         super().__init__(
             style=discord.ButtonStyle.primary, label=f"{cost} Mana")
         self.cost = cost
-        self.conn = conn
+        self.db = db
         self.ctx = ctx
         self.spell_details = spell_details
 
@@ -272,7 +265,8 @@ class ManaButton(discord.ui.Button):
 
         # Move to Cooldown
         try:
-            next_view = ElementView(self.ctx, self.spell_details, self.conn)
+            element_map = ReferenceData.elements.by_name
+            next_view = ElementView(self.ctx, self.spell_details, self.db, element_map)
             await interaction.followup.send("Next, select the spell's Element:", view=next_view, ephemeral=True)
         except Exception as e:
             print(e)
@@ -281,29 +275,21 @@ class ManaButton(discord.ui.Button):
 class ElementView(discord.ui.View):
     """A View for selecting the spells element."""
 
-    def __init__(self, ctx: commands.Context, spell_details: dict, conn: connection, timeout = 180):
+    def __init__(self, ctx: commands.Context, spell_details: dict, db: AsyncDatabase, element_map: dict[str, int], timeout = 180):
         super().__init__(timeout=timeout)
         self.ctx = ctx
         self.spell_details = spell_details
-        self.conn = conn
-        element_map = self.get_element_map(conn)
+        self.db = db
         for element_name, element_id in element_map.items():
             self.add_item(ElementButton(
-                element_name, element_id, conn, ctx, spell_details))
-
-    def get_element_map(self, conn: connection) -> dict[str: int]:
-        """gets a dictionary of {element_name: element_id}"""
-        with conn.cursor() as cursor:
-            cursor.execute("""SELECT element_name, element_id
-                        FROM element""")
-            return {row['element_name']: row['element_id'] for row in cursor.fetchall()}
+                element_name, element_id, db, ctx, spell_details))
 
 class ElementButton(discord.ui.Button):
-    def __init__(self, element_name: str, element_id: int, conn: connection, ctx: commands.Context, spell_details: dict):
+    def __init__(self, element_name: str, element_id: int, db: AsyncDatabase, ctx: commands.Context, spell_details: dict):
         super().__init__(style=discord.ButtonStyle.blurple, label=element_name)
         self.element_name = element_name
         self.element_id = element_id
-        self.conn = conn
+        self.db = db
         self.ctx = ctx
         self.spell_details = spell_details
     
@@ -316,31 +302,31 @@ class ElementButton(discord.ui.Button):
         await interaction.response.defer()
         await interaction.followup.send(f"🔥 Element set to **{self.element_name}**.")
 
-        next_view = CooldownView(self.ctx, self.spell_details, self.conn)
+        next_view = CooldownView(self.ctx, self.spell_details, self.db)
         await interaction.followup.send("Next, select the spell's cooldown:", view=next_view, ephemeral=True)
 
 class CooldownView(discord.ui.View):
     """View for selecting the spell's cooldown."""
 
-    def __init__(self, ctx: commands.Context, spell_details: dict, conn: connection, timeout=180):
+    def __init__(self, ctx: commands.Context, spell_details: dict, db: AsyncDatabase, timeout=180):
         super().__init__(timeout=timeout)
         self.ctx = ctx
         self.spell_details = spell_details
-        self.conn = conn
+        self.db = db
 
         cooldown = [1, 2, 3, 4, 5]
         for cd in cooldown:
-            self.add_item(CooldownButton(cd, conn, ctx, spell_details))
+            self.add_item(CooldownButton(cd, db, ctx, spell_details))
 
 
 class CooldownButton(discord.ui.Button):
     """Button for selecting cooldown."""
 
-    def __init__(self, cooldown: int, conn: connection, ctx: commands.Context, spell_details: dict):
+    def __init__(self, cooldown: int, db: AsyncDatabase, ctx: commands.Context, spell_details: dict):
         super().__init__(style=discord.ButtonStyle.primary,
                          label=f"{cooldown} Turns")
         self.cooldown = cooldown
-        self.conn = conn
+        self.db = db
         self.ctx = ctx
         self.spell_details = spell_details
 
@@ -354,45 +340,38 @@ class CooldownButton(discord.ui.Button):
 
         # Move to SpellTypeView
 
-        next_view = SpellTypeView(self.ctx, self.spell_details, self.conn)
+        spell_types = ReferenceData.spell_types.by_id
+        next_view = SpellTypeView(self.ctx, self.spell_details, self.db, spell_types)
         await interaction.followup.send("Next, choose the spell type:", view=next_view, ephemeral=True)
 
 
 class SpellTypeView(discord.ui.View):
     """View for selecting the spell type from the database."""
 
-    def __init__(self, ctx: commands.Context, spell_details: dict, conn: connection, timeout=180):
+    def __init__(self, ctx: commands.Context, spell_details: dict, db: AsyncDatabase, spell_types: dict[int, str], timeout=180):
         super().__init__(timeout=timeout)
         self.ctx = ctx
         self.spell_details = spell_details
-        self.conn = conn
+        self.db = db
 
-        # Fetch spell types and dynamically add buttons
-        spell_types = self.fetch_spell_types()
+        # Dynamically add a button for each spell type
         if spell_types:
             for spell_type_id, spell_type_name in spell_types.items():
                 self.add_item(SpellTargetButton(
-                    spell_type_id, spell_type_name, conn, ctx, spell_details))
+                    spell_type_id, spell_type_name, db, ctx, spell_details))
         else:
             print("❌ No spell types found in the database.")
 
 
-    def fetch_spell_types(self):
-        """Fetch spell types from the database."""
-        with self.conn.cursor() as cursor:
-            query = "SELECT spell_type_id, spell_type_name FROM spell_type"
-            cursor.execute(query)
-            return {row['spell_type_id']: row['spell_type_name'] for row in cursor.fetchall()}
-
 
 class SpellTargetButton(discord.ui.Button):
     """Button for selecting a spell type."""
 
-    def __init__(self, spell_type_id: int, spell_type_name: str, conn: connection, ctx: commands.Context, spell_details: dict):
+    def __init__(self, spell_type_id: int, spell_type_name: str, db: AsyncDatabase, ctx: commands.Context, spell_details: dict):
         super().__init__(style=discord.ButtonStyle.primary, label=spell_type_name)
         self.spell_type_id = spell_type_id
         self.spell_type_name = spell_type_name
-        self.conn = conn
+        self.db = db
         self.ctx = ctx
         self.spell_details = spell_details
 
@@ -405,19 +384,20 @@ class SpellTargetButton(discord.ui.Button):
         await interaction.followup.send(f"🔮 Spell type set to **{self.spell_type_name}**.")
 
         # Move to Race/Class Exclusivity Selection
-        next_view = ClassRaceView(self.ctx, self.spell_details, self.conn)
+        eligible_casters = await self.db.run(
+            ClassRaceView.fetch_classes_and_races, server_id=self.ctx.guild.id)
+        next_view = ClassRaceView(self.ctx, self.spell_details, self.db, eligible_casters)
         await interaction.followup.send("Next, select race/class exclusivity:", view=next_view, ephemeral=True)
 
 
 class ClassRaceView(discord.ui.View):
     """View for selecting either class or race exclusivity for a spell (mutually exclusive)."""
 
-    def __init__(self, ctx: commands.Context, spell_details: dict, conn: connection, timeout=180):
+    def __init__(self, ctx: commands.Context, spell_details: dict, db: AsyncDatabase, eligible_casters: list[dict], timeout=180):
         super().__init__(timeout=timeout)
         self.ctx = ctx
         self.spell_details = spell_details
-        self.conn = conn
-        eligible_casters = self.fetch_classes_and_races()
+        self.db = db
         for caster in eligible_casters:
             self.add_item(CasterButton(
                 caster_type=caster["type"],
@@ -425,14 +405,14 @@ class ClassRaceView(discord.ui.View):
                 caster_name=caster["name"],
                 spell_details=spell_details,
                 ctx=ctx,
-                conn=conn
+                db=db
             )
         )
 
-    def fetch_classes_and_races(self) -> list[dict]:
+    @staticmethod
+    def fetch_classes_and_races(conn: connection, server_id: int) -> list[dict]:
         """Fetch available classes and races for this server."""
-        server_id = self.ctx.guild.id
-        with self.conn.cursor() as cursor:
+        with conn.cursor() as cursor:
             query = """SELECT 'class' AS table, class_id AS id, class_name AS name FROM class WHERE server_id = %s
                     UNION
                     SELECT 'race' AS table, race_id AS id, race_name AS name FROM race WHERE server_id = %s"""
@@ -450,7 +430,7 @@ class ClassRaceView(discord.ui.View):
 
 class CasterButton(discord.ui.Button):
     """Confirms the race/class that can cast the spell"""
-    def __init__(self, caster_type: str, caster_id: int, caster_name: str, spell_details: dict, ctx: commands.Context, conn: connection):
+    def __init__(self, caster_type: str, caster_id: int, caster_name: str, spell_details: dict, ctx: commands.Context, db: AsyncDatabase):
         super().__init__(label=caster_name, style=discord.ButtonStyle.red if caster_type ==
                          'class' else discord.ButtonStyle.green)
         self.caster_type = caster_type
@@ -458,7 +438,7 @@ class CasterButton(discord.ui.Button):
         self.caster_name = caster_name
         self.spell_details = spell_details
         self.ctx = ctx
-        self.conn = conn
+        self.db = db
 
 
     async def callback(self, interaction: discord.Interaction):
@@ -468,26 +448,26 @@ class CasterButton(discord.ui.Button):
         print(f'CasterButton {self.spell_details=}')
         await interaction.response.defer()
         await interaction.followup.send(f"Race/Class caster set to **{self.caster_name}**.")
-        next_view = CreateSpell(self.ctx, self.spell_details, self.conn)
+        next_view = CreateSpell(self.ctx, self.spell_details, self.db)
         await interaction.followup.send("Confirm?", view=next_view, ephemeral=True)
 
 
 class CreateSpell(discord.ui.View):
     """View for confirming the spell to be created"""
-    def __init__(self, ctx: commands.Context, spell_details: dict, conn: connection, timeout = 180):
+    def __init__(self, ctx: commands.Context, spell_details: dict, db: AsyncDatabase, timeout = 180):
         super().__init__(timeout=timeout)
         try:
-            self.add_item(MakeSpell(ctx, spell_details, conn))
+            self.add_item(MakeSpell(ctx, spell_details, db))
         except Exception as e:
             print(e)
 
 class MakeSpell(discord.ui.Button):
     """Makes the spell and inserts it into the DB"""
-    def __init__(self, ctx: commands.Context, spell_details: dict, conn: connection):
+    def __init__(self, ctx: commands.Context, spell_details: dict, db: AsyncDatabase):
         super().__init__(style=discord.ButtonStyle.blurple, label='Confirm!')
         self.ctx = ctx
         self.spell_details = spell_details
-        self.conn = conn
+        self.db = db
 
     async def callback(self, interaction: discord.Interaction):
         print('making spell:')
@@ -498,21 +478,21 @@ class MakeSpell(discord.ui.Button):
                 class_id = self.spell_details.get('caster_id')
             else:
                 race_id = self.spell_details.get('caster_id')
-            spell_id = self.generate_spell(conn=self.conn,
-                                       server_id=self.ctx.guild.id,
-                                       spell_name=self.spell_details.get('spell_name', 'not found'),
-                                       spell_description='TEMPORARY',
-                                       spell_power=self.spell_details.get('power', 0),
-                                       mana_cost=self.spell_details.get('mana_cost', 0),
-                                       cooldown=self.spell_details.get('cooldown', 0),
-                                       spell_type_id=self.spell_details.get('spell_type_id'),
-                                       element_id=self.spell_details.get('element_id'),
-                                       spell_status_id=self.spell_details.get('spell_status_id', 1),
-                                       spell_status_chance=self.spell_details.get('status_chance', 100),
-                                       spell_duration= self.spell_details.get('duration', 1),
-                                       race_id=race_id if race_id else None,
-                                       class_id=class_id if class_id else None
-                                       )
+            spell_id = await self.db.run(self.generate_spell,
+                                         server_id=self.ctx.guild.id,
+                                         spell_name=self.spell_details.get('spell_name', 'not found'),
+                                         spell_description='TEMPORARY',
+                                         spell_power=self.spell_details.get('power', 0),
+                                         mana_cost=self.spell_details.get('mana_cost', 0),
+                                         cooldown=self.spell_details.get('cooldown', 0),
+                                         spell_type_id=self.spell_details.get('spell_type_id'),
+                                         element_id=self.spell_details.get('element_id'),
+                                         spell_status_id=self.spell_details.get('spell_status_id', 1),
+                                         spell_status_chance=self.spell_details.get('status_chance', 100),
+                                         spell_duration= self.spell_details.get('duration', 1),
+                                         race_id=race_id if race_id else None,
+                                         class_id=class_id if class_id else None
+                                         )
         
             await self.ctx.send(f'✨ Spell {self.spell_details.get('spell_name', 'not found')} has been created! as ID: {spell_id}')
         except Exception as e:
@@ -583,6 +563,6 @@ class MakeSpell(discord.ui.Button):
             return f"❌ Error: {str(e)}"
 
 async def setup(bot: commands.bot.Bot):
-    """Sets up connection"""
-    conn = DatabaseConnection.get_connection()
-    await bot.add_cog(Spell(bot, conn))
+    """Sets up the database access layer"""
+    db = DatabaseConnection.get_database()
+    await bot.add_cog(Spell(bot, db))
@@ -1,20 +1,41 @@
-from .connection import DatabaseConnection
+from .connection import DatabaseConnection, ConnectionPool, PoolTimeoutError
 from .fetch_queries import (DatabaseMapper,
                             DatabaseIDFetch,
                             UserInputHelper,
                             InventoryDatabase,
+                            PurchaseResult,
+                            CombatDatabase,
                             EmbedHelper,
                             SpellQuery)
 from .generate_queries import DataInserter
+from .reference_data import ReferenceData, ReferenceTable
+from .character_cache import CharacterIdentity, SelectedCharacterCache
+from .async_queries import AsyncDatabase, AsyncQueries
+from .metrics import EventLoopLagMonitor
+from .migrations import Migration, MigrationError, MigrationRunner
 
 
 __all__ = [
     "DatabaseConnection",
+    "ConnectionPool",
+    "PoolTimeoutError",
     "DatabaseMapper",
     "DatabaseIDFetch",
     "UserInputHelper",
     "InventoryDatabase",
+    "PurchaseResult",
+    "CombatDatabase",
     "EmbedHelper",
     "DataInserter",
     "SpellQuery",
+    "ReferenceData",
+    "ReferenceTable",
+    "CharacterIdentity",
+    "SelectedCharacterCache",
+    "AsyncDatabase",
+    "AsyncQueries",
+    "EventLoopLagMonitor",
+    "Migration",
+    "MigrationError",
+    "MigrationRunner",
 ]
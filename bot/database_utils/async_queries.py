@@ -0,0 +1,77 @@
+"""Awaitable access to the query classes that keeps postgres off the event loop"""
+import asyncio
+import inspect
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable
+
+from .character_cache import CharacterIdentity, SelectedCharacterCache
+from .connection import ConnectionPool
+from .fetch_queries import DatabaseMapper, DatabaseIDFetch, InventoryDatabase, CombatDatabase
+from .generate_queries import DataInserter
+
+
+class AsyncQueries:
+    """Wraps one of the query classes so its classmethods can be awaited.
+
+    Every classmethod keeps its name and arguments minus `conn`, e.g.
+    `await db.mapper.get_last_event(character_id, 'Scavenge')` runs
+    `DatabaseMapper.get_last_event(conn, character_id, 'Scavenge')`
+    on a borrowed connection in the database thread pool."""
+
+    def __init__(self, queries: type, database: "AsyncDatabase"):
+        self._queries = queries
+        self._database = database
+
+    def __getattr__(self, name: str):
+        method = getattr(self._queries, name)
+        if not callable(method):
+            return method
+        params = [param for param in inspect.signature(method).parameters if param != 'conn']
+
+        async def call(*args, **kwargs):
+            kwargs.update(zip(params, args))
+            return await self._database.run(method, **kwargs)
+
+        call.__name__ = name
+        call.__doc__ = method.__doc__
+        # Cache the wrapper so the signature is only inspected once
+        setattr(self, name, call)
+        return call
+
+
+class AsyncDatabase:
+    """The awaitable data access layer used by the cogs.
+
+    Queries borrow a connection from the pool and run on a thread pool
+    that is the same size as the connection pool, so a slow query never
+    stalls the gateway heartbeat or other commands."""
+
+    def __init__(self, pool: ConnectionPool, max_workers: int = None):
+        self.pool = pool
+        self.executor = ThreadPoolExecutor(max_workers=max_workers or pool.max_size,
+                                           thread_name_prefix='database')
+        self.mapper = AsyncQueries(DatabaseMapper, self)
+        self.id_fetch = AsyncQueries(DatabaseIDFetch, self)
+        self.inventory = AsyncQueries(InventoryDatabase, self)
+        self.inserter = AsyncQueries(DataInserter, self)
+        self.combat = AsyncQueries(CombatDatabase, self)
+
+    async def run(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Runs `func(*args, conn=conn, **kwargs)` on the executor with a borrowed connection"""
+        async with self.pool.acquire() as conn:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self.executor, partial(func, *args, conn=conn, **kwargs))
+
+    async def selected_character(self, player_name: str, server_id: int) -> CharacterIdentity | None:
+        """Returns the ids of a player's selected character, only querying on a cache miss"""
+        identity = SelectedCharacterCache.get(player_name, server_id)
+        if identity is None:
+            identity = await self.run(SelectedCharacterCache.load,
+                                      player_name=player_name, server_id=server_id)
+        return identity
+
+    def shutdown(self):
+        """Stops the worker threads once queued queries have finished"""
+        self.executor.shutdown(wait=True)
@@ -0,0 +1,103 @@
+"""In-process cache of the ids behind each player's selected character"""
+import threading
+from typing import NamedTuple
+from psycopg2.extensions import connection
+
+from .fetch_queries import DatabaseIDFetch
+
+
+class CharacterIdentity(NamedTuple):
+    """The primary keys that belong to a player's selected character"""
+    player_id: int
+    character_id: int
+    inventory_id: int | None
+
+
+class SelectedCharacterCache:
+    """Maps (player_name, server_id) to the selected CharacterIdentity.
+
+    Lets the hot queries use primary keys instead of joining player on
+    player_name and filtering on selected_character every time. Anything
+    that changes which character is selected, or creates a character or
+    inventory, must call one of the invalidate methods. Invalidation can
+    happen on the database threads, so all access goes through a lock."""
+
+    _entries: dict[tuple[str, int], CharacterIdentity] = {}
+    _lock = threading.Lock()
+    # Bumped on every invalidation so a load that raced with one is not stored
+    _generation = 0
+    hits = 0
+    misses = 0
+
+    @classmethod
+    def get(cls, player_name: str, server_id: int) -> CharacterIdentity | None:
+        """Returns the cached identity, or None if it has to be loaded"""
+        with cls._lock:
+            identity = cls._entries.get((player_name, server_id))
+            if identity is None:
+                cls.misses += 1
+            else:
+                cls.hits += 1
+            return identity
+
+    @classmethod
+    def load(cls, conn: connection, player_name: str, server_id: int) -> CharacterIdentity | None:
+        """Loads the identity from the database and caches it, None if no character is selected"""
+        with cls._lock:
+            generation = cls._generation
+        row = DatabaseIDFetch.get_selected_character_identity(conn, player_name, server_id)
+        if row is None:
+            return None
+        identity = CharacterIdentity(row['player_id'], row['character_id'], row['inventory_id'])
+        with cls._lock:
+            if generation == cls._generation:
+                cls._entries[(player_name, server_id)] = identity
+        return identity
+
+    @classmethod
+    def fetch(cls, conn: connection, player_name: str, server_id: int) -> CharacterIdentity | None:
+        """Returns the cached identity, loading it on a miss"""
+        identity = cls.get(player_name, server_id)
+        if identity is None:
+            identity = cls.load(conn, player_name, server_id)
+        return identity
+
+    @classmethod
+    def invalidate(cls, player_name: str, server_id: int):
+        """Forgets the selected character of one player"""
+        with cls._lock:
+            cls._generation += 1
+            cls._entries.pop((player_name, server_id), None)
+
+    @classmethod
+    def invalidate_player(cls, player_id: int):
+        """Forgets the selected character of a player by player_id"""
+        cls._invalidate_where(lambda identity: identity.player_id == player_id)
+
+    @classmethod
+    def invalidate_character(cls, character_id: int):
+        """Forgets any entry pointing at a character, e.g. when it gets an inventory"""
+        cls._invalidate_where(lambda identity: identity.character_id == character_id)
+
+    @classmethod
+    def _invalidate_where(cls, matches):
+        """Forgets every entry whose identity matches"""
+        with cls._lock:
+            cls._generation += 1
+            for key in [key for key, identity in cls._entries.items() if matches(identity)]:
+                del cls._entries[key]
+
+    @classmethod
+    def clear(cls):
+        """Forgets every entry and resets the counters"""
+        with cls._lock:
+            cls._generation += 1
+            cls._entries.clear()
+            cls.hits = 0
+            cls.misses = 0
+
+    @classmethod
+    def stats(cls) -> dict[str, int]:
+        """Returns the size of the cache and its hit and miss counters"""
+        with cls._lock:
+            return {'size': len(cls._entries), 'hits': cls.hits, 'misses': cls.misses}
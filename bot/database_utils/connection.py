@@ -1,40 +1,199 @@
 """Defines the connection to the database"""
+import asyncio
+from contextlib import asynccontextmanager
 from os import environ as ENV
+from typing import AsyncIterator, Callable
 import psycopg2
-from psycopg2.extensions import connection
+from psycopg2.extensions import connection, TRANSACTION_STATUS_IDLE
 from psycopg2.extras import RealDictCursor
 from dotenv import load_dotenv
 
 load_dotenv()
 
+
+class PoolTimeoutError(Exception):
+    """Raised when no connection becomes free within the acquire timeout"""
+
+
+class ConnectionPool:
+    """A pool of postgres connections that commands borrow from.
+
+    Each command takes its own connection with
+    `async with pool.acquire() as conn:` and hands it back when the block
+    exits, so one slow query or one aborted transaction only affects
+    the command that caused it."""
+
+    def __init__(self,
+                 connect: Callable[[], connection],
+                 min_size: int = 1,
+                 max_size: int = 10,
+                 acquire_timeout: float = 10.0,
+                 health_check: bool = True):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError(
+                f"Invalid pool size: min_size={min_size}, max_size={max_size}")
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.acquire_timeout = acquire_timeout
+        self.health_check = health_check
+        self._idle: list[connection] = []
+        self._size = 0
+        self._semaphore = asyncio.Semaphore(max_size)
+        self._closed = False
+        self.acquired = 0
+        self.timeouts = 0
+        self.discarded = 0
+
+    @property
+    def size(self) -> int:
+        """The number of open connections, idle or borrowed"""
+        return self._size
+
+    @property
+    def idle(self) -> int:
+        """The number of open connections waiting to be borrowed"""
+        return len(self._idle)
+
+    @property
+    def in_use(self) -> int:
+        """The number of connections currently borrowed by commands"""
+        return self._size - len(self._idle)
+
+    async def open(self):
+        """Opens min_size connections up front so the first commands don't wait"""
+        while self._size < self.min_size:
+            self._idle.append(await self._new_connection())
+
+    async def close(self):
+        """Closes every idle connection, borrowed ones are closed when returned"""
+        self._closed = True
+        while self._idle:
+            self._discard(self._idle.pop())
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[connection]:
+        """Borrows a healthy connection for the duration of the block"""
+        if self._closed:
+            raise PoolTimeoutError("The connection pool is closed.")
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.acquire_timeout)
+        except asyncio.TimeoutError as e:
+            self.timeouts += 1
+            raise PoolTimeoutError(
+                f"No database connection available after {self.acquire_timeout}s") from e
+
+        conn = None
+        try:
+            conn = await self._checkout()
+            self.acquired += 1
+            yield conn
+        finally:
+            if conn is not None:
+                await self._release(conn)
+            self._semaphore.release()
+
+    async def _checkout(self) -> connection:
+        """Returns an idle connection that passes the health check or a new one"""
+        while self._idle:
+            conn = self._idle.pop()
+            if not self.health_check or await asyncio.to_thread(self._is_healthy, conn):
+                return conn
+            self._discard(conn)
+        return await self._new_connection()
+
+    async def _release(self, conn: connection):
+        """Resets a returned connection and puts it back in the pool"""
+        if self._closed or conn.closed:
+            self._discard(conn)
+            return
+        if conn.get_transaction_status() != TRANSACTION_STATUS_IDLE:
+            try:
+                # Never let an uncommitted or aborted transaction leak into the next command
+                await asyncio.to_thread(conn.rollback)
+            except psycopg2.Error:
+                self._discard(conn)
+                return
+        self._idle.append(conn)
+
+    async def _new_connection(self) -> connection:
+        """Opens a new connection without blocking the event loop"""
+        conn = await asyncio.to_thread(self._connect)
+        self._size += 1
+        return conn
+
+    def _discard(self, conn: connection):
+        """Closes a connection and forgets about it"""
+        self._size -= 1
+        self.discarded += 1
+        try:
+            conn.close()
+        except psycopg2.Error as e:
+            print(f"Error closing connection: {e}")
+
+    @staticmethod
+    def _is_healthy(conn: connection) -> bool:
+        """Checks the connection is open and the server still answers"""
+        if conn.closed:
+            return False
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+
 class DatabaseConnection:
-    """Object that returns or closes a connection to the database"""
-    _connection = None
+    """Object that creates or closes the shared connection pool"""
+    _pool = None
+    _database = None
+
+    @classmethod
+    def connect(cls) -> connection:
+        """Opens a new postgres connection"""
+        # return psycopg2.connect(
+        #     dbname=ENV['DB_NAME'],
+        #     user=ENV['DB_USER'],
+        #     host=ENV['DB_HOST'],
+        #     port=ENV['DB_PORT'],
+        #     cursor_factory=RealDictCursor)
+        return psycopg2.connect(
+            dbname=ENV['HOSTED_DB_NAME'],
+            user=ENV['HOSTED_DB_USER'],
+            password=ENV['HOSTED_DB_PASSWORD'],
+            host=ENV['HOSTED_DB_HOST'],
+            port=ENV['HOSTED_PORT'],
+            cursor_factory=RealDictCursor
+        )
+
+    @classmethod
+    def get_pool(cls) -> ConnectionPool:
+        """Returns the connection pool shared by every cog"""
+        if cls._pool is None:
+            cls._pool = ConnectionPool(
+                cls.connect,
+                min_size=int(ENV.get('DB_POOL_MIN_SIZE', 1)),
+                max_size=int(ENV.get('DB_POOL_MAX_SIZE', 10)),
+                acquire_timeout=float(ENV.get('DB_POOL_TIMEOUT', 10)))
+        return cls._pool
+
     @classmethod
-    def get_connection(cls) -> connection:
-        """Returns a single postgres connection"""
-        # if cls._connection is None:
-        #     cls._connection = psycopg2.connect(
-        #         dbname=ENV['DB_NAME'],
-        #         user=ENV['DB_USER'],
-        #         host=ENV['DB_HOST'],
-        #         port=ENV['DB_PORT'],
-        #         cursor_factory=RealDictCursor)
-        # return cls._connection  # Return the existing connection
-        if cls._connection is None:
-            cls._connection = psycopg2.connect(
-                dbname=ENV['HOSTED_DB_NAME'],
-                user=ENV['HOSTED_DB_USER'],
-                password=ENV['HOSTED_DB_PASSWORD'],
-                host=ENV['HOSTED_DB_HOST'],
-                port=ENV['HOSTED_PORT'],
-                cursor_factory=RealDictCursor
-            )
-        return cls._connection
+    def get_database(cls):
+        """Returns the awaitable data access layer shared by every cog"""
+        # Imported here as async_queries depends on this module
+        from .async_queries import AsyncDatabase
+        if cls._database is None:
+            cls._database = AsyncDatabase(cls.get_pool())
+        return cls._database
 
     @classmethod
-    def close_connection(cls):
-        """Closes the postgres connection"""
-        if cls._connection:
-            cls._connection.close()
-            cls._connection = None
+    async def close_pool(cls):
+        """Closes the shared connection pool"""
+        if cls._database:
+            cls._database.shutdown()
+            cls._database = None
+        if cls._pool:
+            await cls._pool.close()
+            cls._pool = None
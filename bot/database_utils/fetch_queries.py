@@ -1,9 +1,12 @@
 """functions that gets the primary keys of tables from the database"""
 
 from datetime import datetime
+from typing import NamedTuple
 import discord
 from discord.ext import commands
+import psycopg2
 from psycopg2.extensions import connection
+from .reference_data import ReferenceData
 
 class DatabaseMapper:
     """This defines the functions that get the mappings from the database"""
@@ -76,82 +79,35 @@ class DatabaseMapper:
 
 
     @classmethod
-    def get_element_map(cls, conn: connection) -> dict[str: int]:
-        """gets a dictionary of {element_name: element_id}"""
-        with conn.cursor() as cursor:
-            cursor.execute("""SELECT element_name, element_id
-                        FROM element""")
-            return {row['element_name']: row['element_id'] for row in cursor.fetchall()}
-
-
-    @classmethod
-    def get_spell_status_map(cls, conn: connection) -> dict[str: int]:
-        """Gets a dictionary of {spell_status_name: spell_status_id}"""
-        with conn.cursor() as cursor:
-            cursor.execute("""SELECT status_name, spell_status_id
-                        FROM spell_status""")
-            return {row['status_name']: row['spell_status_id'] for row in cursor.fetchall()}
-
-
-    @classmethod
-    def get_spell_type_map(cls, conn: connection) -> dict[str: int]:
-        """Gets a dictionary of spell types {spell_type_id: spell_type_name}"""
-        with conn.cursor() as cursor:
-            cursor.execute("""SELECT spell_type_id, spell_type_name
-                        FROM spell_type""")
-            return {row['spell_type_id']: row['spell_type_name'] for row in cursor.fetchall()}
-
-
-    @classmethod
-    def get_last_event(cls, conn: connection, player_name: str, event_name: str) -> datetime:
-        """Gets the last time the selected character performed a specific event"""
-        print('getting last event')
+    def get_last_event(cls, conn: connection, character_id: int, event_name: str) -> datetime:
+        """Gets the last time the character performed a specific event"""
         with conn.cursor() as cursor:
             query = """
-                    SELECT c.character_name, ce.event_timestamp, et.event_name
-                    FROM character_event AS ce
-                    JOIN event_type AS et ON ce.event_type_id = et.event_type_id
-                    JOIN character AS c ON ce.character_id = c.character_id
-                    JOIN player AS p ON c.player_id = p.player_id
-                    WHERE c.character_id = (
-                        SELECT c.character_id
-                        FROM "character" c
-                        JOIN player p ON c.player_id = p.player_id
-                        WHERE p.player_name = %s
-                        AND c.selected_character = TRUE
-                    )
-                    AND et.event_name = %s
-                    ORDER BY ce.event_timestamp DESC
-                    LIMIT 1;
+                    SELECT last_timestamp
+                    FROM character_cooldown
+                    WHERE character_id = %s
+                    AND event_type_id = %s;
                     """
-            cursor.execute(query, (player_name, event_name))
+            cursor.execute(query, (character_id, ReferenceData.event_types.id(event_name)))
             result = cursor.fetchone()
-            print(result)
-            return result['event_timestamp'] if result else None
+            return result['last_timestamp'] if result else None
 
 
     @classmethod
-    def get_craft_skill(cls, conn: connection, player_name: str) -> dict[str: int]:
+    def get_craft_skill(cls, conn: connection, character_id: int) -> dict[str: int]:
         """Gets a character id and their craft skill"""
         with conn.cursor() as cursor:
-            # Get the player's selected character's craft skill
             query = """
                     SELECT c.character_id, c.craft_skill
                     FROM "character" c
-                    JOIN player p ON c.player_id = p.player_id
-                    WHERE p.player_name = %s
-                    AND c.selected_character = TRUE;
+                    WHERE c.character_id = %s;
                     """
-            cursor.execute(query, (player_name,))
-            result = cursor.fetchone()
-
-            if not result:
-                return f"{player_name}, you need to select a character first!"
-            return result
+            cursor.execute(query, (character_id,))
+            return cursor.fetchone()
 
 
     @classmethod
-    def get_equipped_spells(cls, conn: connection, ctx: commands.Context) -> list[dict]:
+    def get_equipped_spells(cls, conn: connection, character_id: int) -> list[dict]:
         """Checks the last equipped spells"""
         query = """
                 SELECT 
@@ -165,20 +121,17 @@ class DatabaseMapper:
                     ss.status_name,
                     sa.chance,
                     sa.duration
-                FROM character c
-                JOIN player p ON c.player_id = p.player_id
-                JOIN character_spell_assignment csa ON c.character_id = csa.character_id
+                FROM character_spell_assignment csa
                 JOIN spells s ON csa.spell_id = s.spell_id
                 JOIN element e ON s.element_id = e.element_id
                 LEFT JOIN spell_status_spell_assignment sa ON s.spell_id = sa.spell_id
                 LEFT JOIN spell_status ss ON sa.spell_status_id = ss.spell_status_id
-                WHERE p.player_name = %s
-                AND c.selected_character = TRUE
+                WHERE csa.character_id = %s
                 ORDER BY csa.time_added DESC
                 LIMIT 4;
                 """
         with conn.cursor() as cursor:
-            cursor.execute(query, (ctx.author.name,))
+            cursor.execute(query, (character_id,))
             return cursor.fetchall()
 
     @classmethod
@@ -211,16 +164,14 @@ class DatabaseMapper:
 
 
     @classmethod
-    def get_potential_player_spells(cls, conn: connection, ctx: commands.Context) -> list[dict]:
+    def get_potential_player_spells(cls, conn: connection, character_id: int) -> list[dict]:
         """Returns a dictionary of player spells"""
         with conn.cursor() as cursor:
             query = """
                 WITH selected_character AS (
                     SELECT c.character_id, c.race_id, c.class_id
                     FROM character c
-                    JOIN player p ON c.player_id = p.player_id
-                    WHERE p.player_name = %s
-                    AND c.selected_character = TRUE
+                    WHERE c.character_id = %s
                 )
                 SELECT
                     s.spell_id,
@@ -242,7 +193,7 @@ class DatabaseMapper:
                 ORDER BY s.spell_id;
 
             """
-            cursor.execute(query, (ctx.author.name,))
+            cursor.execute(query, (character_id,))
             return cursor.fetchall()
 
 
@@ -271,6 +222,26 @@ class DatabaseIDFetch:
             return character_id
 
 
+    @classmethod
+    def get_selected_character_identity(cls,
+                                        conn: connection,
+                                        player_name: str,
+                                        server_id: int) -> dict | None:
+        """Fetches the player_id, character_id and inventory_id of the selected character"""
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                SELECT p.player_id, c.character_id, i.inventory_id
+                FROM player p
+                JOIN "character" c ON c.player_id = p.player_id
+                LEFT JOIN inventory i ON i.character_id = c.character_id
+                WHERE p.player_name = %s
+                AND p.server_id = %s
+                AND c.selected_character = TRUE
+                LIMIT 1;
+                """, (player_name, server_id))
+            return cursor.fetchone()
+
+
     @classmethod
     def get_player_id(cls, conn: connection, player_name: str, server_id: int):
         """Fetches the player_id based on player_name and server_id."""
@@ -311,6 +282,41 @@ class DatabaseIDFetch:
             return inventory.get('inventory_id') if inventory else None
 
 
+MARKETPLACE_PAGE_SIZE = 5
+
+# sort: (column, direction), every sort breaks ties on item_id the same direction
+MARKETPLACE_SORTS = {
+    'newest': ('i.listed_at', 'DESC'),
+    'cheapest': ('i.listed_value', 'ASC'),
+    'priciest': ('i.listed_value', 'DESC'),
+}
+
+MARKETPLACE_FILTERS = {
+    'all': '',
+    'enchanted': 'AND i.spell_id IS NOT NULL',
+    'plain': 'AND i.spell_id IS NULL',
+}
+
+
+class PurchaseResult(NamedTuple):
+    """The outcome of buying an item from the marketplace"""
+    status: str
+    seller_character_id: int | None
+    buyer_shards: int | None
+
+    SUCCESS = 'success'
+    ALREADY_SOLD = 'already_sold'
+    OWN_ITEM = 'own_item'
+    PRICE_CHANGED = 'price_changed'
+    NO_INVENTORY = 'no_inventory'
+    INSUFFICIENT_FUNDS = 'insufficient_funds'
+    ERROR = 'error'
+
+    @property
+    def success(self) -> bool:
+        return self.status == self.SUCCESS
+
+
 class InventoryDatabase:
     """Handles inventory-related database operations"""
 
@@ -379,13 +385,7 @@ class InventoryDatabase:
                 cursor.execute(
                     "UPDATE character SET shards = shards + %s WHERE character_id = %s", (item_value, character_id))
 
-                cursor.execute(
-                    "SELECT event_type_id FROM event_type WHERE event_name = 'Sell';"
-                )
-
-                result = cursor.fetchone()
-                event_type_id = result.get('event_type_id')
-                print(event_type_id)
+                event_type_id = ReferenceData.event_types.id('Sell')
                 
                 # Add buying event to Database
 
@@ -403,104 +403,24 @@ class InventoryDatabase:
             return False
     
     @classmethod
-    def buy_item(cls, conn: connection, item_id: int, seller_name: str, buyer_name: str, value: int) -> bool:
+    def buy_item(cls, conn: connection, item_id: int, buyer_character_id: int, price: int) -> PurchaseResult:
         """
-        Checks if the buyer has enough shards to buy the item.
-        Transfers the item from the seller's inventory to the buyer's inventory.
-        Deducts the amount from the buyer and adds it to the seller's shards.
+        Buys a listed item at the price the buyer was shown with the purchase_item
+        database function, which locks the item and both characters, moves the item,
+        transfers the shards and logs the Buy and Sell events in one round trip.
         """
         try:
             with conn.cursor() as cursor:
-                # Get buyer character_id
-                cursor.execute("""
-                    SELECT c.character_id 
-                    FROM character AS c
-                    JOIN player AS p ON p.player_id = c.player_id
-                    WHERE p.player_name = %s AND c.selected_character = TRUE
-                """, (buyer_name,))
-                buyer_character_id = cursor.fetchone()
-
-                if not buyer_character_id:
-                    return False
-
-                buyer_character_id = buyer_character_id.get('character_id')
-
-                # Get seller character_id
-                cursor.execute("""
-                    SELECT c.character_id 
-                    FROM character AS c
-                    JOIN player AS p ON p.player_id = c.player_id
-                    WHERE p.player_name = %s AND c.selected_character = TRUE
-                """, (seller_name,))
-                seller_character_id = cursor.fetchone()
-
-                if not seller_character_id:
-                    return False  # Seller does not have a selected character
-
-                seller_character_id = seller_character_id.get('character_id')
-
-                # Check if buyer has enough shards
-                cursor.execute(
-                    "SELECT shards FROM character WHERE character_id = %s", (buyer_character_id,))
-                buyer_shards = cursor.fetchone()
-
-                if not buyer_shards or buyer_shards.get('shards') < value:
-                    return False  # Buyer does not have enough shards
-
-                # Transfer the item to the buyer's inventory
-                cursor.execute("""
-                    UPDATE "item"
-                    SET inventory_id = (
-                        SELECT i.inventory_id
-                        FROM inventory AS i
-                        WHERE i.character_id = %s
-                        LIMIT 1
-                    ), is_selling = FALSE, listed_value = NULL
-                    WHERE item_id = %s
-                """, (buyer_character_id, item_id))
-
-                # Deduct shards from buyer
-                cursor.execute("""UPDATE character SET shards = shards - %s WHERE character_id = %s""",
-                            (value, buyer_character_id))
-
-                # Add shards to seller
-                cursor.execute("""UPDATE character SET shards = shards + %s WHERE character_id = %s""",
-                            (value, seller_character_id))
-                
-                # Retrieve event_type_id for "Buy"
-                cursor.execute(
-                    "SELECT event_type_id FROM event_type WHERE event_name = 'Buy';")
-                buy_event = cursor.fetchone()
-                buy_event_id = buy_event.get('event_type_id') if buy_event else None
-
-                # Retrieve event_type_id for "Sell"
-                cursor.execute(
-                    "SELECT event_type_id FROM event_type WHERE event_name = 'Sell';")
-                sell_event = cursor.fetchone()
-                sell_event_id = sell_event.get('event_type_id') if sell_event else None
-                
-                # Log event for buyer (Buy event)
-                cursor.execute("""
-                    INSERT INTO character_event (character_id, item_id, event_type_id)
-                    VALUES (%s, %s, %s);
-                """, (buyer_character_id, item_id, buy_event_id))
-
-                # Log event for seller (Sell event)
-                cursor.execute("""
-                    INSERT INTO character_event (character_id, item_id, event_type_id)
-                    VALUES (%s, %s, %s);
-                """, (seller_character_id, item_id, sell_event_id))
-
-                # Commit transaction
-                conn.commit()
-                return True
+                cursor.execute("SELECT * FROM purchase_item(%s, %s, %s)",
+                               (item_id, buyer_character_id, price))
+                result = PurchaseResult(**cursor.fetchone())
+            conn.commit()
+            return result
 
-        except Exception as e:
+        except psycopg2.Error as e:
             conn.rollback()
             print(f"Error processing item purchase: {e}")
-            return False
-
-
+            return PurchaseResult(PurchaseResult.ERROR, None, None)
 
     @classmethod
     def set_sellable_item(cls, conn: connection, item_id: int, value: int) -> bool:
@@ -510,7 +430,7 @@ class InventoryDatabase:
                 # Update the is_selling status to True and set the listed_value
                 cursor.execute("""
                     UPDATE "item"
-                    SET "is_selling" = TRUE, "listed_value" = %s
+                    SET "is_selling" = TRUE, "listed_value" = %s, "listed_at" = NOW()
                     WHERE "item_id" = %s
                 """, (value, item_id))
 
@@ -527,22 +447,260 @@ class InventoryDatabase:
             return False
 
     @classmethod
-    def get_marketplace(cls, conn: connection) -> dict:
-        """Gets all items classified as being sold"""
+    def get_marketplace_page(cls,
+                             conn: connection,
+                             sort: str = 'newest',
+                             item_filter: str = 'all',
+                             after: tuple | None = None,
+                             limit: int = MARKETPLACE_PAGE_SIZE) -> tuple[list[dict], tuple | None]:
+        """
+        Gets one page of the items classified as being sold, and the cursor of
+        the next page or None on the last page. Pages are found with keyset
+        pagination: `after` is the (sort value, item_id) the previous page ended on.
+        """
+        column, direction = MARKETPLACE_SORTS[sort]
+        comparison = '<' if direction == 'DESC' else '>'
+        keyset = f"AND ({column}, i.item_id) {comparison} (%s, %s)" if after else ""
         with conn.cursor() as cursor:
-            cursor.execute("""
-                SELECT i.item_id, i.item_name, i.listed_value, 
-                    c.character_name, p.player_name, 
+            cursor.execute(f"""
+                SELECT i.item_id, i.item_name, i.listed_value, i.listed_at,
+                    c.character_name, p.player_name,
                     s.spell_name  -- Fetch spell name if enchanted
                 FROM item AS i
                 JOIN inventory AS inv ON i.inventory_id = inv.inventory_id
                 JOIN character AS c ON inv.character_id = c.character_id
                 JOIN player AS p ON c.player_id = p.player_id
                 LEFT JOIN spells AS s ON i.spell_id = s.spell_id
-                WHERE i.is_selling = TRUE;
-                """)
+                WHERE i.is_selling = TRUE
+                {MARKETPLACE_FILTERS[item_filter]}
+                {keyset}
+                ORDER BY {column} {direction}, i.item_id {direction}
+                LIMIT %s;
+                """, (*(after or ()), limit + 1))
+            items = cursor.fetchall()
+
+        if len(items) <= limit:
+            return items, None
+        items = items[:limit]
+        last = items[-1]
+        return items, (last[column.split('.')[1]], last['item_id'])
+
+
+
+class CombatDatabase:
+    """Loads the characters that join a battle and records the experience they earn"""
+
+    @classmethod
+    def get_combatants(cls, conn: connection, player_names: list[str], server_id: int) -> dict[str, dict]:
+        """Returns the selected character, its equipped spells and its enchanted items
+        of every player as {player_name: {'character': row, 'spells': rows, 'items': rows}}.
+        Players without a selected character are left out"""
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                SELECT DISTINCT ON (p.player_name)
+                        p.player_name,
+                        c.player_id,
+                        c.character_id,
+                        c.character_name,
+                        c.health,
+                        c.mana,
+                        c.craft_skill,
+                        c.shards,
+                        c.experience,
+                        c.image_url,
+                        r.race_name,
+                        cl.class_name,
+                        r.speed
+                FROM player AS p
+                JOIN character AS c ON c.player_id = p.player_id
+                JOIN race AS r ON c.race_id = r.race_id
+                JOIN class AS cl ON c.class_id = cl.class_id
+                WHERE p.player_name = ANY(%s)
+                AND p.server_id = %s
+                AND c.selected_character = TRUE
+                ORDER BY p.player_name, c.character_id;
+                """, (list(player_names), server_id))
+            characters = cursor.fetchall()
+            if not characters:
+                return {}
+
+            # Equipped spells and enchanted items in one go, at most 4 spells a character
+            cursor.execute("""
+                SELECT * FROM (
+                    SELECT
+                        'spell' AS source,
+                        csa.character_id,
+                        NULL AS item_name,
+                        NULL::INTEGER AS spell_charges,
+                        s.spell_id,
+                        s.spell_name,
+                        s.spell_description,
+                        s.spell_power,
+                        s.mana_cost,
+                        s.cooldown,
+                        e.element_name,
+                        sa.spell_status_id,
+                        ss.status_name,
+                        sa.chance,
+                        sa.duration,
+                        st.spell_type_name,
+                        ROW_NUMBER() OVER (PARTITION BY csa.character_id
+                                           ORDER BY sa.spell_status_spell_assignment_id DESC) AS position
+                    FROM character_spell_assignment csa
+                    JOIN spells s ON csa.spell_id = s.spell_id
+                    JOIN element e ON s.element_id = e.element_id
+                    LEFT JOIN spell_status_spell_assignment sa ON s.spell_id = sa.spell_id
+                    LEFT JOIN spell_status ss ON sa.spell_status_id = ss.spell_status_id
+                    JOIN spell_type st ON s.spell_type_id = st.spell_type_id
+                    WHERE csa.character_id = ANY(%(character_ids)s)
+                    UNION ALL
+                    SELECT
+                        'item',
+                        inv.character_id,
+                        i.item_name,
+                        i.spell_charges,
+                        s.spell_id,
+                        s.spell_name,
+                        s.spell_description,
+                        s.spell_power,
+                        s.mana_cost,
+                        s.cooldown,
+                        e.element_name,
+                        sa.spell_status_id,
+                        ss.status_name,
+                        sa.chance,
+                        sa.duration,
+                        st.spell_type_name,
+                        ROW_NUMBER() OVER (PARTITION BY inv.character_id ORDER BY i.item_name)
+                    FROM inventory inv
+                    JOIN item i ON inv.inventory_id = i.inventory_id
+                    JOIN spells s ON i.spell_id = s.spell_id
+                    JOIN element e ON s.element_id = e.element_id
+                    LEFT JOIN spell_status_spell_assignment sa ON s.spell_id = sa.spell_id
+                    LEFT JOIN spell_status ss ON sa.spell_status_id = ss.spell_status_id
+                    JOIN spell_type st ON s.spell_type_id = st.spell_type_id
+                    WHERE inv.character_id = ANY(%(character_ids)s)
+                ) AS loadout
+                WHERE source = 'item' OR position <= 4
+                ORDER BY character_id, source DESC, position;
+                """, {'character_ids': [character['character_id'] for character in characters]})
+            loadouts = cursor.fetchall()
+
+        combatants = {character['player_name']: {'character': character, 'spells': [], 'items': []}
+                      for character in characters}
+        by_character = {character['character_id']: combatants[character['player_name']]
+                        for character in characters}
+        for row in loadouts:
+            by_character[row['character_id']][f"{row['source']}s"].append(row)
+        return combatants
+
+    @classmethod
+    def get_spell_catalog(cls, conn: connection, server_id: int | None = None) -> list[dict]:
+        """Returns every spell with its element, type and latest status, optionally of one server"""
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                SELECT DISTINCT ON (s.spell_id)
+                    s.spell_id,
+                    s.spell_name,
+                    s.spell_power,
+                    s.mana_cost,
+                    s.cooldown,
+                    e.element_name,
+                    ss.status_name,
+                    sa.chance,
+                    sa.duration,
+                    st.spell_type_name
+                FROM spells s
+                JOIN element e ON s.element_id = e.element_id
+                LEFT JOIN spell_status_spell_assignment sa ON s.spell_id = sa.spell_id
+                LEFT JOIN spell_status ss ON sa.spell_status_id = ss.spell_status_id
+                JOIN spell_type st ON s.spell_type_id = st.spell_type_id
+                WHERE %(server_id)s::BIGINT IS NULL OR s.server_id = %(server_id)s
+                ORDER BY s.spell_id, sa.spell_status_spell_assignment_id DESC;
+                """, {'server_id': server_id})
             return cursor.fetchall()
 
+    @classmethod
+    def add_experience(cls, conn: connection, character_id: int, experience: float) -> int:
+        """Adds experience to the character and returns their new total"""
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                        UPDATE "character"
+                        SET experience = experience + %s
+                        WHERE character_id = %s
+                        RETURNING experience;
+                           """, (experience, character_id))
+            new_experience = cursor.fetchone().get('experience')
+        conn.commit()
+        return new_experience
+
+    @classmethod
+    def add_experience_many(cls, conn: connection, experience: dict[int, float]) -> dict[int, int]:
+        """Adds experience to every character in one query, `experience` is by
+        character_id, and returns their new totals by character_id"""
+        if not experience:
+            return {}
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                        UPDATE "character" AS c
+                        SET experience = c.experience + gained.experience
+                        FROM unnest(%s::int[], %s::float8[]) AS gained(character_id, experience)
+                        WHERE c.character_id = gained.character_id
+                        RETURNING c.character_id, c.experience;
+                           """, (list(experience), list(experience.values())))
+            totals = {row['character_id']: row['experience'] for row in cursor.fetchall()}
+        conn.commit()
+        return totals
+
+    @classmethod
+    def save_snapshot(cls, conn: connection, battle_id: int, version: int, state: bytes):
+        """Stores the latest snapshot of a battle, replacing the one before"""
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                INSERT INTO battle_snapshot (battle_id, version, state, saved_at)
+                VALUES (%s, %s, %s, NOW())
+                ON CONFLICT (battle_id) DO UPDATE
+                SET version = EXCLUDED.version, state = EXCLUDED.state, saved_at = EXCLUDED.saved_at;
+                """, (battle_id, version, psycopg2.Binary(state)))
+        conn.commit()
+
+    @classmethod
+    def delete_snapshot(cls, conn: connection, battle_id: int):
+        """Deletes the snapshot of a battle that is over"""
+        with conn.cursor() as cursor:
+            cursor.execute("DELETE FROM battle_snapshot WHERE battle_id = %s;", (battle_id,))
+        conn.commit()
+
+    @classmethod
+    def get_snapshots(cls, conn: connection) -> list[dict]:
+        """Returns the snapshot of every battle in progress, `state` as bytes"""
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT battle_id, version, state FROM battle_snapshot ORDER BY saved_at;")
+            rows = cursor.fetchall()
+        conn.rollback()
+        return [{**row, 'state': bytes(row['state'])} for row in rows]
+
+    @classmethod
+    def save_replay(cls, conn: connection, battle_id: int, turns: int, winner_id: int | None, data: bytes) -> int:
+        """Stores the replay of a finished battle, returns its replay_id"""
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                INSERT INTO battle_replay (battle_id, turns, winner_id, data)
+                VALUES (%s, %s, %s, %s)
+                RETURNING replay_id;
+                """, (battle_id, turns, winner_id, psycopg2.Binary(data)))
+            replay_id = cursor.fetchone()['replay_id']
+        conn.commit()
+        return replay_id
+
+    @classmethod
+    def get_replay(cls, conn: connection, replay_id: int) -> bytes | None:
+        """Returns the packed replay, None if there is no such replay"""
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT data FROM battle_replay WHERE replay_id = %s;", (replay_id,))
+            row = cursor.fetchone()
+        conn.rollback()
+        return bytes(row['data']) if row else None
 
 
 class EmbedHelper:
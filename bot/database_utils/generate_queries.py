@@ -5,7 +5,8 @@ import discord
 from discord.ext import commands
 from psycopg2.extensions import connection
 import psycopg2
-from .fetch_queries import DatabaseIDFetch
+from .character_cache import SelectedCharacterCache
+from .reference_data import ReferenceData
 
 class DataInserter:
     """
@@ -120,42 +121,34 @@ class DataInserter:
 
 
     @classmethod
-    def generate_events_for_character(cls, conn: connection, player_name: str):
+    def generate_events_for_character(cls, conn: connection, character_id: int):
         """
-        Generates all events for the selected character of the given player
-        and sets them to the current time.
-        
+        Starts every cooldown of an existing character at the current time
+        and logs an event for each event type, in one INSERT ... SELECT.
         """
         with conn.cursor() as cursor:
-            # Get the character_id of the selected character for the given player
-            character_id = DatabaseIDFetch.fetch_selected_character_id(conn, player_name)
-
-            # Retrieve all event_type_id from the event_type table
             cursor.execute("""
-                SELECT event_type_id
-                FROM "event_type";
-                """)
-            event_types = cursor.fetchall()
-
-            # Insert an event for each event type with the current timestamp
-            for event in event_types:
-                event_type_id = event['event_type_id']
-                cursor.execute("""
-                    INSERT INTO "character_event" (character_id, event_type_id, event_timestamp)
-                    VALUES (%s, %s, NOW());
-                    """, (character_id, event_type_id))
-
+                WITH cooldowns AS (
+                    INSERT INTO "character_cooldown" (character_id, event_type_id, last_timestamp)
+                    SELECT %s, event_type_id, %s FROM "event_type"
+                    ON CONFLICT (character_id, event_type_id)
+                    DO UPDATE SET last_timestamp = EXCLUDED.last_timestamp
+                    RETURNING character_id, event_type_id, last_timestamp
+                )
+                INSERT INTO "character_event" (character_id, event_type_id, event_timestamp)
+                SELECT character_id, event_type_id, last_timestamp FROM cooldowns;
+                """, (character_id, datetime.now()))
             conn.commit()
 
     @classmethod
-    def generate_inventory_for_character(cls, conn: connection, player_name: str):
-        """generates a inventory for the players selected character"""
-        character_id = DatabaseIDFetch.fetch_selected_character_id(conn, player_name)
+    def generate_inventory_for_character(cls, conn: connection, character_id: int):
+        """generates a inventory for an existing character"""
         with conn.cursor() as cursor:
             query = """INSERT INTO inventory (inventory_name, character_id)
                         VALUES (%s, %s)"""
             cursor.execute(query, ('initial_inventory', character_id))
             conn.commit()
+        SelectedCharacterCache.invalidate_character(character_id)
 
 
     @classmethod
@@ -228,57 +221,71 @@ class DataInserter:
     @classmethod
     def generate_character(cls,
                            conn: connection,
-                           ctx: commands.Context,
+                           server_id: int,
+                           player_id: int,
                            character_name: str,
                            race_id: int,
                            class_id: int,
-                           player_id: int,
-                           faction_id=None) -> str:
-        """Generates a new character"""
-
+                           faction_id: int = None) -> int:
+        """
+        Generates and selects a new character together with its inventory
+        and cooldowns in one round trip and one commit, returns its character_id
+        """
         with conn.cursor() as cursor:
-            # Deselect previous character for this player
             cursor.execute(
-                """UPDATE character
+                """
+                -- Deselect previous character for this player
+                UPDATE "character"
                 SET selected_character = False
-                WHERE player_id = %s AND server_id = %s""",
-                (player_id, ctx.guild.id)
-            )
-
-            # Insert new character with defaults
-            cursor.execute(
-                """INSERT INTO character (character_name,
-                                        race_id,
-                                        class_id,
-                                        player_id,
-                                        faction_id,
-                                        server_id)
-                VALUES (%s, %s, %s, %s, %s, %s)""",
-                (character_name, race_id, class_id,
-                player_id, faction_id, ctx.guild.id)
+                WHERE player_id = %(player_id)s AND server_id = %(server_id)s;
+
+                WITH new_character AS (
+                    INSERT INTO "character" (character_name, race_id, class_id,
+                                             player_id, faction_id, server_id)
+                    VALUES (%(character_name)s, %(race_id)s, %(class_id)s,
+                            %(player_id)s, %(faction_id)s, %(server_id)s)
+                    RETURNING character_id
+                ),
+                inventory AS (
+                    INSERT INTO inventory (inventory_name, character_id)
+                    SELECT 'initial_inventory', character_id FROM new_character
+                ),
+                cooldowns AS (
+                    INSERT INTO "character_cooldown" (character_id, event_type_id, last_timestamp)
+                    SELECT nc.character_id, et.event_type_id, %(now)s
+                    FROM new_character AS nc
+                    CROSS JOIN "event_type" AS et
+                    RETURNING character_id, event_type_id, last_timestamp
+                ),
+                events AS (
+                    INSERT INTO "character_event" (character_id, event_type_id, event_timestamp)
+                    SELECT character_id, event_type_id, last_timestamp FROM cooldowns
+                )
+                SELECT character_id FROM new_character;
+                """,
+                {'player_id': player_id, 'server_id': server_id, 'character_name': character_name,
+                 'race_id': race_id, 'class_id': class_id, 'faction_id': faction_id,
+                 'now': datetime.now()}
             )
-
+            character_id = cursor.fetchone()['character_id']
             conn.commit()
-            return f'{character_name} has been made and selected.'
+        SelectedCharacterCache.invalidate_player(player_id)
+        return character_id
 
 
     @classmethod
     def add_spell_to_character(cls,
                                conn: connection,
-                               ctx: commands.Context,
+                               character_id: int,
                                selected_spell_id: int):
         """Adds a spell to a characters assigned spells"""
         # Add spell to character
         with conn.cursor() as cursor:
             query = """
                         INSERT INTO character_spell_assignment (character_id, spell_id)
-                        SELECT character_id, %s
-                        FROM character
-                        JOIN player ON character.player_id = player.player_id
-                        WHERE player.player_name = %s
-                        AND character.selected_character = TRUE;
+                        VALUES (%s, %s);
                     """
-            cursor.execute(query, (selected_spell_id, ctx.author.name))
+            cursor.execute(query, (character_id, selected_spell_id))
             conn.commit()
 
 
@@ -302,62 +309,54 @@ class DataInserter:
             return cursor.fetchone().get('item_id')
 
 
+    @classmethod
+    def _set_cooldown(cls, cursor, character_id: int, event_type_id: int, timestamp: datetime):
+        """Upserts the cooldown and appends to the event log in one statement"""
+        cursor.execute("""
+            WITH cooldown AS (
+                INSERT INTO "character_cooldown" (character_id, event_type_id, last_timestamp)
+                VALUES (%s, %s, %s)
+                ON CONFLICT (character_id, event_type_id)
+                DO UPDATE SET last_timestamp = EXCLUDED.last_timestamp
+                RETURNING character_id, event_type_id, last_timestamp
+            )
+            INSERT INTO "character_event" (character_id, event_type_id, event_timestamp)
+            SELECT character_id, event_type_id, last_timestamp FROM cooldown;
+            """, (character_id, event_type_id, timestamp))
+
     @classmethod
     def update_last_event(cls,
                           conn: connection,
-                          player_name: str,
+                          character_id: int,
                           event_name: str,
                           timestamp: datetime):
-        """Inserts a new event for the selected character"""
+        """Sets the character's cooldown for the event and logs the event"""
         with conn.cursor() as cursor:
-            # Get the character_id for the selected character
-            cursor.execute("""
-                SELECT c.character_id
-                FROM "character" c
-                JOIN "player" p ON c.player_id = p.player_id
-                WHERE p.player_name = %s
-                AND c.selected_character = TRUE;
-                """, (player_name,))
-            character_id = cursor.fetchone()['character_id']
-
-            # Get the event_type_id for the given event_name
-            cursor.execute("""
-                SELECT event_type_id
-                FROM "event_type"
-                WHERE event_name = %s;
-                """, (event_name,))
-            event_type_id = cursor.fetchone()['event_type_id']
-
-            # Insert the new event
-            cursor.execute("""
-                INSERT INTO "character_event" (character_id, event_type_id, event_timestamp)
-                VALUES (%s, %s, %s);
-                """, (character_id, event_type_id, timestamp))
+            event_type_id = ReferenceData.event_types.id(event_name)
 
+            cls._set_cooldown(cursor, character_id, event_type_id, timestamp)
             conn.commit()
 
 
     @classmethod
-    def increase_wallet(cls, conn: connection, player_name: str, profit: int) -> str:
-        """Increases the amount in the selected character's wallet"""
+    def increase_wallet(cls,
+                        conn: connection,
+                        character_id: int,
+                        player_name: str,
+                        profit: int) -> str:
+        """Increases the amount in the character's wallet"""
         with conn.cursor() as cursor:
             query = """
-                    WITH selected_character AS (
-                        SELECT c.character_id
-                        FROM "character" c
-                        JOIN player p ON c.player_id = p.player_id
-                        WHERE p.player_name = %s
-                        AND c.selected_character = TRUE
-                    )
                     UPDATE "character"
                     SET shards = shards + %s
-                    WHERE character_id IN (SELECT character_id FROM selected_character)
+                    WHERE character_id = %s
                     RETURNING shards;
                     """
-            cursor.execute(query, (player_name, profit))
-            new_shards = cursor.fetchone().get('shards')
+            cursor.execute(query, (profit, character_id))
+            result = cursor.fetchone()
 
-            if new_shards:
+            if result:
+                new_shards = result.get('shards')
                 conn.commit()
                 return f"""{player_name.title()} has received **{profit}** shards!
     You now have **{new_shards}** in your wallet."""
@@ -365,16 +364,8 @@ class DataInserter:
 
 
     @classmethod
-    def add_character_image(cls, conn, player_name: str, image_url: str) -> str:
-        """Adds a character image to the selected player character"""
-
-        query_select = """
-                SELECT c.character_id
-                FROM "character" c
-                JOIN player p ON c.player_id = p.player_id
-                WHERE p.player_name = %s
-                AND c.selected_character = TRUE
-        """
+    def add_character_image(cls, conn, character_id: int, player_name: str, image_url: str) -> str:
+        """Adds a character image to the player's character"""
 
         query_update = """
             UPDATE "character"
@@ -384,15 +375,6 @@ class DataInserter:
 
         try:
             with conn.cursor() as cursor:
-                # Get the character_id of the selected character
-                cursor.execute(query_select, (player_name,))
-                result = cursor.fetchone()
-
-                if result is None:
-                    return f"No selected character found for player '{player_name}'."
-
-                character_id = result.get('character_id')
-
                 # Update the character's image URL
                 cursor.execute(query_update, (image_url, character_id))
                 conn.commit()
@@ -427,6 +409,7 @@ class DataInserter:
                 return False
             
             conn.commit()
+            SelectedCharacterCache.invalidate_player(player_id)
             return True
 
 
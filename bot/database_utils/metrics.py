@@ -0,0 +1,57 @@
+"""Runtime metrics for spotting work that blocks the event loop"""
+import asyncio
+from collections import deque
+
+
+class EventLoopLagMonitor:
+    """Measures how late the event loop wakes up from a fixed sleep.
+
+    Anything that runs synchronously on the loop (like a psycopg2 query
+    inside a command) delays every wake up by as long as it runs, so the
+    lag is a direct measure of how long commands and the heartbeat stall."""
+
+    def __init__(self, interval: float = 0.1, window: int = 600):
+        self.interval = interval
+        self.samples = deque(maxlen=window)
+        self._task = None
+
+    def start(self):
+        """Starts sampling in the background on the running loop"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._sample())
+
+    async def stop(self):
+        """Stops sampling"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _sample(self):
+        """Records how much longer than `interval` each sleep took"""
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, loop.time() - start - self.interval))
+
+    def percentile(self, percent: float) -> float:
+        """Returns the lag in seconds that `percent`% of samples are below"""
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, int(len(ordered) * percent / 100))
+        return ordered[index]
+
+    def summary(self) -> dict[str, float]:
+        """Returns the current lag figures in milliseconds"""
+        return {
+            'samples': len(self.samples),
+            'last_ms': (self.samples[-1] if self.samples else 0.0) * 1000,
+            'p50_ms': self.percentile(50) * 1000,
+            'p99_ms': self.percentile(99) * 1000,
+            'max_ms': max(self.samples, default=0.0) * 1000,
+        }
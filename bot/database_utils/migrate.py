@@ -0,0 +1,47 @@
+"""Applies the pending schema migrations in database/migrations
+
+    python -m bot.database_utils.migrate
+    python -m bot.database_utils.migrate --dry-run
+    python -m bot.database_utils.migrate --dsn "dbname=phoenix host=localhost" --target 1
+"""
+import argparse
+from pathlib import Path
+import psycopg2
+from psycopg2.extras import RealDictCursor
+
+from .connection import DatabaseConnection
+from .migrations import MIGRATIONS_DIR, MigrationError, MigrationRunner
+
+
+def main():
+    """Migrates the database from the .env, or --dsn"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dsn", default=None,
+                        help="defaults to the HOSTED_DB_* settings in the .env")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="print the pending migrations without applying them")
+    parser.add_argument("--target", type=int, default=None,
+                        help="stop after this version")
+    parser.add_argument("--directory", type=Path, default=MIGRATIONS_DIR)
+    args = parser.parse_args()
+
+    if args.dsn:
+        conn = psycopg2.connect(args.dsn, cursor_factory=RealDictCursor)
+    else:
+        conn = DatabaseConnection.connect()
+    try:
+        migrations = MigrationRunner(conn, args.directory).run(args.dry_run, args.target)
+    except MigrationError as e:
+        print(e)
+        raise SystemExit(1) from e
+    finally:
+        conn.close()
+
+    if not migrations:
+        print("The database is up to date")
+    elif not args.dry_run:
+        print(f"Applied {len(migrations)} migration(s)")
+
+
+if __name__ == "__main__":
+    main()
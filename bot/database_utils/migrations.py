@@ -0,0 +1,228 @@
+"""Forward only schema migrations, tracked in the schema_version table"""
+import hashlib
+import re
+import textwrap
+import time
+from pathlib import Path
+from typing import NamedTuple
+import psycopg2
+from psycopg2.extensions import connection
+
+MIGRATIONS_DIR = Path(__file__).resolve().parents[2] / "database" / "migrations"
+
+# Held while migrating so two deploys can't apply the same migration at once
+ADVISORY_LOCK_ID = 720_406_001
+
+_FILE_NAME = re.compile(r"^(\d+)_(\w+)\.sql$")
+_TOKEN = re.compile(r"""
+      (?P<comment>--[^\n]*|/\*.*?\*/)
+    | (?P<quoted>'(?:[^']|'')*'|"(?:[^"]|"")*")
+    | (?P<dollar>\$(?P<tag>(?:[A-Za-z_]\w*)?)\$.*?\$(?P=tag)\$)
+    | (?P<end>;)
+""", re.VERBOSE | re.DOTALL)
+_CONCURRENT_INDEX = re.compile(
+    r'CREATE\s+(?:UNIQUE\s+)?INDEX\s+CONCURRENTLY\s+(?:IF\s+NOT\s+EXISTS\s+)?"?(\w+)"?',
+    re.IGNORECASE)
+
+
+class MigrationError(Exception):
+    """Raised when the migrations can't be applied as they are"""
+
+
+def split_statements(sql: str) -> list[str]:
+    """Splits a script into statements on the semicolons outside of
+    strings, quoted identifiers and dollar quoted bodies, dropping comments"""
+    statements, current, position = [], [], 0
+    for match in _TOKEN.finditer(sql):
+        current.append(sql[position:match.start()])
+        position = match.end()
+        if match.group('end'):
+            statements.append(''.join(current))
+            current = []
+        elif match.group('comment'):
+            current.append(' ')
+        else:
+            current.append(match.group())
+    current.append(sql[position:])
+    statements.append(''.join(current))
+    return [statement.strip() for statement in statements if statement.strip()]
+
+
+class Migration(NamedTuple):
+    """One `<version>_<name>.sql` file in the migrations directory"""
+    version: int
+    name: str
+    sql: str
+
+    @classmethod
+    def from_file(cls, path: Path) -> 'Migration':
+        """Reads a migration file, raises MigrationError if it is badly named"""
+        match = _FILE_NAME.match(path.name)
+        if not match:
+            raise MigrationError(
+                f"{path.name} is not a migration, name it <version>_<name>.sql")
+        return cls(int(match.group(1)), match.group(2), path.read_text())
+
+    @property
+    def label(self) -> str:
+        return f"{self.version:04d}_{self.name}"
+
+    @property
+    def checksum(self) -> str:
+        return hashlib.sha256(self.sql.encode()).hexdigest()
+
+    @property
+    def statements(self) -> list[str]:
+        return split_statements(self.sql)
+
+    @property
+    def transactional(self) -> bool:
+        """False when a statement can't run inside a transaction block"""
+        return not any(re.search(r'\bCONCURRENTLY\b', statement, re.IGNORECASE)
+                       for statement in self.statements)
+
+
+class MigrationRunner:
+    """Applies the pending migrations in version order.
+
+    A migration and its schema_version row are committed in one
+    transaction, so a failure leaves nothing behind. Migrations that use
+    CONCURRENTLY can't run in a transaction: each statement is committed
+    on its own and the version is recorded after the last one. Write them
+    with IF NOT EXISTS so a failed run can be retried; indexes left
+    invalid by a failed concurrent build are dropped before the retry."""
+
+    def __init__(self, conn: connection, directory: Path = MIGRATIONS_DIR):
+        self.conn = conn
+        self.directory = Path(directory)
+
+    def discover(self) -> list[Migration]:
+        """Returns every migration in the directory, ordered by version"""
+        migrations = sorted((Migration.from_file(path) for path in self.directory.glob('*.sql')),
+                            key=lambda migration: migration.version)
+        for previous, migration in zip(migrations, migrations[1:]):
+            if previous.version == migration.version:
+                raise MigrationError(
+                    f"{previous.label} and {migration.label} have the same version")
+        return migrations
+
+    def applied(self) -> dict[int, str]:
+        """Returns the checksum of each applied version, empty before the first run"""
+        with self.conn.cursor() as cursor:
+            cursor.execute("SELECT to_regclass('schema_version') IS NOT NULL AS exists")
+            if not cursor.fetchone()['exists']:
+                return {}
+            cursor.execute("SELECT version, checksum FROM schema_version")
+            return {row['version']: row['checksum'] for row in cursor.fetchall()}
+
+    def pending(self, target: int | None = None) -> list[Migration]:
+        """Returns the migrations that still have to run, up to and including target"""
+        applied = self.applied()
+        pending = []
+        for migration in self.discover():
+            if migration.version in applied:
+                if applied[migration.version] != migration.checksum:
+                    raise MigrationError(
+                        f"{migration.label} was changed after it was applied, "
+                        "add a new migration instead")
+            elif target is None or migration.version <= target:
+                pending.append(migration)
+        return pending
+
+    def run(self, dry_run: bool = False, target: int | None = None) -> list[Migration]:
+        """Applies the pending migrations and returns them.
+        A dry run only prints what would be applied and changes nothing"""
+        self.conn.rollback()
+        autocommit = self.conn.autocommit
+        self.conn.autocommit = True
+        try:
+            if dry_run:
+                pending = self.pending(target)
+                for migration in pending:
+                    mode = "in a transaction" if migration.transactional else "statement by statement"
+                    print(f"Would apply {migration.label} {mode}:")
+                    for statement in migration.statements:
+                        print(textwrap.indent(f"{statement};", "    "))
+                return pending
+
+            with self.conn.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_lock(%s)", (ADVISORY_LOCK_ID,))
+            try:
+                self._create_version_table()
+                # Checked after taking the lock in case another deploy just migrated
+                pending = self.pending(target)
+                for migration in pending:
+                    self._apply(migration)
+                return pending
+            finally:
+                with self.conn.cursor() as cursor:
+                    cursor.execute("SELECT pg_advisory_unlock(%s)", (ADVISORY_LOCK_ID,))
+        finally:
+            self.conn.autocommit = autocommit
+
+    def _create_version_table(self):
+        with self.conn.cursor() as cursor:
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS schema_version (
+                    version INTEGER PRIMARY KEY,
+                    name VARCHAR(100) NOT NULL,
+                    checksum CHAR(64) NOT NULL,
+                    applied_at TIMESTAMP NOT NULL DEFAULT NOW()
+                )""")
+
+    def _apply(self, migration: Migration):
+        """Applies one migration and records it in schema_version"""
+        print(f"Applying {migration.label}...")
+        start = time.perf_counter()
+        if migration.transactional:
+            self._apply_in_transaction(migration)
+        else:
+            self._apply_statements(migration)
+        print(f"Applied {migration.label} in {time.perf_counter() - start:.2f}s")
+
+    def _apply_in_transaction(self, migration: Migration):
+        self.conn.autocommit = False
+        try:
+            with self.conn.cursor() as cursor:
+                cursor.execute(migration.sql)
+                self._record(cursor, migration)
+            self.conn.commit()
+        except psycopg2.Error as e:
+            self.conn.rollback()
+            raise MigrationError(f"{migration.label} failed and was rolled back: {e}") from e
+        finally:
+            self.conn.autocommit = True
+
+    def _apply_statements(self, migration: Migration):
+        with self.conn.cursor() as cursor:
+            self._drop_invalid_indexes(cursor, migration)
+            for number, statement in enumerate(migration.statements, 1):
+                try:
+                    cursor.execute(statement)
+                except psycopg2.Error as e:
+                    raise MigrationError(
+                        f"{migration.label} failed at statement {number}, the statements "
+                        f"before it are committed, fix it and run again: {e}") from e
+            self._record(cursor, migration)
+
+    @staticmethod
+    def _drop_invalid_indexes(cursor, migration: Migration):
+        """Drops the invalid indexes a failed concurrent build of this migration left"""
+        names = [match.group(1) for statement in migration.statements
+                 for match in _CONCURRENT_INDEX.finditer(statement)]
+        if not names:
+            return
+        cursor.execute("""
+            SELECT c.relname
+            FROM pg_index AS i
+            JOIN pg_class AS c ON c.oid = i.indexrelid
+            WHERE NOT i.indisvalid AND c.relname = ANY(%s)""", (names,))
+        for row in cursor.fetchall():
+            print(f"Dropping invalid index {row['relname']} from a failed run")
+            cursor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{row["relname"]}"')
+
+    @staticmethod
+    def _record(cursor, migration: Migration):
+        cursor.execute(
+            "INSERT INTO schema_version (version, name, checksum) VALUES (%s, %s, %s)",
+            (migration.version, migration.name, migration.checksum))
@@ -0,0 +1,68 @@
+"""The static lookup tables from seed.sql, loaded once instead of queried per command"""
+from types import MappingProxyType
+from typing import Iterable
+from psycopg2.extensions import connection
+
+
+class ReferenceTable:
+    """An immutable lookup between the ids and names of one reference table"""
+    __slots__ = ('by_id', 'by_name')
+
+    def __init__(self, rows: Iterable[tuple[int, str]] = ()):
+        rows = list(rows)
+        self.by_id = MappingProxyType({row_id: name for row_id, name in rows})
+        self.by_name = MappingProxyType({name: row_id for row_id, name in rows})
+
+    def id(self, name: str) -> int:
+        """Returns the id of a name, raises KeyError if it doesn't exist"""
+        return self.by_name[name]
+
+    def name(self, row_id: int) -> str:
+        """Returns the name of an id, raises KeyError if it doesn't exist"""
+        return self.by_id[row_id]
+
+    def __len__(self) -> int:
+        return len(self.by_id)
+
+
+class ReferenceData:
+    """Elements, spell statuses, spell types and event types.
+
+    Loaded at startup with `load` and reloaded with the admin
+    !reload_reference_data command after the tables are changed by hand.
+    A reload builds new tables and swaps them in, so readers always see
+    a complete table."""
+
+    # attribute: (table, id column, name column)
+    _TABLES = {
+        'elements': ('element', 'element_id', 'element_name'),
+        'spell_statuses': ('spell_status', 'spell_status_id', 'status_name'),
+        'spell_types': ('spell_type', 'spell_type_id', 'spell_type_name'),
+        'event_types': ('event_type', 'event_type_id', 'event_name'),
+    }
+
+    elements = ReferenceTable()
+    spell_statuses = ReferenceTable()
+    spell_types = ReferenceTable()
+    event_types = ReferenceTable()
+
+    @classmethod
+    def load(cls, conn: connection) -> dict[str, int]:
+        """(Re)loads every reference table and returns how many rows each has"""
+        tables = {}
+        with conn.cursor() as cursor:
+            for attribute, (table, id_column, name_column) in cls._TABLES.items():
+                cursor.execute(f"SELECT {id_column}, {name_column} FROM {table}")
+                tables[attribute] = ReferenceTable(
+                    (row[id_column], row[name_column]) for row in cursor.fetchall())
+        conn.rollback()
+
+        for attribute, table in tables.items():
+            setattr(cls, attribute, table)
+        print(f"Loaded reference data: {cls.counts()}")
+        return cls.counts()
+
+    @classmethod
+    def counts(cls) -> dict[str, int]:
+        """Returns the number of rows in each reference table"""
+        return {attribute: len(getattr(cls, attribute)) for attribute in cls._TABLES}
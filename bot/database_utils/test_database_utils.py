@@ -1,8 +1,16 @@
 # pylint: disable-all
 
+import asyncio
 import pytest
 from unittest.mock import MagicMock, patch
-from database_utils import DatabaseMapper, DatabaseIDFetch, InventoryDatabase
+import psycopg2
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE, TRANSACTION_STATUS_INERROR
+import time
+from database_utils import (DatabaseMapper, DatabaseIDFetch, InventoryDatabase, DataInserter,
+                            PurchaseResult, CombatDatabase,
+                            ConnectionPool, PoolTimeoutError, AsyncDatabase,
+                            EventLoopLagMonitor, SelectedCharacterCache, CharacterIdentity,
+                            ReferenceData, Migration, MigrationError, MigrationRunner)
 
 
 @pytest.fixture
@@ -91,3 +99,407 @@ class TestInventoryDatabase(FetchQueries):
         assert result == [{'item_id': 1, 'item_name': 'Excalibur', 'Value': 500},
                           {'item_id': 2, 'item_name': 'Lance of Longinus', 'Value': 200},
                           {'item_id': 3, 'item_name': 'Mjolnir', 'Value': 350}]
+
+    def test_get_marketplace_page_returns_the_next_cursor(self, mock_connection):
+        mock_conn, mock_cursor = mock_connection
+        mock_cursor.fetchall.return_value = [
+            {'item_id': item_id, 'listed_value': 10} for item_id in (1, 2, 3)]
+
+        items, cursor = InventoryDatabase.get_marketplace_page(mock_conn, 'cheapest', 'all', None, 2)
+        assert [item['item_id'] for item in items] == [1, 2]
+        assert cursor == (10, 2)
+        query, params = mock_cursor.execute.call_args[0]
+        assert 'ORDER BY i.listed_value ASC, i.item_id ASC' in query
+        assert params == (3,)
+
+    def test_get_marketplace_page_continues_after_the_cursor(self, mock_connection):
+        mock_conn, mock_cursor = mock_connection
+        mock_cursor.fetchall.return_value = [{'item_id': 1, 'listed_value': 5}]
+
+        items, cursor = InventoryDatabase.get_marketplace_page(mock_conn, 'priciest', 'plain', (10, 2), 2)
+        assert cursor is None
+        query, params = mock_cursor.execute.call_args[0]
+        assert '(i.listed_value, i.item_id) < (%s, %s)' in query
+        assert 'i.spell_id IS NULL' in query
+        assert params == (10, 2, 3)
+
+    def test_buy_item_returns_the_purchase_result(self, mock_connection):
+        mock_conn, mock_cursor = mock_connection
+        mock_cursor.fetchone.return_value = {
+            'status': 'success', 'seller_character_id': 3, 'buyer_shards': 90}
+
+        result = InventoryDatabase.buy_item(mock_conn, 11, 7, 10)
+        assert result == PurchaseResult(PurchaseResult.SUCCESS, 3, 90)
+        assert result.success
+        mock_cursor.execute.assert_called_once_with(
+            "SELECT * FROM purchase_item(%s, %s, %s)", (11, 7, 10))
+        mock_conn.commit.assert_called_once()
+
+    def test_buy_item_rolls_back_on_error(self, mock_connection):
+        mock_conn, mock_cursor = mock_connection
+        mock_cursor.execute.side_effect = psycopg2.OperationalError('gone')
+
+        result = InventoryDatabase.buy_item(mock_conn, 11, 7, 10)
+        assert result.status == PurchaseResult.ERROR and not result.success
+        mock_conn.rollback.assert_called_once()
+
+
+class TestCombatDatabase(FetchQueries):
+    def test_get_combatants_loads_everyone_in_two_queries(self, mock_connection):
+        mock_conn, mock_cursor = mock_connection
+        mock_cursor.fetchall.side_effect = [
+            [{'player_name': 'Alice', 'character_id': 7}, {'player_name': 'Bob', 'character_id': 8}],
+            [{'source': 'spell', 'character_id': 7, 'spell_name': 'Fireball'},
+             {'source': 'item', 'character_id': 7, 'item_name': 'Wand'},
+             {'source': 'spell', 'character_id': 8, 'spell_name': 'Ignite'}]]
+
+        result = CombatDatabase.get_combatants(mock_conn, ['Alice', 'Bob', 'Carol'], 12345)
+        assert set(result) == {'Alice', 'Bob'}
+        assert [row['spell_name'] for row in result['Alice']['spells']] == ['Fireball']
+        assert [row['item_name'] for row in result['Alice']['items']] == ['Wand']
+        assert result['Bob']['items'] == []
+        assert mock_cursor.execute.call_count == 2
+        assert mock_cursor.execute.call_args_list[1][0][1] == {'character_ids': [7, 8]}
+
+    def test_get_combatants_without_characters_is_one_query(self, mock_connection):
+        mock_conn, mock_cursor = mock_connection
+        mock_cursor.fetchall.return_value = []
+
+        assert CombatDatabase.get_combatants(mock_conn, ['Alice'], 12345) == {}
+        assert mock_cursor.execute.call_count == 1
+
+    def test_add_experience(self, mock_connection):
+        mock_conn, mock_cursor = mock_connection
+        mock_cursor.fetchone.return_value = {'experience': 150}
+
+        assert CombatDatabase.add_experience(mock_conn, 7, 50) == 150
+        mock_conn.commit.assert_called_once()
+
+    def test_add_experience_many_is_one_query(self, mock_connection):
+        mock_conn, mock_cursor = mock_connection
+        mock_cursor.fetchall.return_value = [{'character_id': 7, 'experience': 150},
+                                             {'character_id': 8, 'experience': 60}]
+
+        assert CombatDatabase.add_experience_many(mock_conn, {7: 100, 8: 50}) == {7: 150, 8: 60}
+        assert mock_cursor.execute.call_args[0][1] == ([7, 8], [100, 50])
+        mock_conn.commit.assert_called_once()
+        assert CombatDatabase.add_experience_many(mock_conn, {}) == {}
+        assert mock_cursor.execute.call_count == 1
+
+    def test_get_snapshots_returns_bytes(self, mock_connection):
+        mock_conn, mock_cursor = mock_connection
+        mock_cursor.fetchall.return_value = [{'battle_id': 9, 'version': 1, 'state': memoryview(b'\x78\x9c')}]
+
+        assert CombatDatabase.get_snapshots(mock_conn) == [{'battle_id': 9, 'version': 1, 'state': b'\x78\x9c'}]
+        mock_conn.rollback.assert_called_once()
+
+    def test_save_and_get_replay(self, mock_connection):
+        mock_conn, mock_cursor = mock_connection
+        mock_cursor.fetchone.return_value = {'replay_id': 3}
+        assert CombatDatabase.save_replay(mock_conn, 9, 12, None, b'PXRP') == 3
+        mock_conn.commit.assert_called_once()
+
+        mock_cursor.fetchone.side_effect = [{'data': memoryview(b'PXRP')}, None]
+        assert CombatDatabase.get_replay(mock_conn, 3) == b'PXRP'
+        assert CombatDatabase.get_replay(mock_conn, 4) is None
+
+
+class TestConnectionPool:
+    """Tests the pool that cogs borrow connections from"""
+
+    def make_connection(self):
+        conn = MagicMock()
+        conn.closed = 0
+        conn.get_transaction_status.return_value = TRANSACTION_STATUS_IDLE
+        return conn
+
+    def test_reuses_returned_connection(self):
+        connect = MagicMock(side_effect=self.make_connection)
+        pool = ConnectionPool(connect, min_size=0, max_size=2)
+
+        async def borrow_twice():
+            async with pool.acquire() as first:
+                pass
+            async with pool.acquire() as second:
+                pass
+            return first, second
+
+        first, second = asyncio.run(borrow_twice())
+        assert first is second
+        assert connect.call_count == 1
+        assert pool.size == 1 and pool.idle == 1
+
+
+    def test_rolls_back_aborted_transaction(self):
+        conn = self.make_connection()
+        conn.get_transaction_status.return_value = TRANSACTION_STATUS_INERROR
+        pool = ConnectionPool(lambda: conn, min_size=0, max_size=1, health_check=False)
+
+        async def borrow():
+            async with pool.acquire():
+                pass
+
+        asyncio.run(borrow())
+        conn.rollback.assert_called_once()
+
+
+    def test_replaces_unhealthy_connection(self):
+        dead = self.make_connection()
+        dead.closed = 1
+        fresh = self.make_connection()
+        pool = ConnectionPool(MagicMock(side_effect=[dead, fresh]), min_size=1, max_size=1)
+
+        async def borrow():
+            await pool.open()
+            async with pool.acquire() as conn:
+                return conn
+
+        assert asyncio.run(borrow()) is fresh
+        assert pool.discarded == 1
+
+
+    def test_acquire_times_out_when_exhausted(self):
+        pool = ConnectionPool(self.make_connection, min_size=0, max_size=1, acquire_timeout=0.01)
+
+        async def borrow_while_busy():
+            async with pool.acquire():
+                async with pool.acquire():
+                    pass
+
+        with pytest.raises(PoolTimeoutError):
+            asyncio.run(borrow_while_busy())
+        assert pool.timeouts == 1
+
+
+class TestAsyncDatabase:
+    """Tests the awaitable wrapper the cogs use for queries"""
+
+    def make_database(self, mock_conn):
+        mock_conn.closed = 0
+        mock_conn.get_transaction_status.return_value = TRANSACTION_STATUS_IDLE
+        pool = ConnectionPool(lambda: mock_conn, min_size=0, max_size=2, health_check=False)
+        return AsyncDatabase(pool)
+
+    def test_same_method_surface(self, mock_connection):
+        mock_conn, mock_cursor = mock_connection
+        mock_cursor.fetchone.return_value = {'player_id': 1}
+        db = self.make_database(mock_conn)
+
+        result = asyncio.run(db.id_fetch.get_player_id('Alice', 123))
+        db.shutdown()
+        assert result == 1
+        mock_cursor.execute.assert_called_once()
+        assert mock_cursor.execute.call_args[0][1] == ('Alice', 123)
+
+    def test_keyword_arguments(self, mock_connection):
+        mock_conn, mock_cursor = mock_connection
+        mock_cursor.fetchall.return_value = [{'race_name': 'Elf', 'race_id': 1}]
+        db = self.make_database(mock_conn)
+
+        result = asyncio.run(db.mapper.get_race_map(server_id=123))
+        db.shutdown()
+        assert result == {'Elf': 1}
+
+    def test_queries_run_off_the_event_loop(self, mock_connection):
+        mock_conn, _ = mock_connection
+        db = self.make_database(mock_conn)
+        monitor = EventLoopLagMonitor(interval=0.01)
+
+        def slow_query(conn):
+            time.sleep(0.2)
+
+        async def run_slow_queries():
+            monitor.start()
+            await asyncio.sleep(0.05)
+            await asyncio.gather(db.run(slow_query), db.run(slow_query))
+            await monitor.stop()
+
+        asyncio.run(run_slow_queries())
+        db.shutdown()
+        assert monitor.summary()['max_ms'] < 100
+
+    def test_selected_character_uses_cache(self, mock_connection):
+        mock_conn, mock_cursor = mock_connection
+        mock_cursor.fetchone.return_value = {'player_id': 1, 'character_id': 2, 'inventory_id': 3}
+        db = self.make_database(mock_conn)
+        SelectedCharacterCache.clear()
+
+        async def look_up_twice():
+            return (await db.selected_character('Alice', 123),
+                    await db.selected_character('Alice', 123))
+
+        first, second = asyncio.run(look_up_twice())
+        db.shutdown()
+        assert first == second == CharacterIdentity(1, 2, 3)
+        mock_cursor.execute.assert_called_once()
+        assert SelectedCharacterCache.stats() == {'size': 1, 'hits': 1, 'misses': 1}
+
+
+class TestSelectedCharacterCache:
+    """Tests the cache of selected character ids"""
+
+    def setup_method(self):
+        SelectedCharacterCache.clear()
+
+    def test_miss_then_hit(self, mock_connection):
+        mock_conn, mock_cursor = mock_connection
+        mock_cursor.fetchone.return_value = {'player_id': 1, 'character_id': 2, 'inventory_id': None}
+
+        assert SelectedCharacterCache.fetch(mock_conn, 'Alice', 123) == CharacterIdentity(1, 2, None)
+        assert SelectedCharacterCache.fetch(mock_conn, 'Alice', 123) == CharacterIdentity(1, 2, None)
+        mock_cursor.execute.assert_called_once()
+        assert SelectedCharacterCache.hits == 1 and SelectedCharacterCache.misses == 1
+
+    def test_no_selected_character_is_not_cached(self, mock_connection):
+        mock_conn, mock_cursor = mock_connection
+        mock_cursor.fetchone.return_value = None
+
+        assert SelectedCharacterCache.fetch(mock_conn, 'Alice', 123) is None
+        assert SelectedCharacterCache.stats()['size'] == 0
+
+    def test_invalidation(self, mock_connection):
+        mock_conn, mock_cursor = mock_connection
+        mock_cursor.fetchone.side_effect = [
+            {'player_id': 1, 'character_id': 2, 'inventory_id': 3},
+            {'player_id': 4, 'character_id': 5, 'inventory_id': 6},
+        ]
+        SelectedCharacterCache.fetch(mock_conn, 'Alice', 123)
+        SelectedCharacterCache.fetch(mock_conn, 'Bob', 123)
+
+        SelectedCharacterCache.invalidate_player(1)
+        assert SelectedCharacterCache.get('Alice', 123) is None
+        SelectedCharacterCache.invalidate_character(5)
+        assert SelectedCharacterCache.get('Bob', 123) is None
+
+    def test_select_new_character_invalidates(self, mock_connection):
+        mock_conn, mock_cursor = mock_connection
+        mock_cursor.fetchone.return_value = {'player_id': 1, 'character_id': 2, 'inventory_id': 3}
+        SelectedCharacterCache.fetch(mock_conn, 'Alice', 123)
+
+        assert DataInserter.select_new_character(mock_conn, 1, 123, 7)
+        assert SelectedCharacterCache.get('Alice', 123) is None
+
+    def test_generate_character_is_one_round_trip(self, mock_connection):
+        mock_conn, mock_cursor = mock_connection
+        mock_cursor.fetchone.return_value = {'player_id': 1, 'character_id': 2, 'inventory_id': 3}
+        SelectedCharacterCache.fetch(mock_conn, 'Alice', 123)
+        mock_cursor.reset_mock()
+        mock_cursor.fetchone.return_value = {'character_id': 9}
+
+        assert DataInserter.generate_character(mock_conn, 123, 1, 'Hero', 4, 5) == 9
+        mock_cursor.execute.assert_called_once()
+        mock_conn.commit.assert_called_once()
+        assert SelectedCharacterCache.get('Alice', 123) is None
+
+    def test_load_racing_an_invalidation_is_not_stored(self, mock_connection):
+        mock_conn, mock_cursor = mock_connection
+
+        def invalidate_during_query():
+            SelectedCharacterCache.invalidate('Alice', 123)
+            return {'player_id': 1, 'character_id': 2, 'inventory_id': 3}
+
+        mock_cursor.fetchone.side_effect = invalidate_during_query
+        assert SelectedCharacterCache.load(mock_conn, 'Alice', 123) == CharacterIdentity(1, 2, 3)
+        assert SelectedCharacterCache.stats()['size'] == 0
+
+
+class TestReferenceData:
+    """Tests the registry of static lookup tables"""
+
+    def load(self, mock_connection):
+        mock_conn, mock_cursor = mock_connection
+        mock_cursor.fetchall.side_effect = [
+            [{'element_id': 1, 'element_name': 'Fire'}, {'element_id': 2, 'element_name': 'Water'}],
+            [{'spell_status_id': 1, 'status_name': 'None'}],
+            [{'spell_type_id': 1, 'spell_type_name': 'Single Target'}],
+            [{'event_type_id': 1, 'event_name': 'Scavenge'}, {'event_type_id': 5, 'event_name': 'Sell'}],
+        ]
+        return ReferenceData.load(mock_conn)
+
+    def test_load_and_lookup_both_ways(self, mock_connection):
+        counts = self.load(mock_connection)
+        assert counts == {'elements': 2, 'spell_statuses': 1, 'spell_types': 1, 'event_types': 2}
+        assert ReferenceData.elements.id('Water') == 2
+        assert ReferenceData.elements.name(1) == 'Fire'
+        assert dict(ReferenceData.event_types.by_name) == {'Scavenge': 1, 'Sell': 5}
+
+    def test_tables_are_read_only(self, mock_connection):
+        self.load(mock_connection)
+        with pytest.raises(TypeError):
+            ReferenceData.elements.by_name['Earth'] = 3
+
+    def test_update_last_event_skips_event_type_query(self, mock_connection):
+        self.load(mock_connection)
+        mock_conn, mock_cursor = mock_connection
+        mock_cursor.reset_mock()
+
+        DataInserter.update_last_event(mock_conn, 7, 'Sell', None)
+        mock_cursor.execute.assert_called_once()
+        assert mock_cursor.execute.call_args[0][1] == (7, 5, None)
+        assert 'ON CONFLICT (character_id, event_type_id)' in mock_cursor.execute.call_args[0][0]
+
+    def test_get_last_event_reads_the_cooldown(self, mock_connection):
+        self.load(mock_connection)
+        mock_conn, mock_cursor = mock_connection
+        mock_cursor.reset_mock()
+        mock_cursor.fetchone.return_value = {'last_timestamp': 'then'}
+
+        assert DatabaseMapper.get_last_event(mock_conn, 7, 'Scavenge') == 'then'
+        query, params = mock_cursor.execute.call_args[0]
+        assert 'FROM character_cooldown' in query and 'ORDER BY' not in query
+        assert params == (7, 1)
+
+
+class TestMigrations:
+
+    def test_split_statements_ignores_quoted_semicolons_and_comments(self):
+        sql = """-- first; comment
+        INSERT INTO t VALUES ('a;b');
+        CREATE FUNCTION f() RETURNS INT AS $body$ SELECT 1; $body$ LANGUAGE sql;
+        /* trailing; */"""
+        statements = Migration(1, 'test', sql).statements
+        assert statements == [
+            "INSERT INTO t VALUES ('a;b')",
+            "CREATE FUNCTION f() RETURNS INT AS $body$ SELECT 1; $body$ LANGUAGE sql",
+        ]
+
+    def test_concurrently_runs_outside_a_transaction(self):
+        assert Migration(1, 'a', 'CREATE INDEX i ON t (c);').transactional
+        assert not Migration(2, 'b', 'CREATE INDEX CONCURRENTLY i ON t (c);').transactional
+        assert Migration(3, 'c', '-- not CONCURRENTLY\nCREATE INDEX i ON t (c);').transactional
+
+    def test_pending_in_version_order_up_to_target(self, tmp_path, mock_connection):
+        for name in ('0002_second.sql', '0010_tenth.sql', '0001_first.sql'):
+            (tmp_path / name).write_text('SELECT 1;')
+        mock_conn, mock_cursor = mock_connection
+        mock_cursor.fetchone.return_value = {'exists': True}
+        mock_cursor.fetchall.return_value = [
+            {'version': 1, 'checksum': Migration(1, 'first', 'SELECT 1;').checksum}]
+
+        pending = MigrationRunner(mock_conn, tmp_path).pending(target=2)
+        assert [migration.label for migration in pending] == ['0002_second']
+
+    def test_changed_migration_is_rejected(self, tmp_path, mock_connection):
+        (tmp_path / '0001_first.sql').write_text('SELECT 2;')
+        mock_conn, mock_cursor = mock_connection
+        mock_cursor.fetchone.return_value = {'exists': True}
+        mock_cursor.fetchall.return_value = [{'version': 1, 'checksum': 'old'}]
+
+        with pytest.raises(MigrationError):
+            MigrationRunner(mock_conn, tmp_path).pending()
+
+    def test_duplicate_versions_are_rejected(self, tmp_path, mock_connection):
+        (tmp_path / '0001_first.sql').write_text('SELECT 1;')
+        (tmp_path / '1_other.sql').write_text('SELECT 1;')
+        with pytest.raises(MigrationError):
+            MigrationRunner(mock_connection[0], tmp_path).discover()
+
+    def test_dry_run_executes_nothing(self, tmp_path, mock_connection):
+        (tmp_path / '0001_first.sql').write_text('CREATE TABLE t (c INT);')
+        mock_conn, mock_cursor = mock_connection
+        mock_cursor.fetchone.return_value = {'exists': False}
+
+        pending = MigrationRunner(mock_conn, tmp_path).run(dry_run=True)
+        assert [migration.version for migration in pending] == [1]
+        executed = [call[0][0] for call in mock_cursor.execute.call_args_list]
+        assert executed == ["SELECT to_regclass('schema_version') IS NOT NULL AS exists"]
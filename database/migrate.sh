@@ -0,0 +1,7 @@
+# Applies the pending migrations to the hosted database without resetting it,
+# pass --dry-run to only print them
+set -a
+source .env
+set +a
+echo "Migrating database $HOSTED_DB_NAME..."
+cd .. && python3 -m bot.database_utils.migrate "$@"
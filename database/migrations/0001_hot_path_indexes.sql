@@ -0,0 +1,58 @@
+-- Indexes for the hot query paths, schema.sql only has primary keys.
+-- Built CONCURRENTLY so a live database keeps serving commands meanwhile.
+
+-- A player can only have one selected character. Older versions of
+-- !character created characters without deselecting the previous one,
+-- so keep the newest selected character and deselect the rest first.
+UPDATE "character" AS c
+SET "selected_character" = FALSE
+WHERE c."selected_character" = TRUE
+AND EXISTS (
+    SELECT 1
+    FROM "character" AS newer
+    WHERE newer."player_id" = c."player_id"
+    AND newer."selected_character" = TRUE
+    AND newer."character_id" > c."character_id"
+);
+
+-- Selected character lookups, and enforces one selected character per player
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS "character_selected_per_player_key"
+    ON "character" ("player_id") WHERE "selected_character";
+
+-- All characters of a player (!select_character, deselecting before a select)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS "character_player_id_idx"
+    ON "character" ("player_id");
+
+-- Player lookups by discord name in a server
+CREATE INDEX CONCURRENTLY IF NOT EXISTS "player_name_server_id_idx"
+    ON "player" ("player_name", "server_id");
+
+-- Last event of a type for a character (scavenge and craft cooldowns)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS "character_event_character_type_time_idx"
+    ON "character_event" ("character_id", "event_type_id", "event_timestamp" DESC);
+
+-- Inventory of a character and the items in an inventory
+CREATE INDEX CONCURRENTLY IF NOT EXISTS "inventory_character_id_idx"
+    ON "inventory" ("character_id");
+CREATE INDEX CONCURRENTLY IF NOT EXISTS "item_inventory_id_idx"
+    ON "item" ("inventory_id");
+
+-- The marketplace, only a small fraction of items are listed at a time
+CREATE INDEX CONCURRENTLY IF NOT EXISTS "item_is_selling_idx"
+    ON "item" ("item_id") WHERE "is_selling";
+
+-- Spells a character can learn from their race or class
+CREATE INDEX CONCURRENTLY IF NOT EXISTS "spells_race_id_idx"
+    ON "spells" ("race_id");
+CREATE INDEX CONCURRENTLY IF NOT EXISTS "spells_class_id_idx"
+    ON "spells" ("class_id");
+
+-- Equipped spells of a character
+CREATE INDEX CONCURRENTLY IF NOT EXISTS "character_spell_assignment_character_id_idx"
+    ON "character_spell_assignment" ("character_id");
+
+-- Location and settlement mappings are loaded per server and keyed by channel/thread
+CREATE INDEX CONCURRENTLY IF NOT EXISTS "location_server_id_channel_id_idx"
+    ON "location" ("server_id", "channel_id");
+CREATE INDEX CONCURRENTLY IF NOT EXISTS "settlements_server_id_thread_id_idx"
+    ON "settlements" ("server_id", "thread_id");
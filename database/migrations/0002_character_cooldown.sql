@@ -0,0 +1,17 @@
+-- The last time each character performed each event type. Cooldown checks
+-- read one row by primary key instead of sorting the character_event log,
+-- which is kept as an audit trail.
+CREATE TABLE "character_cooldown"(
+    "character_id" INTEGER NOT NULL,
+    "event_type_id" INTEGER NOT NULL,
+    "last_timestamp" TIMESTAMP NOT NULL,
+    PRIMARY KEY ("character_id", "event_type_id"),
+    FOREIGN KEY ("character_id") REFERENCES "character"("character_id") ON DELETE CASCADE,
+    FOREIGN KEY ("event_type_id") REFERENCES "event_type"("event_type_id") ON DELETE CASCADE
+);
+
+-- Carry over the cooldowns from the existing event log
+INSERT INTO "character_cooldown" ("character_id", "event_type_id", "last_timestamp")
+SELECT "character_id", "event_type_id", MAX("event_timestamp")
+FROM "character_event"
+GROUP BY "character_id", "event_type_id";
@@ -0,0 +1,81 @@
+-- Buys a listed item in one round trip. The item row is locked first, so of
+-- two buyers clicking at the same time the second one sees it already sold,
+-- then both characters are locked in id order so crossing trades can't
+-- deadlock. The status is one of success, already_sold, own_item,
+-- price_changed, no_inventory or insufficient_funds.
+CREATE OR REPLACE FUNCTION "purchase_item"(
+    "p_item_id" INTEGER,
+    "p_buyer_character_id" INTEGER,
+    "p_price" INTEGER
+)
+RETURNS TABLE ("status" TEXT, "seller_character_id" INTEGER, "buyer_shards" BIGINT)
+LANGUAGE plpgsql AS $$
+DECLARE
+    v_listed_value INTEGER;
+    v_is_selling BOOLEAN;
+    v_seller_id INTEGER;
+    v_inventory_id INTEGER;
+    v_shards BIGINT;
+BEGIN
+    SELECT i."listed_value", i."is_selling", inv."character_id"
+    INTO v_listed_value, v_is_selling, v_seller_id
+    FROM "item" AS i
+    JOIN "inventory" AS inv ON inv."inventory_id" = i."inventory_id"
+    WHERE i."item_id" = p_item_id
+    FOR UPDATE OF i;
+
+    IF NOT FOUND OR NOT v_is_selling THEN
+        RETURN QUERY SELECT 'already_sold', v_seller_id, NULL::BIGINT;
+        RETURN;
+    END IF;
+    IF v_seller_id = p_buyer_character_id THEN
+        RETURN QUERY SELECT 'own_item', v_seller_id, NULL::BIGINT;
+        RETURN;
+    END IF;
+    IF v_listed_value IS DISTINCT FROM p_price THEN
+        RETURN QUERY SELECT 'price_changed', v_seller_id, NULL::BIGINT;
+        RETURN;
+    END IF;
+
+    SELECT inv."inventory_id" INTO v_inventory_id
+    FROM "inventory" AS inv
+    WHERE inv."character_id" = p_buyer_character_id
+    ORDER BY inv."inventory_id"
+    LIMIT 1;
+    IF NOT FOUND THEN
+        RETURN QUERY SELECT 'no_inventory', v_seller_id, NULL::BIGINT;
+        RETURN;
+    END IF;
+
+    PERFORM 1
+    FROM "character" AS c
+    WHERE c."character_id" IN (p_buyer_character_id, v_seller_id)
+    ORDER BY c."character_id"
+    FOR UPDATE;
+
+    SELECT c."shards" INTO v_shards
+    FROM "character" AS c
+    WHERE c."character_id" = p_buyer_character_id;
+    IF v_shards < p_price THEN
+        RETURN QUERY SELECT 'insufficient_funds', v_seller_id, v_shards;
+        RETURN;
+    END IF;
+
+    UPDATE "item"
+    SET "inventory_id" = v_inventory_id, "is_selling" = FALSE, "listed_value" = NULL
+    WHERE "item_id" = p_item_id;
+
+    UPDATE "character" AS c
+    SET "shards" = c."shards" + CASE WHEN c."character_id" = p_buyer_character_id
+                                     THEN -p_price ELSE p_price END
+    WHERE c."character_id" IN (p_buyer_character_id, v_seller_id);
+
+    INSERT INTO "character_event" ("character_id", "item_id", "event_type_id")
+    SELECT CASE WHEN et."event_name" = 'Buy' THEN p_buyer_character_id ELSE v_seller_id END,
+           p_item_id, et."event_type_id"
+    FROM "event_type" AS et
+    WHERE et."event_name" IN ('Buy', 'Sell');
+
+    RETURN QUERY SELECT 'success', v_seller_id, v_shards - p_price;
+END;
+$$;
@@ -0,0 +1,11 @@
+-- When an item was put up for sale, for sorting the marketplace by newest.
+-- Items listed before this migration count as listed now.
+ALTER TABLE "item" ADD COLUMN IF NOT EXISTS "listed_at" TIMESTAMP DEFAULT NULL;
+UPDATE "item" SET "listed_at" = NOW() WHERE "is_selling" AND "listed_at" IS NULL;
+
+-- Keyset pagination of the listings, scanned forwards or backwards
+-- depending on the sort order picked in !marketplace
+CREATE INDEX CONCURRENTLY IF NOT EXISTS "item_selling_listed_at_idx"
+    ON "item" ("listed_at", "item_id") WHERE "is_selling";
+CREATE INDEX CONCURRENTLY IF NOT EXISTS "item_selling_listed_value_idx"
+    ON "item" ("listed_value", "item_id") WHERE "is_selling";
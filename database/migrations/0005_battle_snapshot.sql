@@ -0,0 +1,10 @@
+-- The latest state of each battle in progress, keyed by the channel it is
+-- fought in, so battles survive a restart of the bot. Written after every
+-- turn and deleted when the battle ends. "state" is zlib compressed JSON
+-- laid out as described in bot/combat_test/snapshot.py for "version".
+CREATE TABLE IF NOT EXISTS "battle_snapshot"(
+    "battle_id" BIGINT PRIMARY KEY,
+    "version" SMALLINT NOT NULL,
+    "state" BYTEA NOT NULL,
+    "saved_at" TIMESTAMP NOT NULL DEFAULT NOW()
+);
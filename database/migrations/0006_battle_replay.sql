@@ -0,0 +1,15 @@
+-- The replay of every finished battle: the state it started from and every
+-- action taken, packed as described in bot/combat_test/replay.py. A battle
+-- that was resumed after a restart is replayed from where it resumed.
+CREATE TABLE IF NOT EXISTS "battle_replay"(
+    "replay_id" SERIAL PRIMARY KEY,
+    "battle_id" BIGINT NOT NULL,
+    "turns" INT NOT NULL,
+    "winner_id" BIGINT,
+    "data" BYTEA NOT NULL,
+    "saved_at" TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+-- The replays of the battles fought in a channel
+CREATE INDEX CONCURRENTLY IF NOT EXISTS "battle_replay_battle_id_idx"
+    ON "battle_replay" ("battle_id");
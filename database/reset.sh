@@ -1,3 +1,5 @@
 source .env
 echo "Resetting database $DB_NAME..."
-psql -U $DB_USER -h $DB_HOST -p $DB_PORT -d $DB_NAME -f "$SCHEMA_FILE"
\ No newline at end of file
+psql -U $DB_USER -h $DB_HOST -p $DB_PORT -d $DB_NAME -f "$SCHEMA_FILE"
+echo "Migrating database $DB_NAME..."
+(cd .. && python3 -m bot.database_utils.migrate --dsn "dbname=$DB_NAME user=$DB_USER host=$DB_HOST port=$DB_PORT")
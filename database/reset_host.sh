@@ -8,4 +8,7 @@ echo "Resetting database $HOSTED_DB_NAME..."
 # psql -U "$HOSTED_DB_USER" -h "$HOSTED_DB_HOST" -p "$HOSTED_PORT" -d "$HOSTED_DB_NAME" -f "$SCHEMA_FILE"
 psql -v ON_ERROR_STOP=1 -U "$HOSTED_DB_USER" -h "$HOSTED_DB_HOST" -p "$HOSTED_PORT" -d "$HOSTED_DB_NAME" -f "$SCHEMA_FILE"
 
+echo "Migrating database $HOSTED_DB_NAME..."
+(set -a && source .env && cd .. && python3 -m bot.database_utils.migrate)
+
 unset PGPASSWORD
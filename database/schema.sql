@@ -19,6 +19,11 @@ DROP TABLE IF EXISTS "spell_type" CASCADE;
 DROP TABLE IF EXISTS "spell_status_spell_assignment" CASCADE;
 DROP TABLE IF EXISTS "event_type" CASCADE;
 DROP TABLE IF EXISTS "character_event" CASCADE;
+DROP TABLE IF EXISTS "character_cooldown" CASCADE;
+DROP TABLE IF EXISTS "battle_snapshot";
+DROP TABLE IF EXISTS "battle_replay";
+-- Reset databases start over, reset.sh applies every migration again
+DROP TABLE IF EXISTS "schema_version";
 
 -- Server table to ensure uniqueness per Discord server
 CREATE TABLE "server"(
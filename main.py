@@ -4,6 +4,7 @@ import asyncio
 
 # Load bot token from config
 from config import TOKEN, COMMAND_PREFIX
+from bot.database_utils import DatabaseConnection, ReferenceData
 
 # Create bot instance
 intents = discord.Intents.default()
@@ -37,8 +38,13 @@ async def on_ready():
 
 async def main():
     async with bot:
+        await DatabaseConnection.get_pool().open()
+        await DatabaseConnection.get_database().run(ReferenceData.load)
         await load_cogs()
-        await bot.start(TOKEN)
+        try:
+            await bot.start(TOKEN)
+        finally:
+            await DatabaseConnection.close_pool()
 
 if __name__ == "__main__":
 